@@ -1,7 +1,10 @@
+import time
+
 import dash
 from dash import Dash, html, dcc
+from flask import jsonify
 
-app = Dash(__name__, use_pages=True)
+from backend import page_data, simulation_stream
 
 navbar_style = {
     'display': 'flex',
@@ -22,45 +25,67 @@ link_style = {
     'padding': '0 5px'
 }
 
-app.layout = html.Div([
-    dcc.Location(id='url', refresh=False),
-    html.H1('Disaster Decision Support System', style={'textAlign': 'center'}),
 
-    # Navbar
-    html.Div([
-        html.Nav([
-            dcc.Link(f"{page['name']}", href=page["relative_path"], style=link_style, className='nav-link')
-            for page in dash.page_registry.values()
-        ], style=navbar_style)
-    ]),
+def create_app():
+    """Build the Dash app. Kept out of module level so that importing this module (as the
+    process pools' spawned workers do with the main module) does not build the app, register
+    routes or start the page data warm-up in every worker.
+    """
+    started = time.perf_counter()
+    app = Dash(__name__, use_pages=True)
+    page_data.record_startup('import pages', time.perf_counter() - started)
 
-    dash.page_container
-])
+    app.layout = html.Div([
+        dcc.Location(id='url', refresh=False),
+        html.H1('Disaster Decision Support System', style={'textAlign': 'center'}),
+
+        # Navbar
+        html.Div([
+            html.Nav([
+                dcc.Link(f"{page['name']}", href=page["relative_path"], style=link_style, className='nav-link')
+                for page in dash.page_registry.values()
+            ], style=navbar_style)
+        ]),
+
+        dash.page_container
+    ])
+
+    app.clientside_callback(
+        """
+        function(href) {
+            const links = document.querySelectorAll('.nav-link');
+            links.forEach(link => {
+                if (link.href === window.location.href) {
+                    link.style.borderBottom = '2px solid orange';
+                    link.style.paddingBottom = '3px';
+                    link.style.color = 'orange';
+                    link.style.fontWeight = 'bold';
+                } else {
+                    link.style.borderBottom = 'none';
+                    link.style.color = 'white';  // Reset to default color when not active
+                    link.style.fontWeight = 'normal';  // Reset to
+                }
+            });
+            return null;
+        }
+        """,
+        output=dash.Output('dummy-div', 'children'),
+        inputs=[dash.Input('url', 'href')]
+    )
+
+    app.layout.children.append(html.Div(id='dummy-div', style={'display': 'none'}))
+
+    @app.server.route('/startup-report')
+    def startup_report():
+        return jsonify(page_data.timings())
+
+    simulation_stream.register(app.server)
+
+    page_data.record_startup('app ready', time.perf_counter() - started)
+    # Page data is fetched in the background; pages opened before it finishes load it themselves.
+    page_data.start_warm_up()
+    return app
 
-app.clientside_callback(
-    """
-    function(href) {
-        const links = document.querySelectorAll('.nav-link');
-        links.forEach(link => {
-            if (link.href === window.location.href) {
-                link.style.borderBottom = '2px solid orange';
-                link.style.paddingBottom = '3px';
-                link.style.color = 'orange';
-                link.style.fontWeight = 'bold';
-            } else {
-                link.style.borderBottom = 'none';
-                link.style.color = 'white';  // Reset to default color when not active
-                link.style.fontWeight = 'normal';  // Reset to
-            }
-        });
-        return null;
-    }
-    """,
-    output=dash.Output('dummy-div', 'children'),
-    inputs=[dash.Input('url', 'href')]
-)
-
-app.layout.children.append(html.Div(id='dummy-div', style={'display': 'none'}))
 
 if __name__ == '__main__':
-    app.run_server(debug=True)
+    create_app().run_server(debug=True)
@@ -0,0 +1,52 @@
+// Live simulation chart: rows pushed by /simulation-stream (Server-Sent Events) are written to
+// the simulation-push store; the extend callback appends them to the graph.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    simulation: {
+        connect: function(id) {
+            if (!window.simulationStream) {
+                const source = new EventSource('/simulation-stream');
+                source.onmessage = function(message) {
+                    if (!document.getElementById('real-time-graph')) {
+                        // The simulation page was left; reconnect when it is opened again.
+                        source.close();
+                        window.simulationStream = null;
+                        return;
+                    }
+                    dash_clientside.set_props('simulation-push', {data: JSON.parse(message.data)});
+                };
+                window.simulationStream = source;
+            }
+            return window.dash_clientside.no_update;
+        },
+
+        extend: function(event, cursor) {
+            const no_update = window.dash_clientside.no_update;
+            if (!event) {
+                return [no_update, no_update, no_update];
+            }
+            const reload = [no_update, no_update, Date.now()];
+            if (event.type === 'reset' || !cursor || cursor.last_day === null || cursor.run_id !== event.run_id) {
+                return reload;
+            }
+            if (event.after !== null && event.after > cursor.last_day) {
+                // Days between the chart and this event were missed, e.g. while reconnecting.
+                return reload;
+            }
+            if (JSON.stringify(event.columns) !== JSON.stringify(cursor.columns)) {
+                return reload;
+            }
+            const keep = event.x.map((day, i) => day > cursor.last_day ? i : -1).filter(i => i >= 0);
+            if (keep.length === 0) {
+                return [no_update, no_update, no_update];
+            }
+            const x = keep.map(i => event.x[i]);
+            const extendData = {
+                x: event.columns.map(() => x),
+                y: event.y.map(values => keep.map(i => values[i]))
+            };
+            const traces = event.columns.map((column, i) => i);
+            const newCursor = Object.assign({}, cursor, {last_day: x[x.length - 1]});
+            return [[extendData, traces], newCursor, no_update];
+        }
+    }
+});
@@ -0,0 +1,156 @@
+import pandas as pd
+
+from backend import helperfunctions, rollups, schema
+from constants import BY_DATE, BY_ID
+
+# Day-count buckets for DAY_INCREMENT tables, same widths statistics.py always used.
+DAY_BUCKETS = {'daily': 1, 'weekly': 7, 'monthly': 30, 'yearly': 365}
+
+# Calendar buckets for DATE_ID tables, labelled like pandas resample('D'/'W'/'M'/'Y'):
+# weeks end on Sunday, months and years on their last day.
+DATE_BUCKET_SQL = {
+    'daily': "DATE({col})",
+    'weekly': "DATE_ADD(DATE({col}), INTERVAL (6 - WEEKDAY({col})) DAY)",
+    'monthly': "LAST_DAY({col})",
+    'yearly': "DATE(CONCAT(YEAR({col}), '-12-31'))",
+}
+
+RESAMPLE_CODES = {'D': 'daily', 'W': 'weekly', 'M': 'monthly', 'Y': 'yearly'}
+
+AGGREGATES = {
+    'sum': "COALESCE(SUM({col}), 0)",
+    'mean': "AVG({col})",
+    'min': "MIN({col})",
+    'max': "MAX({col})",
+    'count': "COUNT({col})",
+}
+
+
+def normalize_bucket(bucket):
+    bucket = RESAMPLE_CODES.get(bucket, bucket)
+    if bucket not in DAY_BUCKETS:
+        raise ValueError(f"Unknown bucket: {bucket}")
+    return bucket
+
+
+def _check_request(table, columns, agg):
+    spec = schema.get_table_spec(table)
+    if spec is None or spec.time_key is None:
+        raise ValueError(f"Table {table} has no time key to aggregate on")
+    if agg not in AGGREGATES:
+        raise ValueError(f"Unknown aggregate: {agg}")
+    known = schema.get_column_names(table)
+    if known:
+        unknown = [col for col in columns if col not in known]
+        if unknown:
+            raise ValueError(f"Unknown columns for table {table}: {unknown}")
+    return spec
+
+
+def bucket_expression(time_key, bucket):
+    if time_key == BY_ID:
+        width = DAY_BUCKETS[bucket]
+        return f"{time_key}" if width == 1 else f"({time_key} DIV {width})"
+    return DATE_BUCKET_SQL[bucket].format(col=time_key)
+
+
+def build_aggregate_query(table, columns, bucket, agg='sum'):
+    bucket = normalize_bucket(bucket)
+    spec = _check_request(table, columns, agg)
+    select = [f"{bucket_expression(spec.time_key, bucket)} AS `{spec.time_key}`"]
+    select += [f"{AGGREGATES[agg].format(col=f'`{col}`')} AS `{col}`" for col in columns]
+    where, params = schema.run_filter(table)
+    return (f"SELECT {', '.join(select)} FROM {spec.source}{where} "
+            f"GROUP BY 1 ORDER BY 1"), params
+
+
+def _finish(df, time_key, columns):
+    if time_key == BY_DATE:
+        df[time_key] = pd.to_datetime(df[time_key])
+    else:
+        df[time_key] = df[time_key].astype('int64')
+    for col in columns:
+        df[col] = pd.to_numeric(df[col], errors='coerce').astype('float64')
+    return df[[time_key] + list(columns)].reset_index(drop=True)
+
+
+def aggregate_sql(table, columns, bucket, agg='sum'):
+    query, params = build_aggregate_query(table, columns, bucket, agg)
+    with helperfunctions.get_db_connection() as conn:
+        df = pd.read_sql(query, conn, params=params or None)
+    return _finish(df, schema.get_table_spec(table).time_key, columns)
+
+
+def bucket_series(values, time_key, bucket):
+    if time_key == BY_ID:
+        return values // DAY_BUCKETS[bucket]
+    dates = pd.to_datetime(values).dt.normalize()
+    if bucket == 'daily':
+        return dates
+    if bucket == 'weekly':
+        return dates + pd.to_timedelta(6 - dates.dt.dayofweek, unit='D')
+    if bucket == 'monthly':
+        return dates.dt.to_period('M').dt.end_time.dt.normalize()
+    return dates.dt.to_period('Y').dt.end_time.dt.normalize()
+
+
+def aggregate_frame(df, time_key, columns, bucket, agg='sum'):
+    """Pandas implementation of build_aggregate_query, used when MySQL is not an option."""
+    bucket = normalize_bucket(bucket)
+    if df.empty:
+        return pd.DataFrame(columns=[time_key] + list(columns))
+    keys = bucket_series(df[time_key], time_key, bucket).rename(time_key)
+    values = df[list(columns)].apply(pd.to_numeric, errors='coerce')
+    grouped = values.groupby(keys.values)
+    if agg == 'sum':
+        result = grouped.sum(min_count=0)
+    else:
+        result = getattr(grouped, agg)()
+    result.index.name = time_key
+    return _finish(result.reset_index(), time_key, columns)
+
+
+def aggregate_pandas(table, columns, bucket, agg='sum'):
+    spec = _check_request(table, columns, agg)
+    df = helperfunctions.fetch_data_for_table(table, columns=list(columns), copy=False)
+    return aggregate_frame(df, spec.time_key, columns, bucket, agg)
+
+
+def aggregate(table, columns, bucket, agg='sum', engine='sql'):
+    """Bucket a table by its time key and aggregate the given columns.
+
+    Returns one row per bucket: the bucket label under the table's time key column
+    (a date for DATE_ID tables, a bucket index for DAY_INCREMENT tables) and one
+    float column per aggregated column. engine='sql' reads the materialized rollups
+    when they cover the request, otherwise runs a GROUP BY in MySQL, and falls back
+    to pandas if that query fails.
+    """
+    columns = list(columns)
+    bucket = normalize_bucket(bucket)
+    if not columns:
+        return pd.DataFrame()
+
+    def load():
+        if engine == 'sql' and rollups.is_supported(table, bucket, agg):
+            try:
+                return rollups.read_rollup(table, columns, bucket, agg)
+            except Exception as e:
+                print(f"Rollup read failed for {table}, aggregating on the fly: {e}")
+        if engine == 'sql':
+            try:
+                return aggregate_sql(table, columns, bucket, agg)
+            except ValueError:
+                raise
+            except Exception as e:
+                print(f"SQL aggregation failed for {table}, falling back to pandas: {e}")
+        return aggregate_pandas(table, columns, bucket, agg)
+
+    key = (table, 'aggregate', bucket, agg, tuple(columns))
+    try:
+        df = helperfunctions.table_loads.do(
+            key, lambda: helperfunctions.table_cache.get(
+                key, lambda: helperfunctions.fetch_table_version(table), load))
+        return df.copy()
+    except Exception as e:
+        print(f"Error aggregating {columns} of table {table}: {e}")
+        return pd.DataFrame()
@@ -0,0 +1,197 @@
+import hashlib
+import queue
+import threading
+import time
+import uuid
+
+from decouple import config
+
+from backend import helperfunctions
+from backend.singleflight import SingleFlight
+from backend.table_cache import TableCache
+
+WORKERS = config('ANALYSIS_WORKERS', default=2, cast=int)
+# ANALYSIS_CLIENT=stub answers with canned text after ANALYSIS_STUB_SECONDS instead of calling OpenAI.
+CLIENT = config('ANALYSIS_CLIENT', default='openai')
+MODEL = config('ANALYSIS_MODEL', default='gpt-3.5-turbo')
+STUB_SECONDS = config('ANALYSIS_STUB_SECONDS', default=1.0, cast=float)
+# Finished jobs are forgotten after this long; their results stay in the result cache.
+JOB_TTL_SECONDS = 3600
+
+QUEUED, SUMMARIZING, ANALYZING, DONE, FAILED, CANCELLED = (
+    'queued', 'summarizing', 'analyzing', 'done', 'failed', 'cancelled')
+FINISHED = (DONE, FAILED, CANCELLED)
+
+# Analyses keyed by a hash of the summarized data they were asked about, stored as UTF-8 bytes.
+# The client name is the version, so stub answers never stand in for real ones.
+result_cache = TableCache(
+    max_bytes=config('ANALYSIS_CACHE_MAX_MB', default=4, cast=int) * 1024 * 1024,
+    max_entries=config('ANALYSIS_CACHE_MAX_ENTRIES', default=256, cast=int),
+    sizeof=len,
+    shared=helperfunctions.shared_cache,
+)
+_completions = SingleFlight()
+
+
+def openai_client(summarized_data):
+    return helperfunctions.analyze_simulation_data(summarized_data, model=MODEL)
+
+
+def stub_client(summarized_data):
+    time.sleep(STUB_SECONDS)
+    return f"Stub analysis of {len(summarized_data)} characters of simulation data."
+
+
+_client = None
+_client_name = None
+
+
+def set_client(client, name=None):
+    """Replace the completion client: a callable taking the summarized data and returning the analysis text."""
+    global _client, _client_name
+    _client = client
+    _client_name = name or getattr(client, '__name__', 'custom')
+
+
+def get_client():
+    if _client is None:
+        if CLIENT == 'stub':
+            set_client(stub_client, 'stub')
+        else:
+            set_client(openai_client, f'openai:{MODEL}')
+    return _client, _client_name
+
+
+def summary_digest(summarized_data):
+    return hashlib.sha256(summarized_data.encode('utf-8')).hexdigest()
+
+
+class AnalysisJob:
+    def __init__(self):
+        self.id = uuid.uuid4().hex
+        self.status = QUEUED
+        self.result = None
+        self.error = None
+        self.cached = False
+        self.digest = None
+        self.created = time.time()
+        self.finished = None
+        self.cancel = threading.Event()
+
+    @property
+    def done(self):
+        return self.status in FINISHED
+
+    def _finish(self, status, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.finished = time.time()
+        self.status = CANCELLED if self.cancel.is_set() and status != DONE else status
+
+    def run(self):
+        if self.cancel.is_set():
+            self._finish(CANCELLED)
+            return
+        try:
+            self.status = SUMMARIZING
+            summarized_data = helperfunctions.fetch_and_summarize_simulation_data()
+            if not summarized_data:
+                self._finish(FAILED, error="No simulation data to analyze.")
+                return
+            if self.cancel.is_set():
+                self._finish(CANCELLED)
+                return
+
+            self.digest = summary_digest(summarized_data)
+            client, client_name = get_client()
+            key = ('analysis', self.digest)
+            self.cached = result_cache.lookup(key, client_name) is not None
+            self.status = ANALYZING
+
+            def complete():
+                return client(summarized_data).encode('utf-8')
+
+            # Concurrent jobs for the same data share one completion.
+            result = _completions.do(key, lambda: result_cache.get(key, lambda: client_name, complete))
+            if self.cancel.is_set():
+                # The completion could not be interrupted; its result is cached for the next request.
+                self._finish(CANCELLED)
+                return
+            self._finish(DONE, result=result.decode('utf-8'))
+        except Exception as e:
+            print(f"Analysis {self.id} failed: {e}")
+            self._finish(FAILED, error=str(e))
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_queue = queue.Queue()
+_workers = []
+
+
+def _work():
+    while True:
+        job = _queue.get()
+        try:
+            job.run()
+        finally:
+            _queue.task_done()
+
+
+def _ensure_workers():
+    with _jobs_lock:
+        while len(_workers) < WORKERS:
+            worker = threading.Thread(target=_work, name=f'analysis-{len(_workers)}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+
+
+def _expire_jobs():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished is not None and job.finished < cutoff]:
+        del _jobs[job_id]
+
+
+def submit_analysis():
+    """Queue an analysis of the current simulation data and return its job id."""
+    _ensure_workers()
+    job = AnalysisJob()
+    with _jobs_lock:
+        _expire_jobs()
+        _jobs[job.id] = job
+    _queue.put(job)
+    return job.id
+
+
+def get_analysis(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+
+def cancel_analysis(job_id):
+    job = get_analysis(job_id)
+    if job is not None and not job.done:
+        job.cancel.set()
+        if job.status == QUEUED:
+            job._finish(CANCELLED)
+    return job
+
+
+def queue_position(job_id):
+    """Number of queued jobs submitted before this one (0 once it is running)."""
+    job = get_analysis(job_id)
+    if job is None or job.status != QUEUED:
+        return 0
+    with _jobs_lock:
+        return sum(1 for other in _jobs.values() if other.status == QUEUED and other.created < job.created)
+
+
+def get_analysis_stats():
+    with _jobs_lock:
+        statuses = [job.status for job in _jobs.values()]
+    return {
+        'jobs': {status: statuses.count(status) for status in set(statuses)},
+        'queued': _queue.qsize(),
+        'cache': result_cache.stats(),
+        'completions': _completions.stats(),
+    }
@@ -0,0 +1,47 @@
+def build_insert_query(table, columns, row_count, key_columns=None):
+    """Multi-row INSERT for row_count rows; with key_columns it upserts the remaining columns."""
+    column_sql = ', '.join(f"`{col}`" for col in columns)
+    row_sql = '(' + ', '.join(['%s'] * len(columns)) + ')'
+    query = f"INSERT INTO {table} ({column_sql}) VALUES " + ', '.join([row_sql] * row_count)
+    if key_columns:
+        updates = [f"`{col}` = VALUES(`{col}`)" for col in columns if col not in key_columns]
+        if updates:
+            query += " ON DUPLICATE KEY UPDATE " + ', '.join(updates)
+    return query
+
+
+def write_batches(conn, table, columns, rows, key_columns=None, batch_size=1000, on_batch=None, commit=True):
+    """Write rows as multi-row statements of batch_size rows, committing once per batch.
+
+    rows can be any iterable of tuples, so callers can stream them. on_batch(written)
+    is called after every commit with the number of rows written so far. With
+    commit=False nothing is committed and the caller ends the transaction.
+    """
+    cursor = conn.cursor()
+    written = 0
+    batch = []
+    full_query = None
+    try:
+        for row in rows:
+            batch.append(row)
+            if len(batch) == batch_size:
+                if full_query is None:
+                    full_query = build_insert_query(table, columns, batch_size, key_columns)
+                cursor.execute(full_query, [value for values in batch for value in values])
+                if commit:
+                    conn.commit()
+                written += len(batch)
+                batch = []
+                if on_batch is not None:
+                    on_batch(written)
+        if batch:
+            cursor.execute(build_insert_query(table, columns, len(batch), key_columns),
+                           [value for values in batch for value in values])
+            if commit:
+                conn.commit()
+            written += len(batch)
+            if on_batch is not None:
+                on_batch(written)
+    finally:
+        cursor.close()
+    return written
@@ -1,39 +1,69 @@
-from backend import helperfunctions
-from datetime import datetime, timedelta
+import threading
+from backend import run_history
+from backend.status_writer import BufferedWriter
+from datetime import date, timedelta
+from decouple import config
+
+_run_start_date = None
+_current_run_id = None
+_status_writer = None
+_status_writer_lock = threading.Lock()
+
 
 def get_current_date(counter):
-    current_date = datetime.today()
-    current_date += timedelta(days=counter)
-    current_date.strftime("%Y-%m-%d")
-    return current_date
+    # The start date is fixed once per run instead of calling today() for every simulated day.
+    global _run_start_date
+    if _run_start_date is None:
+        _run_start_date = date.today()
+    return _run_start_date + timedelta(days=counter)
 
 
-def del_status_values():
-    conn = helperfunctions.get_db_connection()
-    cursor = conn.cursor()
+def get_status_writer():
+    global _status_writer
+    if _status_writer is None:
+        with _status_writer_lock:
+            if _status_writer is None:
+                _status_writer = BufferedWriter(
+                    'status_history', ['RUN_ID', 'DATE_ID', 'TOTAL', 'CURED', 'DEAD', 'SICK'],
+                    batch_size=config('STATUS_WRITER_BATCH_SIZE', default=500, cast=int),
+                    flush_interval=config('STATUS_WRITER_FLUSH_SECONDS', default=2.0, cast=float),
+                    max_pending=config('STATUS_WRITER_MAX_PENDING', default=10000, cast=int),
+                )
+    return _status_writer
 
-    query = "DROP TABLE IF EXISTS status"
-    cursor.execute(query)
-    conn.commit()
 
-    query = ("CREATE TABLE status (DATE_ID DATE, TOTAL INT, CURED INT, DEAD INT, SICK INT)")
-    cursor.execute(query)
-    conn.commit()
+def flush_status_values():
+    if _status_writer is not None:
+        _status_writer.flush()
 
-    cursor.close()
-    conn.close()
 
+def close_status_writer():
+    global _status_writer
+    if _status_writer is not None:
+        _status_writer.close()
+        _status_writer = None
 
-def store_status_values(healthy_people, immune, deaths, sick, counter):
-    conn = helperfunctions.get_db_connection()
-    cursor = conn.cursor()
 
-    query = ("INSERT INTO status (DATE_ID, TOTAL, CURED, DEAD, SICK) "
-             "VALUES (%s, %s, %s, %s, %s)")
-    values = (get_current_date(counter), healthy_people, immune, deaths, sick)
+def get_current_run_id():
+    global _current_run_id
+    if _current_run_id is None:
+        _current_run_id = run_history.start_run()
+    return _current_run_id
 
-    cursor.execute(query, values)
-    conn.commit()
 
-    cursor.close()
-    conn.close()
+def del_status_values(parameters=None):
+    # Starts a new run instead of dropping the status table, so earlier runs stay queryable.
+    global _run_start_date, _current_run_id
+    # Rows still buffered from the previous run must land before it is closed.
+    flush_status_values()
+    _run_start_date = date.today()
+    _current_run_id = run_history.start_run(parameters)
+    try:
+        run_history.apply_retention()
+    except Exception as e:
+        print(f"Error applying run history retention: {e}")
+    return _current_run_id
+
+
+def store_status_values(healthy_people, immune, deaths, sick, counter):
+    get_status_writer().write((get_current_run_id(), get_current_date(counter), healthy_people, immune, deaths, sick))
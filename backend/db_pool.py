@@ -0,0 +1,227 @@
+import os
+import queue
+import threading
+import time
+
+import mysql.connector
+from decouple import config
+
+
+class PoolExhaustedError(Exception):
+    pass
+
+
+class PooledConnection:
+    """Wraps a raw connection so that close() hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw = raw
+        self._released = False
+
+    def __getattr__(self, name):
+        if name in ('_pool', '_raw', '_released'):
+            raise AttributeError(name)
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        if not self._released:
+            self._released = True
+            self._pool.release(self._raw)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    def __init__(self, db_config, pool_size=5, max_overflow=10, timeout=10.0, recycle=3600, ping_interval=30.0):
+        self.db_config = db_config
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        self.timeout = timeout
+        self.recycle = recycle
+        self.ping_interval = ping_interval
+        self._reset_state()
+
+    def _reset_state(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._idle = queue.LifoQueue()
+        self._opened = 0
+        # id(raw) -> (created_at, last_checked_at)
+        self._meta = {}
+        self._stats = {
+            'checkouts': 0,
+            'connects': 0,
+            'health_check_failures': 0,
+            'timeouts': 0,
+            'wait_total_ms': 0.0,
+            'wait_max_ms': 0.0,
+        }
+
+    def _check_fork(self):
+        # Connections inherited from a parent process share its sockets, so a
+        # forked worker must never reuse them; it starts over with an empty pool.
+        if self._pid != os.getpid():
+            self._reset_state()
+
+    def _connect(self):
+        raw = mysql.connector.connect(**self.db_config)
+        now = time.monotonic()
+        with self._lock:
+            self._meta[id(raw)] = (now, now)
+            self._stats['connects'] += 1
+        return raw
+
+    def _discard(self, raw):
+        with self._lock:
+            self._opened -= 1
+            self._meta.pop(id(raw), None)
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, raw):
+        created_at, checked_at = self._meta.get(id(raw), (0.0, 0.0))
+        now = time.monotonic()
+        if self.recycle and now - created_at > self.recycle:
+            return False
+        if now - checked_at < self.ping_interval:
+            return True
+        try:
+            raw.ping(reconnect=False)
+        except Exception:
+            return False
+        with self._lock:
+            self._meta[id(raw)] = (created_at, now)
+        return True
+
+    def acquire(self):
+        self._check_fork()
+        started = time.monotonic()
+        deadline = started + self.timeout
+        raw = None
+        while raw is None:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_open = self._opened < self.pool_size + self.max_overflow
+                    if can_open:
+                        self._opened += 1
+                if can_open:
+                    try:
+                        raw = self._connect()
+                    except Exception:
+                        with self._lock:
+                            self._opened -= 1
+                        raise
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    with self._lock:
+                        self._stats['timeouts'] += 1
+                    raise PoolExhaustedError(
+                        f"No database connection available within {self.timeout}s "
+                        f"(pool_size={self.pool_size}, max_overflow={self.max_overflow})")
+                try:
+                    raw = self._idle.get(timeout=remaining)
+                except queue.Empty:
+                    continue
+
+            if not self._is_healthy(raw):
+                with self._lock:
+                    self._stats['health_check_failures'] += 1
+                self._discard(raw)
+                raw = None
+
+        waited_ms = (time.monotonic() - started) * 1000
+        with self._lock:
+            self._stats['checkouts'] += 1
+            self._stats['wait_total_ms'] += waited_ms
+            self._stats['wait_max_ms'] = max(self._stats['wait_max_ms'], waited_ms)
+        return PooledConnection(self, raw)
+
+    def release(self, raw):
+        if self._pid != os.getpid():
+            return
+        try:
+            # Ends any implicit read transaction so the next borrower does not
+            # see a stale REPEATABLE READ snapshot.
+            raw.rollback()
+        except Exception:
+            self._discard(raw)
+            return
+        with self._lock:
+            overflow = self._opened > self.pool_size
+        if overflow:
+            self._discard(raw)
+        else:
+            self._idle.put(raw)
+
+    def dispose(self):
+        while True:
+            try:
+                raw = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(raw)
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['opened'] = self._opened
+        stats['idle'] = self._idle.qsize()
+        stats['in_use'] = stats['opened'] - stats['idle']
+        stats['wait_avg_ms'] = stats['wait_total_ms'] / stats['checkouts'] if stats['checkouts'] else 0.0
+        return stats
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                db_config = {
+                    'host': config('HOST'),
+                    'user': config('USER'),
+                    'password': config('PASSWORD'),
+                    'database': config('DATABASE')
+                }
+                _pool = ConnectionPool(
+                    db_config,
+                    pool_size=config('DB_POOL_SIZE', default=5, cast=int),
+                    max_overflow=config('DB_POOL_MAX_OVERFLOW', default=10, cast=int),
+                    timeout=config('DB_POOL_TIMEOUT', default=10.0, cast=float),
+                    recycle=config('DB_POOL_RECYCLE', default=3600, cast=int),
+                    ping_interval=config('DB_POOL_PING_INTERVAL', default=30.0, cast=float),
+                )
+    return _pool
+
+
+def pool_stats():
+    return get_pool().stats()
+
+
+if hasattr(os, 'register_at_fork'):
+    def _drop_pool_in_child():
+        global _pool_lock
+        _pool_lock = threading.Lock()
+        if _pool is not None:
+            _pool._reset_state()
+
+    os.register_at_fork(after_in_child=_drop_pool_in_child)
@@ -0,0 +1,156 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from constants import BY_ID
+
+# Columns counted as currently infected and as ever infected; missing ones are skipped.
+ACTIVE_COLUMNS = ('INCUBATING', 'SICK')
+EVER_INFECTED_COLUMNS = ('INCUBATING', 'SICK', 'CURED', 'DEAD')
+STATE_COLUMNS = ('HEALTHY', 'INCUBATING', 'SICK', 'CURED', 'DEAD', 'VACCINATED')
+
+# Growth rates are smoothed over a week; within +-PLATEAU_RATE per day a phase counts as a plateau.
+SMOOTHING_DAYS = 7
+PLATEAU_RATE = 0.01
+# Phases shorter than this are merged into the one before, and at most MAX_PHASES are reported.
+MIN_PHASE_DAYS = 5
+# Days with fewer active infections than this share of the population (at least 10 agents) are
+# a 'negligible' phase; log growth rates of a handful of agents are noise.
+NEGLIGIBLE_SHARE = 0.0005
+MAX_PHASES = 6
+# Evenly spaced samples of the curves, so the digest size does not depend on the run length.
+CURVE_POINTS = 12
+DECIMALS = 4
+
+
+def _column(df, name):
+    return df[name].to_numpy(dtype=np.float64) if name in df.columns else None
+
+
+def _sum(df, names):
+    columns = [_column(df, name) for name in names if name in df.columns]
+    return np.sum(columns, axis=0) if columns else None
+
+
+def _round(value):
+    if isinstance(value, dict):
+        return {key: _round(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_round(item) for item in value]
+    if isinstance(value, (float, np.floating)):
+        return None if not np.isfinite(value) else round(float(value), DECIMALS)
+    if isinstance(value, np.integer):
+        return int(value)
+    return value
+
+
+def growth_rates(values, window=SMOOTHING_DAYS):
+    """Daily log growth rate of a series, smoothed with a centered moving average; one value per day."""
+    log_values = np.log(np.maximum(values, 1.0))
+    rates = np.diff(log_values, prepend=log_values[0])
+    if len(rates) < window:
+        return rates
+    kernel = np.ones(window) / window
+    padded = np.pad(rates, (window // 2, window - 1 - window // 2), mode='edge')
+    return np.convolve(padded, kernel, mode='valid')
+
+
+def phases(days, rates, negligible, threshold=PLATEAU_RATE, min_days=MIN_PHASE_DAYS):
+    """Runs of growth, plateau, decline and negligible spread as [phase, first day, last day, mean daily rate]."""
+    labels = np.where(rates > threshold, 1, np.where(rates < -threshold, -1, 0))
+    labels[negligible] = 2
+    starts = np.flatnonzero(np.diff(labels, prepend=labels[0] - 1))
+    ends = np.append(starts[1:], len(labels))
+    runs = []
+    for start, end in zip(starts, ends):
+        if runs and (end - start < min_days or runs[-1][0] == labels[start]):
+            runs[-1][2] = end
+            continue
+        runs.append([labels[start], start, end])
+    names = {1: 'growth', 0: 'plateau', -1: 'decline', 2: 'negligible'}
+    result = [[names[label], days[start], days[end - 1], rates[start:end].mean()] for label, start, end in runs]
+    if len(result) > MAX_PHASES:
+        # Keep the longest phases, in order, so a noisy tail cannot grow the payload.
+        longest = sorted(np.argsort([row[2] - row[1] for row in result])[-MAX_PHASES:])
+        result = [result[i] for i in longest]
+    return result
+
+
+def _sample(days, values, population):
+    positions = np.linspace(days[0], days[-1], CURVE_POINTS)
+    return (np.interp(positions, days, values) / population * 100).tolist()
+
+
+def simulation_digest(df):
+    """Fixed-size statistical summary of a simulation run; None when there is nothing to summarize.
+
+    Everything is computed from the full run in whole-array operations, and the same rows
+    always give the same digest, so it can key the analysis cache.
+    """
+    if df is None or df.empty or BY_ID not in df.columns:
+        return None
+    df = df.apply(pd.to_numeric, errors='coerce').dropna(subset=[BY_ID])
+    df = df.drop_duplicates(subset=[BY_ID], keep='last').sort_values(BY_ID).fillna(0)
+    active = _sum(df, ACTIVE_COLUMNS)
+    if active is None or len(df) < 2:
+        return None
+    days = df[BY_ID].to_numpy(dtype=np.float64)
+
+    states = _sum(df, STATE_COLUMNS)
+    population = float(states.max()) if states is not None and states.max() > 0 else float(active.max() or 1)
+    ever_infected = _sum(df, EVER_INFECTED_COLUMNS)
+    dead = _column(df, 'DEAD')
+    cured = _column(df, 'CURED')
+    sick = _column(df, 'SICK')
+
+    peak = int(np.argmax(active))
+    rates = growth_rates(active)
+    early = rates[:peak + 1]
+    growing = early[early > PLATEAU_RATE]
+    max_rate = float(growing.max()) if growing.size else 0.0
+    typical_rate = float(np.median(growing)) if growing.size else 0.0
+    run_phases = phases(days, rates, active < max(10.0, NEGLIGIBLE_SHARE * population))
+    final = run_phases[-1] if run_phases else None
+
+    digest = {
+        'days': len(days),
+        'first_day': days[0],
+        'last_day': days[-1],
+        'population': population,
+        'peak': {
+            'day': days[peak],
+            'active': active[peak],
+            'active_percent': active[peak] / population * 100,
+            'sick': sick[peak] if sick is not None else None,
+        },
+        'growth': {
+            'max_daily_rate': max_rate,
+            'median_daily_rate': typical_rate,
+            'doubling_time_days': np.log(2) / typical_rate if typical_rate > 0 else None,
+            'fastest_doubling_days': np.log(2) / max_rate if max_rate > 0 else None,
+        },
+        'attack_rate_percent': ever_infected[-1] / population * 100 if ever_infected is not None else None,
+        'final_active_percent': active[-1] / population * 100,
+        'deaths': dead[-1] if dead is not None else None,
+        'case_fatality_percent': (dead[-1] / (dead[-1] + cured[-1]) * 100
+                                  if dead is not None and cured is not None and dead[-1] + cured[-1] > 0 else None),
+        'infection_fatality_percent': (dead[-1] / ever_infected[-1] * 100
+                                       if dead is not None and ever_infected is not None and ever_infected[-1] > 0 else None),
+        'phases': run_phases,
+        'plateau': {
+            'detected': bool(final is not None and final[0] == 'plateau' and final[2] - final[1] + 1 >= MIN_PHASE_DAYS),
+            'since_day': final[1] if final is not None and final[0] == 'plateau' else None,
+        },
+        'curves_percent_of_population': {
+            'active': _sample(days, active, population),
+            'dead': _sample(days, dead, population) if dead is not None else None,
+        },
+    }
+    return _round(digest)
+
+
+def digest_json(df):
+    """The digest as compact JSON with sorted keys, or None."""
+    digest = simulation_digest(df)
+    return json.dumps(digest, sort_keys=True, separators=(',', ':')) if digest is not None else None
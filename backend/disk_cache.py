@@ -0,0 +1,170 @@
+import io
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401 - only needed for DataFrame.to_parquet
+    FRAME_FORMAT = 'parquet'
+except ImportError:
+    FRAME_FORMAT = 'pickle'
+
+CREATE_ENTRIES = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    tag TEXT NOT NULL,
+    version TEXT NOT NULL,
+    format TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    accessed REAL NOT NULL,
+    payload BLOB NOT NULL
+)
+"""
+
+# Eviction only needs a rough order, so reads refresh an entry's stamp at most this often.
+ACCESS_RESOLUTION = 60.0
+
+
+def encode(value):
+    """(format, bytes) for a DataFrame (parquet, or pickle without pyarrow) or already serialized bytes."""
+    if isinstance(value, (bytes, bytearray)):
+        return 'bytes', bytes(value)
+    if FRAME_FORMAT == 'parquet':
+        buffer = io.BytesIO()
+        value.to_parquet(buffer, index=True)
+        return 'parquet', buffer.getvalue()
+    return 'pickle', pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def decode(value_format, payload):
+    if value_format == 'bytes':
+        return payload
+    if value_format == 'parquet':
+        return pd.read_parquet(io.BytesIO(payload))
+    return pickle.loads(payload)
+
+
+class DiskCache:
+    """Cache shared by every worker process on the host, kept in one SQLite file.
+
+    Entries are stored with the version fingerprint they were computed for and are only
+    returned for that version. A write is one SQLite transaction, so readers in other
+    processes see either the old entry or the new one, never a partial write. When the
+    payloads exceed max_bytes the least recently read entries are evicted.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.execute(CREATE_ENTRIES)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed ON entries (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tag ON entries (tag)")
+
+    def _connection(self):
+        return _Transaction(self._raw_connection())
+
+    def _raw_connection(self):
+        # One connection per thread and process; SQLite connections must not cross a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _key(key):
+        return repr(key)
+
+    @staticmethod
+    def _tag(key):
+        return str(key[0] if isinstance(key, tuple) else key)
+
+    def get(self, key, version):
+        if version is None:
+            return None
+        # A plain read: under WAL it runs alongside other readers and writers.
+        row = self._raw_connection().execute("SELECT version, format, payload, accessed FROM entries WHERE key = ?",
+                                             (self._key(key),)).fetchone()
+        if row is None or row[0] != repr(version):
+            return None
+        self._touch(key, row[3])
+        try:
+            return decode(row[1], row[2])
+        except Exception as e:
+            print(f"Dropping unreadable disk cache entry {key}: {e}")
+            self.invalidate(key)
+            return None
+
+    def _touch(self, key, accessed):
+        """Refresh the LRU stamp at most once per ACCESS_RESOLUTION seconds, skipping it if the database is busy."""
+        now = time.time()
+        if now - accessed < ACCESS_RESOLUTION:
+            return
+        conn = self._raw_connection()
+        try:
+            conn.execute("PRAGMA busy_timeout = 0")
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, self._key(key)))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.execute("PRAGMA busy_timeout = 30000")
+
+    def put(self, key, version, value):
+        value_format, payload = encode(value)
+        if len(payload) > self.max_bytes:
+            return
+        with self._connection() as conn:
+            conn.execute("REPLACE INTO entries (key, tag, version, format, size, accessed, payload) "
+                         "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                         (self._key(key), self._tag(key), repr(version), value_format, len(payload),
+                          time.time(), payload))
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def invalidate(self, key=None):
+        """Drop one entry, every entry of a table (by name), or everything."""
+        with self._connection() as conn:
+            if key is None:
+                conn.execute("DELETE FROM entries")
+            else:
+                conn.execute("DELETE FROM entries WHERE key = ? OR tag = ?", (self._key(key), str(key)))
+
+    def stats(self):
+        with self._connection() as conn:
+            entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries").fetchone()
+        return {'path': self.path, 'entries': entries, 'bytes': size, 'max_bytes': self.max_bytes,
+                'frame_format': FRAME_FORMAT}
+
+
+class _Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        self.conn.execute("BEGIN IMMEDIATE")
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute("COMMIT" if exc_type is None else "ROLLBACK")
+        return False
@@ -0,0 +1,335 @@
+import io
+import json
+import math
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+# Agent states. Every agent is in exactly one, so the per-day counts add up to the population.
+SUSCEPTIBLE = 0
+INCUBATING = 1
+SICK = 2
+CURED = 3
+DEAD = 4
+VACCINATED = 5
+
+STATE_COLUMNS = ['HEALTHY', 'INCUBATING', 'SICK', 'CURED', 'DEAD', 'VACCINATED']
+OUTPUT_COLUMNS = ['DAY_INCREMENT'] + STATE_COLUMNS
+
+# Model constants that are not exposed as page parameters.
+CONTACTS_PER_VISIT = 10
+MASK_EFFICACY = 0.5
+VACCINE_EFFICACY = 0.9
+DAILY_VACCINATION_RATE = 0.01
+BASE_CASE_FATALITY = 0.01
+DAYS_PER_MONTH = 30
+
+DEFAULT_PARAMETERS = {
+    'numberOfAgentsParam': 100000,
+    'numberOfSickAtStartParam': 100,
+    'simPeriodParam': 3,
+    'standardIncubationTimeDiseaseParam': 6,
+    'chanceToTransmitDiseaseParam': 20,
+    'healingTimeDiseaseParam': 15,
+    'initialChanceToHealParam': 0,
+    'initialChanceToKillParam': 0,
+    'chanceForAsymptomaticParam': 5,
+    'chanceToGoOutParam': 40,
+    'chanceToSelfQuarantineParam': 95,
+    'agentsAtCentralLocation_atSameTimeParam': 100,
+    'maskDistributionTimeParam': 45,
+    'maskCooldownTimeParam': 25,
+    'maskUse': False,
+    'vaccineDistributionTimeParam': 50,
+    'vaccineEnforced': False,
+}
+
+# Parameters that size the population or the run; they only take effect on reset().
+STRUCTURAL_PARAMETERS = ('numberOfAgentsParam', 'numberOfSickAtStartParam', 'simPeriodParam')
+
+
+def merge_parameters(parameters=None):
+    merged = dict(DEFAULT_PARAMETERS)
+    for key, value in (parameters or {}).items():
+        if key in merged and value is not None:
+            merged[key] = value
+    return merged
+
+
+def _json_native(value):
+    # Parameters may hold numpy scalars or arrays (e.g. from calibration); store them as the
+    # numbers and lists they are rather than their string form, so from_checkpoint gets them back.
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class EpidemicModel:
+    """Agent-based epidemic model whose agents live in NumPy arrays.
+
+    Each simulated day is one vectorized step over all agents: agents that go out
+    are dropped at random into central locations of limited capacity, susceptible
+    visitors are infected according to how many infectious agents share their
+    location, and disease progression (incubation, healing, death, quarantine,
+    masks, vaccination) is applied with boolean masks.
+    """
+
+    def __init__(self, parameters=None, seed=None):
+        self.parameters = merge_parameters(parameters)
+        self.seed = seed
+        self.reset()
+
+    def reset(self, seed=None):
+        if seed is not None:
+            self.seed = seed
+        p = self.parameters
+        self.rng = np.random.default_rng(self.seed)
+        n = int(p['numberOfAgentsParam'])
+        self.day = 0
+        self.total_days = int(p['simPeriodParam']) * DAYS_PER_MONTH
+        self.state = np.full(n, SUSCEPTIBLE, dtype=np.int8)
+        self.days_in_state = np.zeros(n, dtype=np.int16)
+        self.asymptomatic = np.zeros(n, dtype=bool)
+        self.quarantined = np.zeros(n, dtype=bool)
+        self.immune = self.rng.random(n) < p['initialChanceToHealParam'] / 100
+
+        sick_at_start = min(int(p['numberOfSickAtStartParam']), n)
+        patients_zero = self.rng.choice(n, size=sick_at_start, replace=False)
+        self.state[patients_zero] = SICK
+        self.asymptomatic[patients_zero] = self.rng.random(sick_at_start) < p['chanceForAsymptomaticParam'] / 100
+        self.history = []
+
+    def update_parameters(self, parameters):
+        for key, value in parameters.items():
+            if key in self.parameters and value is not None:
+                self.parameters[key] = value
+
+    @property
+    def finished(self):
+        return self.day >= self.total_days
+
+    def masks_active(self):
+        p = self.parameters
+        start = p['maskDistributionTimeParam']
+        return bool(p['maskUse']) and start <= self.day < start + p['maskCooldownTimeParam']
+
+    def counts(self):
+        counts = np.bincount(self.state, minlength=6)
+        return (self.day, int(counts[SUSCEPTIBLE]), int(counts[INCUBATING]), int(counts[SICK]),
+                int(counts[CURED]), int(counts[DEAD]), int(counts[VACCINATED]))
+
+    def _progress(self):
+        p = self.parameters
+        rng = self.rng
+        state = self.state
+        active = (state == INCUBATING) | (state == SICK)
+        self.days_in_state[active] += 1
+
+        onset = (state == INCUBATING) & (self.days_in_state >= p['standardIncubationTimeDiseaseParam'])
+        state[onset] = SICK
+        self.days_in_state[onset] = 0
+        symptomatic_onset = onset & ~self.asymptomatic
+        self.quarantined |= symptomatic_onset & (rng.random(state.size) < p['chanceToSelfQuarantineParam'] / 100)
+
+        resolved = (state == SICK) & (self.days_in_state >= p['healingTimeDiseaseParam'])
+        fatality = BASE_CASE_FATALITY + (1 - BASE_CASE_FATALITY) * float(p['initialChanceToKillParam'])
+        dies = resolved & ~self.asymptomatic & (rng.random(state.size) < fatality)
+        state[resolved] = CURED
+        state[dies] = DEAD
+        self.quarantined[resolved] = False
+
+    def _transmit(self):
+        p = self.parameters
+        rng = self.rng
+        state = self.state
+        n = state.size
+
+        goes_out = (state != DEAD) & ~self.quarantined & (rng.random(n) < p['chanceToGoOutParam'] / 100)
+        visitors = np.flatnonzero(goes_out)
+        if visitors.size == 0:
+            return np.empty(0, dtype=np.int64)
+
+        capacity = max(1, int(p['agentsAtCentralLocation_atSameTimeParam']))
+        locations = rng.integers(0, math.ceil(visitors.size / capacity), size=visitors.size)
+        infectious = (state[visitors] == SICK).astype(np.float64)
+        infectious_at = np.bincount(locations, weights=infectious)
+        visitors_at = np.bincount(locations)
+
+        beta = p['chanceToTransmitDiseaseParam'] / 100
+        if self.masks_active():
+            beta *= 1 - MASK_EFFICACY
+        pressure = CONTACTS_PER_VISIT * beta * infectious_at[locations] / visitors_at[locations]
+        infection_chance = -np.expm1(-pressure)
+
+        susceptible = (state[visitors] == SUSCEPTIBLE) & ~self.immune[visitors]
+        return visitors[susceptible & (rng.random(visitors.size) < infection_chance)]
+
+    def _vaccinate(self):
+        p = self.parameters
+        if not p['vaccineEnforced'] or self.day < p['vaccineDistributionTimeParam']:
+            return
+        candidates = np.flatnonzero((self.state == SUSCEPTIBLE) & ~self.immune)
+        doses = min(candidates.size, int(self.state.size * DAILY_VACCINATION_RATE))
+        if doses == 0:
+            return
+        vaccinated = self.rng.choice(candidates, size=doses, replace=False)
+        protected = vaccinated[self.rng.random(doses) < VACCINE_EFFICACY]
+        self.state[protected] = VACCINATED
+
+    def step(self):
+        """Advance one day and return that day's counts as a row of OUTPUT_COLUMNS."""
+        newly_infected = self._transmit()
+        self._progress()
+        self.state[newly_infected] = INCUBATING
+        self.days_in_state[newly_infected] = 0
+        self.asymptomatic[newly_infected] = (self.rng.random(newly_infected.size)
+                                             < self.parameters['chanceForAsymptomaticParam'] / 100)
+        self._vaccinate()
+        self.day += 1
+        row = self.counts()
+        self.history.append(row)
+        return row
+
+    def run(self, days=None):
+        days = self.total_days - self.day if days is None else days
+        for _ in range(days):
+            if self.finished:
+                break
+            self.step()
+        return self.history_frame()
+
+    def history_frame(self):
+        return pd.DataFrame(self.history, columns=OUTPUT_COLUMNS)
+
+    def checkpoint(self):
+        """Snapshot the full model state (agents, RNG, day, history) as compressed bytes."""
+        seed = int(self.seed) if isinstance(self.seed, (int, np.integer)) else None
+        meta = {'day': self.day, 'total_days': self.total_days, 'seed': seed,
+                'parameters': self.parameters, 'rng': self.rng.bit_generator.state}
+        buffer = io.BytesIO()
+        np.savez_compressed(buffer,
+                            meta=np.frombuffer(json.dumps(meta, default=_json_native).encode('utf-8'), dtype=np.uint8),
+                            state=self.state,
+                            days_in_state=self.days_in_state,
+                            flags=np.packbits(np.stack([self.asymptomatic, self.quarantined, self.immune])),
+                            history=np.asarray(self.history, dtype=np.int64).reshape(-1, len(OUTPUT_COLUMNS)))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_checkpoint(cls, data, parameters=None):
+        """Rebuild a model from checkpoint() bytes, optionally continuing with changed parameters.
+
+        The population is fixed by the checkpoint, so of the structural parameters only
+        simPeriodParam can be changed (to extend or shorten the run).
+        """
+        with np.load(io.BytesIO(data)) as arrays:
+            meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+            state = arrays['state'].copy()
+            days_in_state = arrays['days_in_state'].copy()
+            flags = np.unpackbits(arrays['flags'], count=3 * state.size).reshape(3, state.size).astype(bool)
+            history = [tuple(int(value) for value in row) for row in arrays['history']]
+
+        model = cls.__new__(cls)
+        model.parameters = merge_parameters(meta['parameters'])
+        model.seed = meta['seed']
+        model.rng = np.random.default_rng()
+        model.rng.bit_generator.state = meta['rng']
+        model.day = meta['day']
+        model.total_days = meta['total_days']
+        model.state = state
+        model.days_in_state = days_in_state
+        model.asymptomatic, model.quarantined, model.immune = flags
+        model.history = history
+        if parameters:
+            model.update_parameters({key: value for key, value in parameters.items()
+                                     if key not in STRUCTURAL_PARAMETERS})
+            if parameters.get('simPeriodParam') is not None:
+                model.parameters['simPeriodParam'] = parameters['simPeriodParam']
+                model.total_days = int(parameters['simPeriodParam']) * DAYS_PER_MONTH
+        return model
+
+
+class SimulationEngine:
+    """Runs an EpidemicModel on a background thread behind start/pause/resume/reset controls.
+
+    on_day(row) is called for every simulated day; on_start(parameters) is called when
+    a run starts and its return value is kept as run_id.
+    """
+
+    def __init__(self, parameters=None, on_day=None, on_start=None, on_finish=None, day_delay=0.0, seed=None):
+        self.parameters = merge_parameters(parameters)
+        self.on_day = on_day
+        self.on_start = on_start
+        self.on_finish = on_finish
+        self.day_delay = day_delay
+        self.seed = seed
+        self.model = None
+        self.run_id = None
+        self._thread = None
+        self._running = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self):
+        return self._thread is not None and self._thread.is_alive() and self._running.is_set()
+
+    def start(self):
+        self.reset()
+        with self._lock:
+            self.model = EpidemicModel(self.parameters, seed=self.seed)
+            self.run_id = self.on_start(dict(self.parameters)) if self.on_start else None
+            self._stop.clear()
+            self._running.set()
+            self._thread = threading.Thread(target=self._loop, name='epidemic-engine', daemon=True)
+            self._thread.start()
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._running.set()
+
+    def reset(self):
+        thread = self._thread
+        self._stop.set()
+        self._running.set()
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._lock:
+            self._thread = None
+            self.model = None
+            self._running.clear()
+
+    def checkpoint(self):
+        """Checkpoint of the running model, taken between two days; None if nothing is running."""
+        with self._lock:
+            return self.model.checkpoint() if self.model is not None else None
+
+    def update_parameters(self, parameters):
+        with self._lock:
+            self.parameters.update({key: value for key, value in parameters.items() if key in self.parameters})
+            if self.model is not None:
+                self.model.update_parameters({key: value for key, value in parameters.items()
+                                              if key not in STRUCTURAL_PARAMETERS})
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._running.wait()
+            if self._stop.is_set():
+                break
+            with self._lock:
+                if self.model is None or self.model.finished:
+                    break
+                row = self.model.step()
+            if self.on_day is not None:
+                self.on_day(self.run_id, row)
+            if self.day_delay:
+                time.sleep(self.day_delay)
+        if self.on_finish is not None and not self._stop.is_set():
+            self.on_finish(self.run_id)
@@ -0,0 +1,166 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from backend.engine import EpidemicModel, OUTPUT_COLUMNS
+
+BAND_METRICS = ['SICK', 'DEAD', 'CURED']
+PERCENTILES = (5, 50, 95)
+# How often a running ensemble checks its cancel flag.
+CANCEL_POLL_SECONDS = 0.2
+# Finished jobs are forgotten after this long, as in analysis.
+JOB_TTL_SECONDS = 3600
+
+
+def process_pool(workers):
+    # spawn keeps worker start-up independent of the threads and sockets of a web worker.
+    return ProcessPoolExecutor(max_workers=max(1, workers), mp_context=multiprocessing.get_context('spawn'))
+
+
+def seed_streams(base_seed, runs):
+    """Independent, reproducible RNG seeds: run i always gets the same stream for a given base_seed."""
+    return np.random.SeedSequence(base_seed).spawn(runs)
+
+
+def run_member(parameters, seed):
+    """Run one ensemble member and return its (days x metrics) curves."""
+    model = EpidemicModel(parameters, seed=seed)
+    model.run()
+    history = np.asarray(model.history, dtype=np.int64)
+    indices = [OUTPUT_COLUMNS.index(metric) for metric in BAND_METRICS]
+    return history[:, indices]
+
+
+def percentile_bands(curves):
+    """Collapse (runs x days x metrics) curves into a frame of per-day p5/p50/p95 per metric."""
+    stacked = np.stack(curves)
+    bands = np.percentile(stacked, PERCENTILES, axis=0)
+    frame = {'DAY_INCREMENT': np.arange(1, stacked.shape[1] + 1)}
+    for m, metric in enumerate(BAND_METRICS):
+        for p, percentile in enumerate(PERCENTILES):
+            frame[f'{metric}_P{percentile}'] = bands[p, :, m]
+    return pd.DataFrame(frame)
+
+
+def run_ensemble(parameters, runs=20, base_seed=0, workers=None, on_update=None, cancel=None):
+    """Run `runs` seeds of one parameter set across a process pool.
+
+    on_update(bands, completed, runs) is called each time a member finishes, with the
+    bands over all members finished so far, so callers can show them while the rest run.
+    Results do not depend on the number of workers or the order runs finish in.
+    """
+    workers = workers or os.cpu_count() or 1
+    seeds = seed_streams(base_seed, runs)
+    curves = [None] * runs
+    completed = 0
+    pool = process_pool(min(workers, runs))
+    cancelled = False
+    try:
+        futures = {pool.submit(run_member, parameters, seed): i for i, seed in enumerate(seeds)}
+        pending = set(futures)
+        while pending:
+            # Wake up regularly so a cancel does not wait for the next member to finish.
+            done, pending = wait(pending, timeout=CANCEL_POLL_SECONDS, return_when=FIRST_COMPLETED)
+            for future in done:
+                curves[futures[future]] = future.result()
+                completed += 1
+                if on_update is not None:
+                    on_update(percentile_bands([c for c in curves if c is not None]), completed, runs)
+            if cancel is not None and cancel.is_set():
+                cancelled = True
+                break
+    finally:
+        # On cancel, drop the queued members and do not wait for the running ones.
+        pool.shutdown(wait=not cancelled, cancel_futures=True)
+    finished = [c for c in curves if c is not None]
+    return percentile_bands(finished) if finished else None
+
+
+def run_branch(checkpoint, parameters):
+    return EpidemicModel.from_checkpoint(checkpoint, parameters).run()
+
+
+def run_branches(checkpoint, scenarios, workers=None):
+    """Continue one checkpoint under several parameter sets in parallel.
+
+    scenarios maps a branch name to the parameters it changes, e.g.
+    {'masks': {'maskUse': True, 'maskDistributionTimeParam': 40}}. Every branch starts
+    from the same agents and RNG state, so only the days after the checkpoint are
+    simulated and differences between branches come from the changed parameters alone.
+    Returns {name: history frame}, each including the days shared before the fork.
+    """
+    if not scenarios:
+        return {}
+    workers = workers or os.cpu_count() or 1
+    with process_pool(min(workers, len(scenarios))) as pool:
+        futures = {name: pool.submit(run_branch, checkpoint, parameters) for name, parameters in scenarios.items()}
+        return {name: future.result() for name, future in futures.items()}
+
+
+class EnsembleJob:
+    def __init__(self, parameters, runs, base_seed, workers):
+        self.id = uuid.uuid4().hex
+        self.parameters = parameters
+        self.runs = runs
+        self.completed = 0
+        self.bands = None
+        self.error = None
+        self.done = False
+        self.finished = None
+        self.cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(base_seed, workers), daemon=True)
+
+    def _update(self, bands, completed, runs):
+        self.bands = bands
+        self.completed = completed
+
+    def _run(self, base_seed, workers):
+        try:
+            bands = run_ensemble(self.parameters, self.runs, base_seed, workers,
+                                 on_update=self._update, cancel=self.cancel)
+            if bands is not None:
+                self.bands = bands
+        except Exception as e:
+            self.error = str(e)
+            print(f"Ensemble {self.id} failed: {e}")
+        finally:
+            self.finished = time.time()
+            self.done = True
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _expire_jobs():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished is not None and job.finished < cutoff]:
+        del _jobs[job_id]
+
+
+def start_ensemble(parameters, runs=20, base_seed=0, workers=None, replaces=None):
+    """Run an ensemble in the background and return its job id.
+
+    replaces is the caller's previous job id; that job (and only that one) is cancelled,
+    so one user starting a new ensemble never stops another user's.
+    """
+    job = EnsembleJob(parameters, runs, base_seed, workers)
+    with _jobs_lock:
+        previous = _jobs.get(replaces) if replaces else None
+        if previous is not None:
+            previous.cancel.set()
+        _expire_jobs()
+        _jobs[job.id] = job
+    job._thread.start()
+    return job.id
+
+
+def get_ensemble(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,96 @@
+import json
+import threading
+from collections import OrderedDict
+
+from decouple import config
+
+from backend import helperfunctions
+from backend.table_cache import TableCache
+
+# orjson is an optional dependency (pip install orjson): plotly and this module use it for
+# faster figure JSON when it is installed, and fall back to the standard library otherwise.
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# Serialized figures keyed by chart inputs; each entry is revalidated against the versions of
+# the tables it was drawn from, so new data redraws the chart and repeat views reuse the bytes.
+figure_cache = TableCache(
+    max_bytes=config('FIGURE_CACHE_MAX_MB', default=64, cast=int) * 1024 * 1024,
+    max_entries=config('FIGURE_CACHE_MAX_ENTRIES', default=512, cast=int),
+    revalidate_after=config('TABLE_CACHE_REVALIDATE_SECONDS', default=2.0, cast=float),
+    sizeof=len,
+    shared=helperfunctions.shared_cache,
+)
+
+# Decoded figures for the most recently served cache entries, keyed like figure_cache and
+# stored with the exact bytes object they were decoded from. While figure_cache keeps
+# returning that object the entry is current, so a hit skips decoding; once the bytes are
+# replaced (new data, or loaded from the shared cache) the figure is decoded again.
+DECODED_ENTRIES = config('FIGURE_CACHE_DECODED_ENTRIES', default=64, cast=int)
+_decoded = OrderedDict()
+_decoded_lock = threading.Lock()
+
+
+def serialize(fig):
+    return fig.to_json(engine='orjson' if orjson is not None else 'json').encode('utf-8')
+
+
+def deserialize(data):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+    return value
+
+
+def tables_version(tables):
+    versions = tuple(helperfunctions.fetch_table_version(table) for table in tables)
+    return None if any(version is None for version in versions) else versions
+
+
+def cached_figure(name, inputs, tables, build):
+    """Figure for a chart, built by build() only when these inputs were not drawn for the current data.
+
+    Returns the figure as a plain dict decoded from the cached JSON, which Dash sends without
+    going through pandas or plotly's figure validation again; repeat hits get the same dict
+    without decoding it again, so callers must not modify it. build() may return None to
+    signal that there is nothing to draw; that result is not cached.
+    """
+    key = ('figure', name, _freeze(inputs))
+
+    def load():
+        fig = build()
+        return serialize(fig) if fig is not None else None
+
+    data = helperfunctions.table_loads.do(
+        key, lambda: figure_cache.get(key, lambda: tables_version(tables), load))
+    if data is None:
+        return None
+    with _decoded_lock:
+        entry = _decoded.get(key)
+        if entry is not None and entry[0] is data:
+            _decoded.move_to_end(key)
+            return entry[1]
+    figure = deserialize(data)
+    with _decoded_lock:
+        _decoded[key] = (data, figure)
+        _decoded.move_to_end(key)
+        while len(_decoded) > DECODED_ENTRIES:
+            _decoded.popitem(last=False)
+    return figure
+
+
+def invalidate_figures():
+    figure_cache.invalidate('figure')
+    with _decoded_lock:
+        _decoded.clear()
+
+
+def get_figure_cache_stats():
+    return figure_cache.stats()
@@ -0,0 +1,131 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from decouple import config
+
+# Points per trace sent to the browser; about one per horizontal pixel of a full-width chart.
+MAX_POINTS = config('FIGURE_MAX_POINTS', default=2000, cast=int)
+# Traces with more raw points than this are drawn with WebGL instead of SVG.
+WEBGL_THRESHOLD = config('FIGURE_WEBGL_THRESHOLD', default=5000, cast=int)
+
+
+def _nanoseconds(dates):
+    return dates.astype('datetime64[ns]').astype('int64').to_numpy(dtype=np.float64)
+
+
+def _numeric(values):
+    """x values as floats: numbers as they are, dates (or date strings from relayoutData) as epoch ns."""
+    values = pd.Series(values)
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return _nanoseconds(values)
+    if not pd.api.types.is_numeric_dtype(values):
+        converted = pd.to_datetime(values, errors='coerce')
+        if converted.notna().all():
+            return _nanoseconds(converted)
+    return pd.to_numeric(values, errors='coerce').to_numpy(dtype=np.float64)
+
+
+def lttb_indices(x, y, threshold):
+    """Largest-Triangle-Three-Buckets: indices of `threshold` points that keep the visual shape.
+
+    Each bucket keeps the point forming the largest triangle with the previously kept point
+    and the average of the next bucket, so peaks and troughs survive the reduction.
+    """
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        next_end = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        average_x = x[end:next_end].mean()
+        average_y = y[end:next_end].mean()
+        area = np.abs((x[previous] - average_x) * (y[start:end] - y[previous])
+                      - (x[previous] - x[start:end]) * (average_y - y[previous]))
+        previous = start + int(np.argmax(area))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def minmax_indices(y, threshold):
+    """Indices of the minimum and maximum of each of threshold/2 equal buckets, plus both ends."""
+    n = len(y)
+    if threshold >= n or threshold < 4:
+        return np.arange(n)
+    buckets = pd.Series(y).groupby(np.arange(n) * ((threshold - 2) // 2) // n)
+    indices = np.concatenate([[0, n - 1], buckets.idxmin().dropna().to_numpy(), buckets.idxmax().dropna().to_numpy()])
+    return np.unique(indices.astype(np.int64))
+
+
+def downsample(x, y, max_points=None, method='lttb'):
+    """Reduce one series to at most max_points points; NaN points are dropped first."""
+    max_points = max_points or MAX_POINTS
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    y_values = pd.to_numeric(y, errors='coerce').to_numpy(dtype=np.float64)
+    finite = np.flatnonzero(np.isfinite(y_values))
+    if len(finite) <= max_points:
+        return x.iloc[finite], y.iloc[finite]
+    if method == 'minmax':
+        keep = minmax_indices(y_values[finite], max_points)
+    else:
+        keep = lttb_indices(_numeric(x.iloc[finite]), y_values[finite], max_points)
+    rows = finite[keep]
+    return x.iloc[rows], y.iloc[rows]
+
+
+def downsample_frame(df, x_column, columns, max_points=None):
+    """Rows of df that keep the peaks of every column, for charts whose traces must share x (stacked areas)."""
+    max_points = max_points or MAX_POINTS
+    if len(df) <= max_points:
+        return df
+    per_column = max(4, max_points // max(len(columns), 1))
+    rows = np.unique(np.concatenate([
+        minmax_indices(pd.to_numeric(df[col], errors='coerce').to_numpy(dtype=np.float64), per_column)
+        for col in columns]))
+    return df.iloc[rows]
+
+
+def clip_to_range(x, x_range):
+    """Boolean mask of the points inside x_range, widened by one point on each side so lines reach the edges."""
+    if x_range is None:
+        return np.ones(len(x), dtype=bool)
+    values = _numeric(x)
+    low, high = (_numeric(pd.Series([bound]))[0] for bound in x_range)
+    inside = (values >= low) & (values <= high)
+    positions = np.flatnonzero(inside)
+    if positions.size:
+        inside[max(positions[0] - 1, 0)] = True
+        inside[min(positions[-1] + 1, len(inside) - 1)] = True
+    return inside
+
+
+def line_trace(x, y, name, x_range=None, max_points=None, method='lttb', **kwargs):
+    """A line trace with at most max_points points of the visible range, as WebGL for long series."""
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    visible = clip_to_range(x, x_range)
+    raw_points = int(visible.sum())
+    x, y = downsample(x[visible], y[visible], max_points, method)
+    trace_type = go.Scattergl if raw_points > WEBGL_THRESHOLD else go.Scatter
+    return trace_type(x=x, y=y, name=name, mode=kwargs.pop('mode', 'lines'), **kwargs)
+
+
+def parse_zoom(relayout_data):
+    """Read an x-axis zoom out of a graph's relayoutData.
+
+    Returns (changed, x_range): changed is False for events that do not touch the x axis
+    (autosize, legend clicks, y-only zoom); x_range is None when the axis was reset.
+    """
+    if not relayout_data:
+        return False, None
+    if relayout_data.get('xaxis.autorange'):
+        return True, None
+    if 'xaxis.range[0]' in relayout_data and 'xaxis.range[1]' in relayout_data:
+        return True, (relayout_data['xaxis.range[0]'], relayout_data['xaxis.range[1]'])
+    if 'xaxis.range' in relayout_data:
+        return True, tuple(relayout_data['xaxis.range'])
+    return False, None
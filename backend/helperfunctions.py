@@ -1,69 +1,205 @@
-import mysql.connector
 from decouple import config
 import pandas as pd
 import requests
-import openai
 import time
+from backend import db_pool, digest, schema
+from backend.table_cache import TableCache
+from backend.disk_cache import DiskCache
+from backend.singleflight import SingleFlight
 
 API_BASE_URL = "http://localhost:8080"
 
+# DISK_CACHE_PATH turns on a SQLite cache shared by all worker processes on the host,
+# behind the per-process caches of tables and figures.
+shared_cache = DiskCache(
+    config('DISK_CACHE_PATH'),
+    max_bytes=config('DISK_CACHE_MAX_MB', default=1024, cast=int) * 1024 * 1024,
+) if config('DISK_CACHE_PATH', default='') else None
+
+table_cache = TableCache(
+    max_bytes=config('TABLE_CACHE_MAX_MB', default=256, cast=int) * 1024 * 1024,
+    max_entries=config('TABLE_CACHE_MAX_ENTRIES', default=32, cast=int),
+    revalidate_after=config('TABLE_CACHE_REVALIDATE_SECONDS', default=2.0, cast=float),
+    shared=shared_cache,
+)
+
+table_loads = SingleFlight()
+
 
 def get_db_connection():
-    db_config = {
-        'host': config('HOST'),
-        'user': config('USER'),
-        'password': config('PASSWORD'),
-        'database': config('DATABASE')
-    }
-    return mysql.connector.connect(**db_config)
+    return db_pool.get_pool().acquire()
 
 
-def fetch_data_for_simulation():
+def get_db_pool_stats():
+    return db_pool.pool_stats()
+
+
+def fetch_data_for_simulation(run_id=None):
+    # run_id only matters when the simulation table carries a RUN_ID column; the latest run is the default.
     try:
-        conn = get_db_connection()
-        query = "SELECT * FROM simulation"
-        df = pd.read_sql(query, conn)
-        data_list = df.to_dict('records')
+        query, params = schema.build_select('simulation', run_id=run_id)
+        with get_db_connection() as conn:
+            df = pd.read_sql(query, conn, params=params or None)
         print("Data fetched successfully:")
-        conn.close()
         return df
     except Exception as e:
         print(f"Error fetching data: {e}")
         return pd.DataFrame()
 
 
-def fetch_data_for_table(selected_table):
+def fetch_data_for_simulation_since(last_day, run_id=None):
     try:
-        conn = get_db_connection()
-
-        if selected_table == 'covid19_tm':
-            query = "SELECT * FROM covid19_tm"
-        elif selected_table == 'status':
-            query = "SELECT DATE_ID, TOTAL, CURED, DEAD, SICK FROM status"
-        elif selected_table == 'covid_global':
-            query = "SELECT * FROM covid_global"
-        elif selected_table == 'covid_romania':
-            query = "SELECT * FROM covid_romania"
-        elif selected_table == 'simulation':
-            query = "SELECT * FROM simulation"
-        elif selected_table == 'diagnostics':
-            query = "SELECT * FROM DIAGNOSTICS"
-        else:
-            # Add more tables as needed
-            print(f"Invalid table name: {selected_table}")
-            return pd.DataFrame()
-
-        df = pd.read_sql(query, conn)
-        data_list = df.to_dict('records')
-        print("Data fetched successfully:")
-        print(data_list)
-        conn.close()
+        query, params = schema.build_select('simulation', run_id=run_id, since=last_day)
+        with get_db_connection() as conn:
+            df = pd.read_sql(query, conn, params=params)
         return df
+    except Exception as e:
+        print(f"Error fetching simulation rows after day {last_day}: {e}")
+        return pd.DataFrame()
+
+
+def fetch_simulation_last_day(run_id=None):
+    try:
+        where, params = schema.run_filter('simulation', run_id)
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT MAX(DAY_INCREMENT) FROM simulation{where}", params)
+            row = cursor.fetchone()
+            cursor.close()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Error fetching last simulation day: {e}")
+        return None
+
+
+def fetch_simulation_run_id():
+    # None when the simulation table is not run-keyed (rows written by the remote service).
+    if schema.get_run_key('simulation') is None:
+        return None
+    try:
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT MAX(RUN_ID) FROM simulation")
+            row = cursor.fetchone()
+            cursor.close()
+        return row[0] if row else None
+    except Exception as e:
+        print(f"Error fetching latest simulation run: {e}")
+        return None
+
+
+# Counter per table, bumped by writers that change existing rows (upserting importers). Row count
+# and newest key only notice appends, so the counter is part of every table version.
+CREATE_TABLE_VERSIONS = """
+CREATE TABLE IF NOT EXISTS table_versions (
+    SOURCE_TABLE VARCHAR(64) NOT NULL PRIMARY KEY,
+    VERSION BIGINT NOT NULL
+)
+"""
+
+_table_versions_ready = False
+
+
+def ensure_table_versions():
+    global _table_versions_ready
+    if _table_versions_ready:
+        return
+    with get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_TABLE_VERSIONS)
+        conn.commit()
+        cursor.close()
+    _table_versions_ready = True
+
+
+def bump_table_version(selected_table):
+    """Mark a table as changed for every process that caches it."""
+    try:
+        ensure_table_versions()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO table_versions (SOURCE_TABLE, VERSION) VALUES (%s, 1) "
+                           "ON DUPLICATE KEY UPDATE VERSION = VERSION + 1", (selected_table,))
+            conn.commit()
+            cursor.close()
+    except Exception as e:
+        print(f"Error bumping version of table {selected_table}: {e}")
+
+
+def fetch_table_version(selected_table, run_id=None):
+    spec = schema.get_table_spec(selected_table)
+    run_key = schema.get_run_key(selected_table)
+    where, params = schema.run_filter(selected_table, run_id)
+    fields = ['COUNT(*)']
+    if spec.time_key:
+        fields.append(f"MAX({spec.time_key})")
+    if run_key:
+        fields.append(f"MAX({run_key})")
+    fields.append("(SELECT COALESCE(MAX(VERSION), 0) FROM table_versions WHERE SOURCE_TABLE = %s)")
+    query = f"SELECT {', '.join(fields)} FROM {spec.source}{where}"
+    try:
+        ensure_table_versions()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, (selected_table, *params))
+            row = cursor.fetchone()
+            cursor.close()
+        return tuple(str(value) for value in row)
+    except Exception as e:
+        print(f"Error fetching version for table {selected_table}: {e}")
+        return None
+
+
+def invalidate_table_cache(selected_table=None):
+    """Drop cached frames of a table here and, through its version counter, in every other process."""
+    if selected_table is not None:
+        bump_table_version(selected_table)
+    table_cache.invalidate(selected_table)
+
+
+def get_table_cache_stats():
+    stats = table_cache.stats()
+    stats['single_flight'] = table_loads.stats()
+    if shared_cache is not None:
+        stats['shared'] = shared_cache.stats()
+    return stats
+
+
+def _load_table(selected_table, columns=None, run_id=None):
+    query, params = schema.build_select(selected_table, columns, run_id)
+    with get_db_connection() as conn:
+        df = pd.read_sql(query, conn, params=params or None)
+    print(f"Data fetched successfully: {selected_table} ({len(df)} rows, {len(df.columns)} columns)")
+    return df
+
+
+def fetch_data_for_table(selected_table, columns=None, copy=True, run_id=None):
+    # columns limits the SELECT to those columns plus the table's time columns.
+    # copy=False returns the shared frame; only pass it from callers that never mutate it.
+    # run_id picks one run of a run-keyed table (status); the latest run is the default.
+    if schema.get_table_spec(selected_table) is None:
+        print(f"Invalid table name: {selected_table}")
+        return pd.DataFrame()
+    key = selected_table if columns is None else (selected_table, tuple(sorted(columns)))
+    if run_id is not None:
+        key = (selected_table, 'run', run_id, key)
+    try:
+        # Callbacks fired by the same user action ask for the same table at once;
+        # they all wait on one version check / load instead of each querying MySQL.
+        df = table_loads.do(key,
+                            lambda: table_cache.get(key,
+                                                    lambda: fetch_table_version(selected_table, run_id),
+                                                    lambda: _load_table(selected_table, columns, run_id)))
+        return df.copy() if copy else df
     except Exception as e:
         print(f"Error fetching data for table {selected_table}: {e}")
         return pd.DataFrame()
 
 
+def get_column_options(selected_table):
+    return schema.get_column_options(selected_table)
+
+
 def post_message(city, title, gravity, range_km, description, color):
     data = {
         "city": city,
@@ -96,12 +232,8 @@ def fetch_and_summarize_simulation_data():
     response = requests.get(f"{API_BASE_URL}/getSimulationData")
     if response.status_code == 200:
         data = response.json()
-        df = pd.DataFrame(data)
-        if len(df) > 100:
-            df_sampled = df.sample(n=100)
-        else:
-            df_sampled = df
-        return df_sampled.to_json(orient='split')
+        # A fixed-size digest of the whole run: same data, same prompt, whatever the run length.
+        return digest.digest_json(pd.DataFrame(data))
     else:
         print(f"Failed to fetch simulation data: {response.status_code}")
         return None
@@ -126,7 +258,10 @@ def fetch_data_for_diagnostic(selected_table, diagnosticName):
         return df
 
 
-def analyze_simulation_data(summarized_data):
+def analyze_simulation_data(summarized_data, model="gpt-3.5-turbo"):
+    # Imported here so that workers which never run an analysis do not pay for the client library.
+    import openai
+
     api_key = getOpenApiKey()
     client = openai.OpenAI(api_key=api_key)
 
@@ -138,7 +273,7 @@ def analyze_simulation_data(summarized_data):
                            f"Using your data, what epidemic/pandemic that you know of does this data resemble?",
             }
         ],
-        model="gpt-3.5-turbo",
+        model=model,
     )
 
     try:
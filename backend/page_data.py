@@ -0,0 +1,121 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from decouple import config
+
+from backend import helperfunctions, schema
+from backend.singleflight import SingleFlight
+from constants import BY_DATE, BY_ID
+
+# Data the page layouts need, loaded on first use (or by warm_up) instead of at import time.
+# name -> (loader, value returned while the source is unavailable). 'diagnostics' only primes
+# the table cache; the page itself reads through fetch_data_for_table to stay current.
+SOURCES = {
+    'simulation_columns': (lambda: [col for col in schema.get_column_names('simulation')
+                                    if col not in (BY_ID, BY_DATE, schema.RUN_KEY)], []),
+    'diagnostics': (lambda: helperfunctions.fetch_data_for_table('diagnostics'), None),
+    'cities': (helperfunctions.get_citiesAndMarkers, {}),
+    'decision_responses': (helperfunctions.get_decisionResponses, []),
+}
+
+# PAGE_DATA_WARM_UP=False leaves every source to be loaded by the first page that needs it.
+WARM_UP = config('PAGE_DATA_WARM_UP', default=True, cast=bool)
+
+_values = {}
+_timings = {}
+_lock = threading.Lock()
+_loads = SingleFlight()
+_warm_up_thread = None
+
+
+def _record(kind, name, seconds, error=None):
+    with _lock:
+        _timings[(kind, name)] = {'kind': kind, 'name': name, 'seconds': seconds, 'error': error}
+
+
+def get(name):
+    """Value of a page data source, loaded once per process; failed loads are retried on the next call."""
+    with _lock:
+        if name in _values:
+            return _values[name]
+    loader, default = SOURCES[name]
+
+    def load():
+        started = time.perf_counter()
+        try:
+            value = loader()
+        except Exception as e:
+            print(f"Error loading page data {name}: {e}")
+            _record('data', name, time.perf_counter() - started, str(e))
+            return default
+        _record('data', name, time.perf_counter() - started)
+        with _lock:
+            _values[name] = value
+        return value
+
+    return _loads.do(name, load)
+
+
+def refresh(name=None):
+    with _lock:
+        if name is None:
+            _values.clear()
+        else:
+            _values.pop(name, None)
+
+
+def timed_layout(page):
+    """Decorator for page layout functions that records how long each build takes."""
+    def decorator(build):
+        def layout(**kwargs):
+            started = time.perf_counter()
+            try:
+                return build(**kwargs)
+            finally:
+                _record('layout', page, time.perf_counter() - started)
+        return layout
+    return decorator
+
+
+def warm_up(names=None, workers=None):
+    """Load the given sources (all by default) concurrently; returns the seconds it took."""
+    names = list(names or SOURCES)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers or len(names), thread_name_prefix='page-warm-up') as pool:
+        list(pool.map(get, names))
+    elapsed = time.perf_counter() - started
+    _record('warm-up', 'all sources', elapsed)
+    return elapsed
+
+
+def start_warm_up(names=None):
+    """Run warm_up on a background thread so a slow source never delays serving requests."""
+    global _warm_up_thread
+    if not WARM_UP:
+        return None
+
+    def run():
+        warm_up(names)
+        print(timing_report())
+
+    _warm_up_thread = threading.Thread(target=run, name='page-warm-up', daemon=True)
+    _warm_up_thread.start()
+    return _warm_up_thread
+
+
+def record_startup(name, seconds):
+    _record('startup', name, seconds)
+
+
+def timings():
+    with _lock:
+        return sorted(_timings.values(), key=lambda timing: (timing['kind'], -timing['seconds']))
+
+
+def timing_report():
+    lines = ['Startup timing:']
+    for timing in timings():
+        status = f"  failed: {timing['error']}" if timing['error'] else ''
+        lines.append(f"  {timing['kind']:<8} {timing['name']:<24} {timing['seconds'] * 1000:8.1f} ms{status}")
+    return '\n'.join(lines)
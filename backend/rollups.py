@@ -0,0 +1,264 @@
+from datetime import date, timedelta
+
+import pandas as pd
+
+from backend import aggregation, helperfunctions, schema
+from constants import BY_ID
+
+ROLLUP_TABLES = ('covid_global', 'covid_romania', 'covid19_tm', 'simulation')
+ROLLUP_GRAINS = ('weekly', 'monthly', 'yearly')
+# Aggregates that can be answered from the stored SUM/COUNT pair.
+ROLLUP_AGGREGATES = ('sum', 'mean', 'count')
+
+# Bucket keys are integers: DAY_INCREMENT DIV width for simulation days and
+# TO_DAYS(bucket end date) for calendar tables.
+CREATE_ROLLUPS = """
+CREATE TABLE IF NOT EXISTS rollups (
+    SOURCE_TABLE VARCHAR(64) NOT NULL,
+    GRAIN VARCHAR(16) NOT NULL,
+    BUCKET_KEY INT NOT NULL,
+    COLUMN_NAME VARCHAR(64) NOT NULL,
+    SUM_VALUE DOUBLE NOT NULL,
+    VALUE_COUNT INT NOT NULL,
+    PRIMARY KEY (SOURCE_TABLE, GRAIN, BUCKET_KEY, COLUMN_NAME)
+)
+"""
+
+CREATE_ROLLUP_STATE = """
+CREATE TABLE IF NOT EXISTS rollup_state (
+    SOURCE_TABLE VARCHAR(64) NOT NULL PRIMARY KEY,
+    ROW_COUNT BIGINT NOT NULL,
+    HIGH_WATER VARCHAR(32),
+    RUN_ID BIGINT NULL
+)
+"""
+
+# rollup_state tables created before run-keyed sources existed lack RUN_ID.
+ROLLUP_STATE_HAS_RUN = ("SELECT COUNT(*) FROM information_schema.COLUMNS WHERE TABLE_SCHEMA = DATABASE() "
+                        "AND TABLE_NAME = 'rollup_state' AND COLUMN_NAME = 'RUN_ID'")
+
+# TO_DAYS('0001-01-01') is 366 while date(1, 1, 1).toordinal() is 1.
+TO_DAYS_OFFSET = 365
+
+_tables_ready = False
+
+
+def ensure_rollup_tables():
+    global _tables_ready
+    if _tables_ready:
+        return
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_ROLLUPS)
+        cursor.execute(CREATE_ROLLUP_STATE)
+        cursor.execute(ROLLUP_STATE_HAS_RUN)
+        if not cursor.fetchone()[0]:
+            cursor.execute("ALTER TABLE rollup_state ADD COLUMN RUN_ID BIGINT NULL")
+        conn.commit()
+        cursor.close()
+    _tables_ready = True
+
+
+def is_supported(table, bucket, agg):
+    return table in ROLLUP_TABLES and bucket in ROLLUP_GRAINS and agg in ROLLUP_AGGREGATES
+
+
+def _rollup_columns(table):
+    return [col for col in schema.get_numeric_columns(table) if col not in schema.TIME_COLUMNS]
+
+
+def _key_expression(time_key, grain):
+    if time_key == BY_ID:
+        return f"({time_key} DIV {aggregation.DAY_BUCKETS[grain]})"
+    return f"TO_DAYS({aggregation.DATE_BUCKET_SQL[grain].format(col=time_key)})"
+
+
+def _bucket_range(time_key, grain, start, end):
+    """Source-row range and bucket-key range fully covering the buckets of [start, end]."""
+    if time_key == BY_ID:
+        width = aggregation.DAY_BUCKETS[grain]
+        first, last = int(start) // width, int(end) // width
+        return first * width, last * width + width - 1, first, last
+
+    start, end = pd.Timestamp(start).date(), pd.Timestamp(end).date()
+    if grain == 'weekly':
+        lo = start - timedelta(days=start.weekday())
+        hi = end + timedelta(days=6 - end.weekday())
+    elif grain == 'monthly':
+        lo = start.replace(day=1)
+        hi = (pd.Timestamp(end) + pd.offsets.MonthEnd(0)).date()
+    else:
+        lo = date(start.year, 1, 1)
+        hi = date(end.year, 12, 31)
+    first = _bucket_end(grain, lo).toordinal() + TO_DAYS_OFFSET
+    last = hi.toordinal() + TO_DAYS_OFFSET
+    return lo, hi, first, last
+
+
+def _bucket_end(grain, day):
+    if grain == 'weekly':
+        return day + timedelta(days=6 - day.weekday())
+    if grain == 'monthly':
+        return (pd.Timestamp(day) + pd.offsets.MonthEnd(0)).date()
+    return date(day.year, 12, 31)
+
+
+def _run_scope(cursor, spec):
+    """(run_id, where, params) limiting a run-keyed table to its latest run, as aggregate_sql reads it.
+
+    Rollups of run-keyed tables only ever hold the latest run; run_id is None for other tables.
+    """
+    run_key = schema.get_run_key(spec.name)
+    if run_key is None:
+        return None, '', ()
+    cursor.execute(f"SELECT MAX({run_key}) FROM {spec.source}")
+    run_id = cursor.fetchone()[0]
+    where, params = schema.run_filter(spec.name, run_id)
+    return run_id, where, params
+
+
+def _and(where, condition):
+    return f"{where} AND {condition}" if where else f" WHERE {condition}"
+
+
+def _refresh_buckets(cursor, spec, columns, grain, start, end, scope):
+    _, where, params = scope
+    lo, hi, first_key, last_key = _bucket_range(spec.time_key, grain, start, end)
+    cursor.execute("DELETE FROM rollups WHERE SOURCE_TABLE = %s AND GRAIN = %s AND BUCKET_KEY BETWEEN %s AND %s",
+                   (spec.name, grain, first_key, last_key))
+    if not columns:
+        return 0
+    select = [_key_expression(spec.time_key, grain)]
+    for col in columns:
+        select += [f"COALESCE(SUM(`{col}`), 0)", f"COUNT(`{col}`)"]
+    cursor.execute(f"SELECT {', '.join(select)} FROM {spec.source}"
+                   f"{_and(where, f'{spec.time_key} BETWEEN %s AND %s')} GROUP BY 1", (*params, lo, hi))
+    rows = []
+    for record in cursor.fetchall():
+        for i, col in enumerate(columns):
+            rows.append((spec.name, grain, int(record[0]), col,
+                         float(record[1 + 2 * i]), int(record[2 + 2 * i])))
+    if rows:
+        cursor.executemany("INSERT INTO rollups (SOURCE_TABLE, GRAIN, BUCKET_KEY, COLUMN_NAME, SUM_VALUE, VALUE_COUNT) "
+                           "VALUES (%s, %s, %s, %s, %s, %s)", rows)
+    return len(rows)
+
+
+def _table_state(cursor, spec, scope):
+    _, where, params = scope
+    cursor.execute(f"SELECT COUNT(*), MIN({spec.time_key}), MAX({spec.time_key}) FROM {spec.source}{where}", params)
+    return cursor.fetchone()
+
+
+def _save_state(cursor, spec, row_count, high_water, run_id):
+    cursor.execute("INSERT INTO rollup_state (SOURCE_TABLE, ROW_COUNT, HIGH_WATER, RUN_ID) VALUES (%s, %s, %s, %s) "
+                   "ON DUPLICATE KEY UPDATE ROW_COUNT = VALUES(ROW_COUNT), HIGH_WATER = VALUES(HIGH_WATER), "
+                   "RUN_ID = VALUES(RUN_ID)",
+                   (spec.name, row_count, None if high_water is None else str(high_water), run_id))
+
+
+def refresh_rollups(table, start, end):
+    """Recompute every rollup bucket touched by source rows with time key in [start, end].
+
+    Ingestion scripts call this after writing a range of rows; it only reads and
+    rewrites the affected buckets, so it is cheap and safe to repeat.
+    """
+    if table not in ROLLUP_TABLES or start is None or end is None:
+        return
+    ensure_rollup_tables()
+    spec = schema.get_table_spec(table)
+    columns = _rollup_columns(table)
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        scope = _run_scope(cursor, spec)
+        for grain in ROLLUP_GRAINS:
+            _refresh_buckets(cursor, spec, columns, grain, start, end, scope)
+        row_count, _, high_water = _table_state(cursor, spec, scope)
+        _save_state(cursor, spec, row_count, high_water, scope[0])
+        conn.commit()
+        cursor.close()
+    helperfunctions.invalidate_table_cache(table)
+
+
+def rebuild_rollups(table):
+    if table not in ROLLUP_TABLES:
+        return
+    ensure_rollup_tables()
+    spec = schema.get_table_spec(table)
+    columns = _rollup_columns(table)
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM rollups WHERE SOURCE_TABLE = %s", (spec.name,))
+        scope = _run_scope(cursor, spec)
+        row_count, low, high = _table_state(cursor, spec, scope)
+        if row_count:
+            for grain in ROLLUP_GRAINS:
+                _refresh_buckets(cursor, spec, columns, grain, low, high, scope)
+        _save_state(cursor, spec, row_count, high, scope[0])
+        conn.commit()
+        cursor.close()
+
+
+def sync_rollups(table):
+    """Bring a table's rollups up to date with rows written by someone else.
+
+    The simulation table is appended to by the simulation service, so rows past
+    the stored high-water mark are folded in incrementally. For run-keyed tables
+    only the latest run is rolled up, and a new run is a full rebuild. A shrinking
+    table (simulation reset) or rows landing before the mark also trigger one.
+    """
+    ensure_rollup_tables()
+    spec = schema.get_table_spec(table)
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT ROW_COUNT, HIGH_WATER, RUN_ID FROM rollup_state WHERE SOURCE_TABLE = %s", (spec.name,))
+        state = cursor.fetchone()
+        scope = _run_scope(cursor, spec)
+        run_id, where, params = scope
+        row_count, _, high = _table_state(cursor, spec, scope)
+        same_run = state is not None and state[2] == run_id
+        appended = None
+        if same_run and state[1] is not None and row_count >= state[0]:
+            cursor.execute(f"SELECT COUNT(*), MIN({spec.time_key}) FROM {spec.source}"
+                           f"{_and(where, f'{spec.time_key} > %s')}", (*params, state[1]))
+            appended = cursor.fetchone()
+        cursor.close()
+
+    if same_run and state[0] == row_count and str(high) == str(state[1]):
+        return
+    if not same_run or appended is None or appended[0] != row_count - state[0]:
+        rebuild_rollups(table)
+    elif appended[0]:
+        # The bucket holding the old high-water mark may have grown, so start there.
+        refresh_rollups(table, state[1], high)
+
+
+def read_rollup(table, columns, grain, agg='sum'):
+    """Read pre-aggregated buckets in the same shape aggregation.aggregate returns."""
+    sync_rollups(table)
+    spec = schema.get_table_spec(table)
+    placeholders = ', '.join(['%s'] * len(columns))
+    query = ("SELECT BUCKET_KEY, COLUMN_NAME, SUM_VALUE, VALUE_COUNT FROM rollups "
+             f"WHERE SOURCE_TABLE = %s AND GRAIN = %s AND COLUMN_NAME IN ({placeholders}) ORDER BY BUCKET_KEY")
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (spec.name, grain, *columns))
+        rows = cursor.fetchall()
+        cursor.close()
+
+    long_df = pd.DataFrame(rows, columns=['BUCKET_KEY', 'COLUMN_NAME', 'SUM_VALUE', 'VALUE_COUNT'])
+    if long_df.empty:
+        return pd.DataFrame(columns=[spec.time_key] + list(columns))
+    if agg == 'sum':
+        long_df['VALUE'] = long_df['SUM_VALUE']
+    elif agg == 'count':
+        long_df['VALUE'] = long_df['VALUE_COUNT']
+    else:
+        long_df['VALUE'] = long_df['SUM_VALUE'] / long_df['VALUE_COUNT'].where(long_df['VALUE_COUNT'] > 0)
+    wide = long_df.pivot(index='BUCKET_KEY', columns='COLUMN_NAME', values='VALUE').reindex(columns=columns)
+    wide = wide.astype('float64').reset_index()
+    if spec.time_key == BY_ID:
+        wide[spec.time_key] = wide['BUCKET_KEY'].astype('int64')
+    else:
+        wide[spec.time_key] = pd.to_datetime([date.fromordinal(int(key) - TO_DAYS_OFFSET) for key in wide['BUCKET_KEY']])
+    return wide[[spec.time_key] + list(columns)]
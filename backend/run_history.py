@@ -0,0 +1,180 @@
+import json
+import zlib
+from datetime import datetime, timedelta
+
+import pandas as pd
+from decouple import config
+
+from backend import helperfunctions
+
+STATUS_COLUMNS = ['DATE_ID', 'TOTAL', 'CURED', 'DEAD', 'SICK']
+
+CREATE_RUNS = """
+CREATE TABLE IF NOT EXISTS simulation_runs (
+    RUN_ID BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,
+    STARTED_AT DATETIME NOT NULL,
+    FINISHED_AT DATETIME NULL,
+    STATE VARCHAR(16) NOT NULL,
+    PARAMETERS TEXT NULL,
+    KEY idx_started (STARTED_AT)
+)
+"""
+
+# RUN_ID leads the primary key, so a run is one contiguous index range and the
+# table can later be PARTITION BY RANGE (RUN_ID) without changing any query.
+CREATE_STATUS_HISTORY = """
+CREATE TABLE IF NOT EXISTS status_history (
+    RUN_ID BIGINT NOT NULL,
+    DATE_ID DATE NOT NULL,
+    TOTAL INT,
+    CURED INT,
+    DEAD INT,
+    SICK INT,
+    PRIMARY KEY (RUN_ID, DATE_ID)
+)
+"""
+
+CREATE_STATUS_ARCHIVE = """
+CREATE TABLE IF NOT EXISTS status_archive (
+    RUN_ID BIGINT NOT NULL PRIMARY KEY,
+    ROW_COUNT INT NOT NULL,
+    ARCHIVED_AT DATETIME NOT NULL,
+    PAYLOAD LONGBLOB NOT NULL
+)
+"""
+
+_tables_ready = False
+
+
+def ensure_history_tables():
+    global _tables_ready
+    if _tables_ready:
+        return
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        for statement in (CREATE_RUNS, CREATE_STATUS_HISTORY, CREATE_STATUS_ARCHIVE):
+            cursor.execute(statement)
+        conn.commit()
+        cursor.close()
+    _tables_ready = True
+
+
+def start_run(parameters=None):
+    """Register a new simulation run and return its RUN_ID; earlier running runs are closed."""
+    ensure_history_tables()
+    now = datetime.now()
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE simulation_runs SET STATE = 'finished', FINISHED_AT = %s WHERE STATE = 'running'",
+                       (now,))
+        cursor.execute("INSERT INTO simulation_runs (STARTED_AT, STATE, PARAMETERS) VALUES (%s, 'running', %s)",
+                       (now, json.dumps(parameters) if parameters is not None else None))
+        run_id = cursor.lastrowid
+        conn.commit()
+        cursor.close()
+    return run_id
+
+
+def finish_run(run_id):
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("UPDATE simulation_runs SET STATE = 'finished', FINISHED_AT = %s "
+                       "WHERE RUN_ID = %s AND STATE = 'running'", (datetime.now(), run_id))
+        conn.commit()
+        cursor.close()
+
+
+def latest_run_id():
+    ensure_history_tables()
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT MAX(RUN_ID) FROM simulation_runs")
+        row = cursor.fetchone()
+        cursor.close()
+    return row[0] if row else None
+
+
+def list_runs():
+    ensure_history_tables()
+    with helperfunctions.get_db_connection() as conn:
+        df = pd.read_sql("SELECT RUN_ID, STARTED_AT, FINISHED_AT, STATE, PARAMETERS "
+                         "FROM simulation_runs ORDER BY RUN_ID DESC", conn)
+    return df
+
+
+def _encode_rows(df):
+    payload = {'columns': STATUS_COLUMNS,
+               'data': [df[col].astype(str).tolist() if col == 'DATE_ID' else df[col].tolist()
+                        for col in STATUS_COLUMNS]}
+    return zlib.compress(json.dumps(payload, default=int).encode('utf-8'), 9)
+
+
+def _decode_rows(payload):
+    decoded = json.loads(zlib.decompress(payload).decode('utf-8'))
+    df = pd.DataFrame(dict(zip(decoded['columns'], decoded['data'])))
+    df['DATE_ID'] = pd.to_datetime(df['DATE_ID']).dt.date
+    return df
+
+
+def load_run(run_id):
+    """Status rows of one run, read from the live table or, once compacted, from the archive."""
+    df = helperfunctions.fetch_data_for_table('status', run_id=run_id)
+    if not df.empty:
+        return df
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT PAYLOAD FROM status_archive WHERE RUN_ID = %s", (run_id,))
+        row = cursor.fetchone()
+        cursor.close()
+    return _decode_rows(row[0]) if row else pd.DataFrame(columns=STATUS_COLUMNS)
+
+
+def compact_runs(keep_latest=None):
+    """Move the rows of all but the newest keep_latest finished runs into the compressed archive."""
+    ensure_history_tables()
+    if keep_latest is None:
+        keep_latest = config('HISTORY_KEEP_RUNS', default=5, cast=int)
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT RUN_ID FROM simulation_runs WHERE STATE = 'finished' "
+                       "AND RUN_ID NOT IN (SELECT RUN_ID FROM (SELECT RUN_ID FROM simulation_runs "
+                       "ORDER BY RUN_ID DESC LIMIT %s) AS newest)", (keep_latest,))
+        run_ids = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+
+        for run_id in run_ids:
+            df = pd.read_sql(f"SELECT {', '.join(STATUS_COLUMNS)} FROM status_history "
+                             "WHERE RUN_ID = %s ORDER BY DATE_ID", conn, params=(run_id,))
+            cursor = conn.cursor()
+            cursor.execute("REPLACE INTO status_archive (RUN_ID, ROW_COUNT, ARCHIVED_AT, PAYLOAD) "
+                           "VALUES (%s, %s, %s, %s)", (run_id, len(df), datetime.now(), _encode_rows(df)))
+            cursor.execute("DELETE FROM status_history WHERE RUN_ID = %s", (run_id,))
+            cursor.execute("UPDATE simulation_runs SET STATE = 'archived' WHERE RUN_ID = %s", (run_id,))
+            conn.commit()
+            cursor.close()
+    return run_ids
+
+
+def expire_runs(max_age_days=None):
+    """Delete archived runs older than max_age_days (HISTORY_RETENTION_DAYS, 0 keeps everything)."""
+    ensure_history_tables()
+    if max_age_days is None:
+        max_age_days = config('HISTORY_RETENTION_DAYS', default=90, cast=int)
+    if max_age_days <= 0:
+        return 0
+    cutoff = datetime.now() - timedelta(days=max_age_days)
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE a FROM status_archive a JOIN simulation_runs r ON r.RUN_ID = a.RUN_ID "
+                       "WHERE r.STATE = 'archived' AND r.STARTED_AT < %s", (cutoff,))
+        cursor.execute("DELETE FROM simulation_runs WHERE STATE = 'archived' AND STARTED_AT < %s", (cutoff,))
+        expired = cursor.rowcount
+        conn.commit()
+        cursor.close()
+    return expired
+
+
+def apply_retention():
+    archived = compact_runs()
+    expired = expire_runs()
+    return {'archived': archived, 'expired': expired}
@@ -0,0 +1,154 @@
+import threading
+from collections import namedtuple
+
+from backend import db_pool
+from constants import COLUMN_NAME_MAPPING, BY_DATE, BY_ID
+
+# name: key used by the pages, source: physical MySQL table, time_key: column the
+# table is ordered/versioned by, columns: fixed projection (None means every column),
+# run_key: column separating simulation runs (reads default to the latest run).
+TableSpec = namedtuple('TableSpec', ['name', 'source', 'time_key', 'columns', 'run_key'], defaults=[None])
+
+RUN_KEY = 'RUN_ID'
+
+TABLES = {
+    'covid19_tm': TableSpec('covid19_tm', 'covid19_tm', BY_DATE, None),
+    'covid_global': TableSpec('covid_global', 'covid_global', BY_DATE, None),
+    'covid_romania': TableSpec('covid_romania', 'covid_romania', BY_DATE, None),
+    'status': TableSpec('status', 'status_history', BY_DATE, ('DATE_ID', 'TOTAL', 'CURED', 'DEAD', 'SICK'), RUN_KEY),
+    'simulation': TableSpec('simulation', 'simulation', BY_ID, None),
+    'diagnostics': TableSpec('diagnostics', 'DIAGNOSTICS', None, None),
+}
+
+TIME_COLUMNS = (BY_DATE, BY_ID)
+
+NUMERIC_TYPES = {'tinyint', 'smallint', 'mediumint', 'int', 'integer', 'bigint',
+                 'decimal', 'numeric', 'float', 'double', 'real'}
+
+_columns_cache = {}
+_columns_lock = threading.Lock()
+
+
+def get_table_spec(name):
+    return TABLES.get(name)
+
+
+def _load_columns(spec):
+    query = ("SELECT COLUMN_NAME, DATA_TYPE FROM information_schema.COLUMNS "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s ORDER BY ORDINAL_POSITION")
+    with db_pool.get_pool().acquire() as conn:
+        cursor = conn.cursor()
+        cursor.execute(query, (spec.source,))
+        rows = cursor.fetchall()
+        cursor.close()
+    columns = [(column, data_type.lower()) for column, data_type in rows]
+    if spec.columns is not None:
+        columns = [col for col in columns if col[0] in spec.columns]
+    return columns
+
+
+def get_columns(name):
+    """Return [(column, mysql data type)] for a registered table, read once from information_schema."""
+    spec = TABLES.get(name)
+    if spec is None:
+        return []
+    with _columns_lock:
+        cached = _columns_cache.get(name)
+    if cached is not None:
+        return cached
+    try:
+        columns = _load_columns(spec)
+    except Exception as e:
+        print(f"Error reading schema for table {name}: {e}")
+        return []
+    if columns:
+        with _columns_lock:
+            _columns_cache[name] = columns
+    return columns
+
+
+def get_column_names(name):
+    return [column for column, _ in get_columns(name)]
+
+
+def get_numeric_columns(name):
+    return [column for column, data_type in get_columns(name) if data_type in NUMERIC_TYPES]
+
+
+def get_time_columns(name):
+    return [column for column in get_column_names(name) if column in TIME_COLUMNS]
+
+
+def get_display_name(column):
+    return COLUMN_NAME_MAPPING.get(column, column)
+
+
+def get_run_key(name):
+    """Run column of a table: declared in the registry, or a RUN_ID column if the table has one."""
+    spec = TABLES[name]
+    if spec.run_key:
+        return spec.run_key
+    return RUN_KEY if RUN_KEY in get_column_names(name) else None
+
+
+def run_filter(name, run_id=None):
+    """WHERE clause and params restricting a run-keyed table to one run (the latest by default)."""
+    run_key = get_run_key(name)
+    if run_key is None:
+        return '', ()
+    if run_id is None:
+        source = TABLES[name].source
+        return f" WHERE {run_key} = (SELECT MAX({run_key}) FROM {source})", ()
+    return f" WHERE {run_key} = %s", (run_id,)
+
+
+def get_column_options(name):
+    return [{'label': get_display_name(column), 'value': column}
+            for column in get_column_names(name) if column not in TIME_COLUMNS and column != RUN_KEY]
+
+
+def invalidate_schema(name=None):
+    with _columns_lock:
+        if name is None:
+            _columns_cache.clear()
+        else:
+            _columns_cache.pop(name, None)
+
+
+def projection(name, columns=None):
+    """Columns to SELECT for a chart: the table's time columns plus the requested ones.
+
+    Requested names are checked against the registry so they can be placed in SQL safely.
+    """
+    spec = TABLES[name]
+    known = get_column_names(name)
+    if columns is None:
+        if spec.columns is not None:
+            return list(spec.columns)
+        if RUN_KEY in known:
+            return [column for column in known if column != RUN_KEY]
+        return None
+    unknown = [column for column in columns if column not in known]
+    if unknown:
+        print(f"Ignoring unknown columns for table {name}: {unknown}")
+    wanted = [column for column in known if column in TIME_COLUMNS]
+    wanted += [column for column in columns if column in known and column not in wanted]
+    return wanted
+
+
+def build_select(name, columns=None, run_id=None, since=None):
+    """SELECT statement and params for a registered table, limited to one run if it is run-keyed.
+
+    since keeps only rows whose time key is greater than the given value.
+    """
+    spec = TABLES[name]
+    selected = projection(name, columns)
+    column_sql = ', '.join(f"`{column}`" for column in selected) if selected else '*'
+    where, params = run_filter(name, run_id)
+    if since is not None:
+        where += (' AND ' if where else ' WHERE ') + f"{spec.time_key} > %s"
+        params = (*params, since)
+    query = f"SELECT {column_sql} FROM {spec.source}{where}"
+    if spec.time_key and (selected is None or spec.time_key in selected):
+        query += f" ORDER BY {spec.time_key}"
+    return query, params
@@ -0,0 +1,274 @@
+import os
+import threading
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+from backend import helperfunctions, schema
+from backend.engine import BASE_CASE_FATALITY, CONTACTS_PER_VISIT, DEFAULT_PARAMETERS
+from constants import BY_DATE, SIMULATION_LABELS
+
+# Fitted parameters, each sampled uniformly within its bounds (i0 and reporting on a log10 scale).
+#   beta: infections per infectious person per day, incubation / infectious: mean days in E / I,
+#   ifr: share of infections that die, i0: infected share of the population on the first day,
+#   reporting: share of infections that show up as reported cases.
+PARAMETER_BOUNDS = {
+    'beta': (0.05, 1.5),
+    'incubation': (2.0, 14.0),
+    'infectious': (3.0, 21.0),
+    'ifr': (0.0005, 0.05),
+    'i0': (-7.0, -2.0),
+    'reporting': (-2.0, 0.0),
+}
+LOG_PARAMETERS = ('i0', 'reporting')
+
+# Daily case and death columns tried, in order, for each table.
+OBSERVED_COLUMNS = {
+    'covid19_tm': (['CAZURI', 'DAILY_CASES'], ['DECESE', 'DAILY_DEATHS']),
+    'covid_romania': (['DAILY_CASES', 'CASES', 'CAZURI'], ['DAILY_DEATHS', 'DEATHS', 'DECESE']),
+    'covid_global': (['DAILY_CASES', 'CASES'], ['DAILY_DEATHS', 'DEATHS']),
+}
+
+POPULATIONS = {
+    'covid19_tm': 320000,
+    'covid_romania': 19000000,
+    'covid_global': 7900000000,
+}
+
+STEPS_PER_DAY = 4
+# Finished calibration jobs are forgotten after this long, as in analysis.
+JOB_TTL_SECONDS = 3600
+
+
+def simulate(parameters, days, steps_per_day=STEPS_PER_DAY):
+    """Integrate a batch of SEIRD models at once.
+
+    parameters maps each PARAMETER_BOUNDS name to an array of shape (batch,), with i0 and
+    reporting already on the linear scale. Returns (reported daily cases, daily deaths),
+    each of shape (batch, days) and expressed as fractions of the population.
+    """
+    beta = np.asarray(parameters['beta'], dtype=np.float64)
+    sigma = 1.0 / np.asarray(parameters['incubation'], dtype=np.float64)
+    gamma = 1.0 / np.asarray(parameters['infectious'], dtype=np.float64)
+    ifr = np.asarray(parameters['ifr'], dtype=np.float64)
+    i0 = np.asarray(parameters['i0'], dtype=np.float64)
+    reporting = np.asarray(parameters['reporting'], dtype=np.float64)
+
+    def derivative(s, e, i):
+        infections = beta * s * i
+        onsets = sigma * e
+        removals = gamma * i
+        return -infections, infections - onsets, onsets - removals, onsets, ifr * removals
+
+    s, e, i = 1.0 - i0, np.zeros_like(i0), i0
+    onset_total, death_total = np.zeros_like(i0), np.zeros_like(i0)
+    cases = np.empty((i0.size, days))
+    deaths = np.empty((i0.size, days))
+    dt = 1.0 / steps_per_day
+    for day in range(days):
+        onset_start, death_start = onset_total.copy(), death_total.copy()
+        for _ in range(steps_per_day):
+            k1 = derivative(s, e, i)
+            k2 = derivative(s + dt / 2 * k1[0], e + dt / 2 * k1[1], i + dt / 2 * k1[2])
+            k3 = derivative(s + dt / 2 * k2[0], e + dt / 2 * k2[1], i + dt / 2 * k2[2])
+            k4 = derivative(s + dt * k3[0], e + dt * k3[1], i + dt * k3[2])
+            s, e, i, onset_total, death_total = (
+                value + dt / 6 * (a + 2 * b + 2 * c + d)
+                for value, a, b, c, d in zip((s, e, i, onset_total, death_total), k1, k2, k3, k4))
+        cases[:, day] = (onset_total - onset_start) * reporting
+        deaths[:, day] = death_total - death_start
+    return cases, deaths
+
+
+def unit_to_parameters(points):
+    """Scale (batch, len(PARAMETER_BOUNDS)) points in [0, 1] to model parameters."""
+    parameters = {}
+    for column, (name, (low, high)) in enumerate(PARAMETER_BOUNDS.items()):
+        value = low + points[:, column] * (high - low)
+        parameters[name] = 10 ** value if name in LOG_PARAMETERS else value
+    return parameters
+
+
+def load_observed(table, days=None, smooth=7):
+    """Daily cases and deaths of a covid table, smoothed by a rolling mean; the last `days` days if given."""
+    available = schema.get_column_names(table)
+    case_candidates, death_candidates = OBSERVED_COLUMNS[table]
+    case_column = next((col for col in case_candidates if col in available), None)
+    death_column = next((col for col in death_candidates if col in available), None)
+    if case_column is None or death_column is None:
+        raise ValueError(f"Table {table} has no daily cases/deaths columns")
+
+    df = helperfunctions.fetch_data_for_table(table, columns=[case_column, death_column])
+    df = df.dropna(subset=[BY_DATE]).sort_values(BY_DATE)
+    observed = pd.DataFrame({
+        BY_DATE: df[BY_DATE].values,
+        'CASES': pd.to_numeric(df[case_column], errors='coerce').fillna(0).clip(lower=0).values,
+        'DEATHS': pd.to_numeric(df[death_column], errors='coerce').fillna(0).clip(lower=0).values,
+    })
+    observed[['CASES', 'DEATHS']] = observed[['CASES', 'DEATHS']].rolling(smooth, min_periods=1).mean()
+    # Start where the epidemic is visible, so early zero padding does not dominate the fit.
+    first = int(np.argmax(observed['CASES'].values > 0))
+    observed = observed.iloc[first:]
+    if days is not None:
+        observed = observed.iloc[:days]
+    return observed.reset_index(drop=True)
+
+
+def score(points, observed_cases, observed_deaths, population, death_weight=1.0):
+    """Squared log error between each candidate's curves and the observations; shape (batch,)."""
+    cases, deaths = simulate(unit_to_parameters(points), observed_cases.size)
+    case_error = (np.log1p(cases * population) - np.log1p(observed_cases)) ** 2
+    death_error = (np.log1p(deaths * population) - np.log1p(observed_deaths)) ** 2
+    return case_error.mean(axis=1) + death_weight * death_error.mean(axis=1)
+
+
+def _score_batches(pool, points, observed_cases, observed_deaths, population, workers):
+    if pool is None:
+        return score(points, observed_cases, observed_deaths, population)
+    chunks = np.array_split(points, workers)
+    futures = [pool.submit(score, chunk, observed_cases, observed_deaths, population) for chunk in chunks if len(chunk)]
+    return np.concatenate([future.result() for future in futures])
+
+
+def calibrate(table, days=120, population=None, candidates=20000, rounds=6, elite=0.02, workers=None, seed=0,
+              on_round=None, cancel=None):
+    """Fit the SEIRD model to a covid table's daily cases and deaths.
+
+    Each round integrates the whole candidate batch in one vectorized call per worker,
+    then samples the next batch around the best `elite` share of candidates (cross-entropy
+    search in the unit cube). Returns a dict with the fitted parameters, the loss and the
+    fitted and observed curves. on_round(completed, rounds) reports progress; setting the
+    cancel event stops the search after the current round and returns the best fit so far.
+    """
+    from backend.ensemble import process_pool
+    from backend.surrogate import latin_hypercube
+
+    started = time.perf_counter()
+    observed = load_observed(table, days)
+    if observed.empty:
+        raise ValueError(f"No observations in table {table}")
+    population = population or POPULATIONS.get(table, 1000000)
+    observed_cases = observed['CASES'].to_numpy(dtype=np.float64)
+    observed_deaths = observed['DEATHS'].to_numpy(dtype=np.float64)
+
+    rng = np.random.default_rng(seed)
+    dimensions = len(PARAMETER_BOUNDS)
+    points = latin_hypercube(candidates, dimensions, rng)
+    workers = workers or os.cpu_count() or 1
+    pool = process_pool(workers) if workers > 1 else None
+    try:
+        best_point, best_loss = None, np.inf
+        for completed in range(1, rounds + 1):
+            losses = _score_batches(pool, points, observed_cases, observed_deaths, population, workers)
+            order = np.argsort(losses)
+            if losses[order[0]] < best_loss:
+                best_point, best_loss = points[order[0]], float(losses[order[0]])
+            top = points[order[:max(2, int(candidates * elite))]]
+            center = top.mean(axis=0)
+            spread = top.std(axis=0) + 1e-3
+            points = np.clip(rng.normal(center, spread, size=(candidates, dimensions)), 0.0, 1.0)
+            points[0] = best_point
+            if on_round is not None:
+                on_round(completed, rounds)
+            if cancel is not None and cancel.is_set():
+                break
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    fitted = {name: float(value[0]) for name, value in unit_to_parameters(best_point[None, :]).items()}
+    cases, deaths = simulate({name: np.array([value]) for name, value in fitted.items()}, observed_cases.size)
+    curves = pd.DataFrame({
+        BY_DATE: observed[BY_DATE],
+        'CASES': observed_cases, 'DEATHS': observed_deaths,
+        'FITTED_CASES': cases[0] * population, 'FITTED_DEATHS': deaths[0] * population,
+    })
+    print(f"Calibrated SEIRD on {table} ({len(observed)} days) in {time.perf_counter() - started:.1f}s, "
+          f"loss {best_loss:.4f}")
+    return {'table': table, 'population': population, 'parameters': fitted, 'loss': best_loss, 'curves': curves}
+
+
+def to_simulation_parameters(fitted, agents=None):
+    """Translate fitted SEIRD parameters into the agent model's page parameters (SIMULATION_LABELS keys).
+
+    The agent model infects a susceptible visitor with a daily hazard of about
+    CONTACTS_PER_VISIT * transmission * (share infectious among visitors), and only agents that
+    go out meet anyone, so beta is divided by the chance to go out. Only symptomatic cases can
+    die, so the fatality is scaled up by the asymptomatic share.
+    """
+    agents = agents or DEFAULT_PARAMETERS['numberOfAgentsParam']
+    go_out = DEFAULT_PARAMETERS['chanceToGoOutParam'] / 100
+    asymptomatic = DEFAULT_PARAMETERS['chanceForAsymptomaticParam'] / 100
+    transmission = fitted['beta'] / (CONTACTS_PER_VISIT * go_out)
+    lethality = (fitted['ifr'] / (1 - asymptomatic) - BASE_CASE_FATALITY) / (1 - BASE_CASE_FATALITY)
+    parameters = {
+        'numberOfAgentsParam': agents,
+        'numberOfSickAtStartParam': max(1, int(round(fitted['i0'] * agents))),
+        'standardIncubationTimeDiseaseParam': max(1, int(round(fitted['incubation']))),
+        'chanceToTransmitDiseaseParam': int(round(min(max(transmission * 100, 0), 100))),
+        'healingTimeDiseaseParam': max(1, int(round(fitted['infectious']))),
+        'initialChanceToKillParam': round(min(max(lethality, 0.0), 1.0), 2),
+        'chanceToGoOutParam': DEFAULT_PARAMETERS['chanceToGoOutParam'],
+    }
+    return {key: value for key, value in parameters.items() if key in SIMULATION_LABELS}
+
+
+class CalibrationJob:
+    def __init__(self, table, days, workers):
+        self.id = uuid.uuid4().hex
+        self.table = table
+        self.rounds = 0
+        self.completed = 0
+        self.result = None
+        self.error = None
+        self.done = False
+        self.finished = None
+        self.cancel = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(days, workers), daemon=True)
+
+    def _update(self, completed, rounds):
+        self.completed = completed
+        self.rounds = rounds
+
+    def _run(self, days, workers):
+        try:
+            self.result = calibrate(self.table, days=days, workers=workers, on_round=self._update, cancel=self.cancel)
+        except Exception as e:
+            self.error = str(e)
+            print(f"Calibration {self.id} failed: {e}")
+        finally:
+            self.finished = time.time()
+            self.done = True
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+
+def _expire_jobs():
+    cutoff = time.time() - JOB_TTL_SECONDS
+    for job_id in [job_id for job_id, job in _jobs.items() if job.finished is not None and job.finished < cutoff]:
+        del _jobs[job_id]
+
+
+def start_calibration(table, days=120, workers=None, replaces=None):
+    """Calibrate in a background thread; returns the job id to poll with get_calibration.
+
+    replaces is the caller's previous job id, which is cancelled; other users' jobs keep running.
+    """
+    job = CalibrationJob(table, days, workers)
+    with _jobs_lock:
+        previous = _jobs.get(replaces) if replaces else None
+        if previous is not None:
+            previous.cancel.set()
+        _expire_jobs()
+        _jobs[job.id] = job
+    job._thread.start()
+    return job.id
+
+
+def get_calibration(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
@@ -0,0 +1,161 @@
+import threading
+
+import requests
+from decouple import config
+
+from backend import helperfunctions, run_history, schema, simulation_stream
+from backend.ensemble import run_branches
+from backend.engine import SimulationEngine, OUTPUT_COLUMNS
+from backend.status_writer import BufferedWriter
+
+# How long a finished run waits for its last days to be written.
+FLUSH_TIMEOUT_SECONDS = config('SIMULATION_FLUSH_TIMEOUT_SECONDS', default=30.0, cast=float)
+
+CREATE_SIMULATION_TABLE = f"""
+CREATE TABLE IF NOT EXISTS simulation (
+    RUN_ID BIGINT NOT NULL,
+    DAY_INCREMENT INT NOT NULL,
+    {', '.join(f'{col} INT' for col in OUTPUT_COLUMNS[1:])},
+    PRIMARY KEY (RUN_ID, DAY_INCREMENT)
+)
+"""
+
+SIMULATION_COLUMNS_QUERY = ("SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+                            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'simulation'")
+SIMULATION_PRIMARY_KEY_QUERY = ("SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE "
+                                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'simulation' "
+                                "AND CONSTRAINT_NAME = 'PRIMARY' ORDER BY ORDINAL_POSITION")
+
+
+def migrate_simulation_table(cursor):
+    """Give a simulation table created by the remote service the layout local runs write.
+
+    Its rows become run 0, missing state columns are added as nullable, and the primary key
+    becomes (RUN_ID, DAY_INCREMENT) so runs can reuse day numbers.
+    """
+    cursor.execute(SIMULATION_COLUMNS_QUERY)
+    existing = {row[0] for row in cursor.fetchall()}
+    cursor.execute(SIMULATION_PRIMARY_KEY_QUERY)
+    primary_key = [row[0] for row in cursor.fetchall()]
+    changes = []
+    if 'RUN_ID' not in existing:
+        changes.append("ADD COLUMN RUN_ID BIGINT NOT NULL DEFAULT 0 FIRST")
+    changes += [f"ADD COLUMN `{col}` INT NULL" for col in OUTPUT_COLUMNS if col not in existing]
+    if primary_key != ['RUN_ID', 'DAY_INCREMENT']:
+        changes.append(("DROP PRIMARY KEY, " if primary_key else "") + "ADD PRIMARY KEY (RUN_ID, DAY_INCREMENT)")
+    if changes:
+        print(f"Migrating simulation table: {'; '.join(changes)}")
+        cursor.execute(f"ALTER TABLE simulation {', '.join(changes)}")
+    return bool(changes)
+
+
+class RemoteSimulation:
+    """Drives the external simulation service."""
+
+    def __init__(self, base_url=helperfunctions.API_BASE_URL):
+        self.base_url = base_url
+
+    def _post(self, path, **kwargs):
+        return requests.post(f'{self.base_url}/{path}', **kwargs)
+
+    def update_parameter(self, key, value):
+        return self._post('updateParameters', json={key: value}).status_code == 200
+
+    def start(self):
+        self._post('startSimulation')
+
+    def pause(self):
+        self._post('pauseSimulation')
+
+    def resume(self):
+        self._post('resumeSimulation')
+
+    def reset(self):
+        self._post('resetSimulation')
+
+
+class LocalSimulation:
+    """Runs backend.engine in this process and writes each day to the simulation table.
+
+    The run lives in this process only, so the app must be served by a single worker
+    process (see gunicorn.conf.py); another worker would not see it.
+    """
+
+    def __init__(self):
+        self.writer = None
+        self.engine = SimulationEngine(on_day=self._store_day,
+                                       on_start=self._start_run,
+                                       on_finish=self._finish_run,
+                                       day_delay=config('SIMULATION_DAY_SECONDS', default=0.0, cast=float))
+
+    def _ensure_writer(self):
+        if self.writer is None:
+            with helperfunctions.get_db_connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute(CREATE_SIMULATION_TABLE)
+                migrated = migrate_simulation_table(cursor)
+                conn.commit()
+                cursor.close()
+            if migrated:
+                schema.invalidate_schema('simulation')
+            self.writer = BufferedWriter('simulation', ['RUN_ID'] + OUTPUT_COLUMNS,
+                                         batch_size=50, flush_interval=0.5)
+
+    def _start_run(self, parameters):
+        self._ensure_writer()
+        return run_history.start_run(parameters)
+
+    def _store_day(self, run_id, row):
+        self.writer.write((run_id, *row))
+
+    def _finish_run(self, run_id):
+        # Bounded, so a database outage cannot hold the engine thread; unwritten days stay queued.
+        if not self.writer.flush(timeout=FLUSH_TIMEOUT_SECONDS):
+            print(f"Simulation run {run_id} finished before all its days were written")
+        run_history.finish_run(run_id)
+        # The last days are in the table now; push them without waiting for the next poll.
+        simulation_stream.watcher.notify()
+
+    def update_parameter(self, key, value):
+        self.engine.update_parameters({key: value})
+        return True
+
+    def start(self):
+        self.engine.start()
+
+    def pause(self):
+        self.engine.pause()
+
+    def resume(self):
+        self.engine.resume()
+
+    def reset(self):
+        self.engine.reset()
+
+    def checkpoint(self):
+        return self.engine.checkpoint()
+
+    def fork(self, scenarios, checkpoint=None):
+        """Branch the current run (or a saved checkpoint) into what-if scenarios run in parallel."""
+        checkpoint = checkpoint or self.checkpoint()
+        if checkpoint is None:
+            print("No simulation running to fork from.")
+            return {}
+        return run_branches(checkpoint, scenarios)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_simulation_backend():
+    """SIMULATION_BACKEND=local runs the in-process engine; the default drives the remote service."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                if config('SIMULATION_BACKEND', default='remote') == 'local':
+                    _backend = LocalSimulation()
+                else:
+                    _backend = RemoteSimulation()
+    return _backend
@@ -0,0 +1,168 @@
+import json
+import queue
+import threading
+import time
+
+from decouple import config
+from flask import Response, stream_with_context
+
+from backend import helperfunctions
+from constants import BY_DATE, BY_ID
+
+# How often the watcher reads the simulation table while rows keep arriving, and the longest
+# it waits between reads once the run is paused, finished or not started.
+POLL_SECONDS = config('SIMULATION_STREAM_POLL_SECONDS', default=0.5, cast=float)
+IDLE_SECONDS = config('SIMULATION_STREAM_IDLE_SECONDS', default=5.0, cast=float)
+HEARTBEAT_SECONDS = 15
+# Each stream holds a server thread, so it is closed after this long and the browser's
+# EventSource reconnects (after the retry delay); days missed meanwhile make the chart reload.
+STREAM_SECONDS = config('SIMULATION_STREAM_MAX_SECONDS', default=300.0, cast=float)
+RETRY_MILLISECONDS = 3000
+# Events queued per client; a client that falls this far behind is told to reload instead.
+QUEUE_SIZE = 256
+
+
+class SimulationWatcher:
+    """Reads new simulation rows once per process and fans them out to every subscribed client.
+
+    The watcher thread only runs while somebody is subscribed, so the database sees one
+    reader per worker process however many tabs are open. Events are dicts:
+      {'type': 'rows', 'run_id', 'after', 'columns', 'x', 'y'}: days after `after` for each column
+      {'type': 'reset', 'run_id'}: a new run started or the run was reset; reload the chart
+    """
+
+    def __init__(self, poll_seconds=POLL_SECONDS, idle_seconds=IDLE_SECONDS):
+        self.poll_seconds = poll_seconds
+        self.idle_seconds = idle_seconds
+        self.run_id = None
+        self.last_day = None
+        self._started = False
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def subscribe(self):
+        subscriber = queue.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscriber)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='simulation-watcher', daemon=True)
+                self._thread.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def notify(self):
+        """Read the table now instead of waiting for the next poll (e.g. right after a day was written)."""
+        self._wake.set()
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def _publish(self, event):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(event)
+            except queue.Full:
+                # Rather than dropping rows silently, replace the backlog with a reload.
+                with subscriber.mutex:
+                    subscriber.queue.clear()
+                subscriber.put_nowait({'type': 'reset', 'run_id': self.run_id})
+
+    def _run(self):
+        delay = self.poll_seconds
+        while True:
+            with self._lock:
+                if not self._subscribers:
+                    # Forget the position; the next subscriber's chart is loaded from scratch anyway.
+                    self._thread = None
+                    self._started = False
+                    return
+            try:
+                changed = self.poll()
+            except Exception as e:
+                print(f"Error watching simulation rows: {e}")
+                changed = False
+            delay = self.poll_seconds if changed else min(delay * 2, self.idle_seconds)
+            self._wake.wait(delay)
+            self._wake.clear()
+
+    def poll(self):
+        """Read rows written since the last poll and publish them; True if anything changed."""
+        if not self._started:
+            self.run_id = helperfunctions.fetch_simulation_run_id()
+            self.last_day = helperfunctions.fetch_simulation_last_day(self.run_id)
+            self._started = True
+            return False
+
+        if self.last_day is None:
+            df = helperfunctions.fetch_data_for_simulation(self.run_id)
+        else:
+            df = helperfunctions.fetch_data_for_simulation_since(self.last_day, self.run_id)
+        if df.empty:
+            latest_run = helperfunctions.fetch_simulation_run_id()
+            latest_day = helperfunctions.fetch_simulation_last_day(latest_run)
+            reset = latest_run != self.run_id or (self.last_day is not None and (latest_day is None or latest_day < self.last_day))
+            if not reset:
+                return False
+            self.run_id, self.last_day = latest_run, None
+            self._publish({'type': 'reset', 'run_id': latest_run})
+            return True
+
+        columns = [col for col in df.columns if col not in [BY_ID, BY_DATE]]
+        self._publish({
+            'type': 'rows',
+            'run_id': self.run_id,
+            'after': self.last_day,
+            'columns': columns,
+            'x': df[BY_ID].tolist(),
+            'y': [df[col].tolist() for col in columns],
+        })
+        self.last_day = int(df[BY_ID].max())
+        return True
+
+
+watcher = SimulationWatcher()
+
+
+def event_stream(subscriber, max_seconds=STREAM_SECONDS):
+    """Server-Sent Events for one client, for at most max_seconds.
+
+    A comment line every HEARTBEAT_SECONDS keeps proxies from closing the stream early.
+    """
+    deadline = time.monotonic() + max_seconds
+    try:
+        yield f'retry: {RETRY_MILLISECONDS}\n\n'
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            try:
+                event = subscriber.get(timeout=min(HEARTBEAT_SECONDS, remaining))
+            except queue.Empty:
+                yield ': keep-alive\n\n'
+                continue
+            yield f"data: {json.dumps(event)}\n\n"
+    finally:
+        watcher.unsubscribe(subscriber)
+
+
+def register(server, path='/simulation-stream'):
+    """Serve the stream from the app's Flask server.
+
+    Each open stream holds one server thread for up to STREAM_SECONDS, so the server needs
+    threaded workers (see gunicorn.conf.py); a sync worker would be pinned by a single tab.
+    """
+    def simulation_stream():
+        response = Response(stream_with_context(event_stream(watcher.subscribe())), mimetype='text/event-stream')
+        response.headers['Cache-Control'] = 'no-cache'
+        response.headers['X-Accel-Buffering'] = 'no'
+        return response
+
+    server.add_url_rule(path, 'simulation_stream', simulation_stream)
@@ -0,0 +1,184 @@
+import atexit
+import collections
+import queue
+import threading
+import time
+
+import mysql.connector
+
+from backend import helperfunctions
+from backend.bulk_insert import write_batches
+
+_STOP = object()
+
+# Errors that will fail the same way on every retry (bad or duplicate rows, broken SQL); anything
+# else, such as a lost connection, is retried.
+PERMANENT_ERRORS = (mysql.connector.IntegrityError, mysql.connector.DataError,
+                    mysql.connector.ProgrammingError, mysql.connector.NotSupportedError)
+
+
+class BufferedWriter:
+    """Collects rows in memory and inserts them from a background thread.
+
+    Rows are flushed as multi-row INSERTs once batch_size rows are pending or
+    flush_interval seconds have passed. write() blocks when max_pending rows are
+    queued, so a producer faster than the database is slowed down instead of
+    growing memory without bound. close() (also run at exit) flushes everything.
+
+    Failed flushes are retried, flush_interval seconds more apart after each failure, up to
+    max_attempts times in a row before their rows are given
+    up. Rows rejected with a permanent error are retried one by one so only the bad rows
+    are given up. Given-up rows are kept in dead_letter (the latest max_dead_letter).
+    """
+
+    def __init__(self, table, columns, batch_size=500, flush_interval=2.0, max_pending=10000,
+                 max_attempts=5, max_dead_letter=1000):
+        self.table = table
+        self.columns = columns
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._queue = queue.Queue(maxsize=max_pending)
+        self.max_attempts = max_attempts
+        self._pending = []
+        self._attempts = 0
+        self._retry_at = 0.0
+        self._closed = False
+        self.dead_letter = collections.deque(maxlen=max_dead_letter)
+        self.rows_written = 0
+        self.rows_dropped = 0
+        self.flushes = 0
+        self.errors = 0
+        self._thread = threading.Thread(target=self._run, name=f"{table}-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, row, timeout=None):
+        if self._closed:
+            raise RuntimeError(f"Writer for {self.table} is closed")
+        self._queue.put(('row', row), timeout=timeout)
+
+    def flush(self, timeout=None):
+        """Block until every row written so far has been sent to the database.
+
+        Returns False if the writer did not get to it within timeout seconds (None waits
+        indefinitely); rows whose flush failed stay pending for the next attempt.
+        """
+        if self._closed:
+            return True
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        done = threading.Event()
+        try:
+            self._queue.put(('flush', done), timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(max(0.0, deadline - time.monotonic()) if deadline is not None else None)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._queue.put(('stop', _STOP), timeout=self.flush_interval * 5)
+        except queue.Full:
+            print(f"Writer for {self.table} is stuck; {self.stats()['pending']} rows were not written")
+            return
+        self._thread.join()
+
+    def stats(self):
+        return {'rows_written': self.rows_written, 'rows_dropped': self.rows_dropped, 'flushes': self.flushes,
+                'errors': self.errors, 'pending': len(self._pending) + self._queue.qsize()}
+
+    def _run(self):
+        last_flush = time.monotonic()
+        while True:
+            if len(self._pending) >= self.max_pending:
+                # The database keeps failing: stop draining the queue so writers block.
+                time.sleep(self.flush_interval)
+                self._flush(force=True)
+                last_flush = time.monotonic()
+                if self._closed and self._pending:
+                    return
+                continue
+            timeout = max(0.0, self.flush_interval - (time.monotonic() - last_flush))
+            try:
+                kind, item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                kind, item = None, None
+
+            if kind == 'row':
+                self._pending.append(item)
+                if len(self._pending) < self.batch_size:
+                    continue
+            if kind == 'stop':
+                self._flush(force=True)
+                return
+            if kind == 'flush':
+                self._flush(force=True)
+                item.set()
+                last_flush = time.monotonic()
+                continue
+            if kind is None or len(self._pending) >= self.batch_size:
+                self._flush()
+                last_flush = time.monotonic()
+
+    def _drop(self, rows, reason):
+        print(f"Giving up on {len(rows)} rows for {self.table}: {reason}")
+        self.dead_letter.extend(rows)
+        self.rows_dropped += len(rows)
+
+    def _write(self, rows, batch_size):
+        """Insert rows; returns how many were committed and the error that stopped the write, if any."""
+        committed = [0]
+
+        def on_batch(written):
+            committed[0] = written
+
+        try:
+            with helperfunctions.get_db_connection() as conn:
+                write_batches(conn, self.table, self.columns, rows, batch_size=batch_size, on_batch=on_batch)
+            return committed[0], None
+        except Exception as e:
+            self.errors += 1
+            return committed[0], e
+        finally:
+            self.rows_written += committed[0]
+
+    def _flush(self, force=False):
+        if not self._pending or (not force and time.monotonic() < self._retry_at):
+            return
+        rows, self._pending = self._pending, []
+        committed, error = self._write(rows, self.batch_size)
+        if error is None:
+            self.flushes += 1
+            self._attempts = 0
+            return
+        # Batches committed before the failure must not be inserted again.
+        rows = rows[committed:]
+        print(f"Error flushing {len(rows)} rows to {self.table}: {error}")
+        if isinstance(error, PERMANENT_ERRORS):
+            failed, rows = rows[:self.batch_size], rows[self.batch_size:]
+            rows = self._write_singly(failed) + rows
+        else:
+            self._attempts += 1
+            self._retry_at = time.monotonic() + self.flush_interval * self._attempts
+            if self._attempts >= self.max_attempts:
+                self._drop(rows, f"{self._attempts} failed attempts, last: {error}")
+                self._attempts = 0
+                rows = []
+        # The rest is kept for the next attempt; the bounded queue applies back-pressure meanwhile.
+        self._pending = rows + self._pending
+
+    def _write_singly(self, rows):
+        """Insert the rows of a rejected batch one by one, giving up only those rejected again.
+
+        Returns the rows still to be written if a transient error interrupts.
+        """
+        for index, row in enumerate(rows):
+            _, error = self._write([row], 1)
+            if error is None:
+                continue
+            if not isinstance(error, PERMANENT_ERRORS):
+                return rows[index:]
+            self._drop([row], error)
+        return []
@@ -0,0 +1,233 @@
+import argparse
+import os
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from decouple import config
+
+from backend.engine import DAYS_PER_MONTH, OUTPUT_COLUMNS, EpidemicModel, merge_parameters
+
+# Bump when the artifact layout or the feature encoding changes; older artifacts are ignored.
+FORMAT_VERSION = 1
+
+METRICS = ['SICK', 'DEAD', 'CURED']
+
+# Sampled parameter ranges, matching the inputs and sliders of the simulation page.
+# The share of agents sick at start is sampled on a log10 scale; the population size and
+# the period are not inputs because curves are learned as fractions over a fixed horizon.
+PARAMETER_RANGES = {
+    'sickFraction': (-4.0, -2.0),
+    'standardIncubationTimeDiseaseParam': (1, 14),
+    'chanceToTransmitDiseaseParam': (0, 100),
+    'healingTimeDiseaseParam': (5, 30),
+    'initialChanceToHealParam': (0, 50),
+    'initialChanceToKillParam': (0, 1),
+    'chanceForAsymptomaticParam': (0, 25),
+    'chanceToGoOutParam': (0, 100),
+    'chanceToSelfQuarantineParam': (0, 100),
+    'agentsAtCentralLocation_atSameTimeParam': (10, 500),
+    'maskDistributionTimeParam': (0, 180),
+    'maskCooldownTimeParam': (0, 90),
+    'maskUse': (0, 1),
+    'vaccineDistributionTimeParam': (0, 180),
+    'vaccineEnforced': (0, 1),
+}
+BOOLEAN_PARAMETERS = ('maskUse', 'vaccineEnforced')
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                            'artifacts', f'surrogate-v{FORMAT_VERSION}.npz')
+
+
+def latin_hypercube(samples, dimensions, rng):
+    """Points in [0, 1)^d with exactly one sample in each of the `samples` strata of every dimension."""
+    strata = np.argsort(rng.random((dimensions, samples)), axis=1).T
+    return (strata + rng.random((samples, dimensions))) / samples
+
+
+def unit_to_parameters(point, agents):
+    parameters = {}
+    for value, (name, (low, high)) in zip(point, PARAMETER_RANGES.items()):
+        parameters[name] = low + value * (high - low)
+    for name in BOOLEAN_PARAMETERS:
+        parameters[name] = parameters[name] >= 0.5
+    sick_fraction = 10 ** parameters.pop('sickFraction')
+    parameters['numberOfAgentsParam'] = agents
+    parameters['numberOfSickAtStartParam'] = max(1, int(round(agents * sick_fraction)))
+    return parameters
+
+
+def parameters_to_unit(parameters):
+    """Encode page parameters into the [0, 1] feature space the surrogate was trained on."""
+    p = merge_parameters(parameters)
+    values = dict(p)
+    agents = max(1, int(p['numberOfAgentsParam'] or 1))
+    values['sickFraction'] = np.log10(max(int(p['numberOfSickAtStartParam'] or 1), 1) / agents)
+    point = []
+    for name, (low, high) in PARAMETER_RANGES.items():
+        value = float(values[name] or 0)
+        point.append((value - low) / (high - low))
+    return np.clip(np.array(point), 0.0, 1.0)
+
+
+def quadratic_features(points):
+    """Constant, linear and pairwise-product terms of the unit-scaled parameters."""
+    points = np.atleast_2d(points)
+    rows, cols = np.triu_indices(points.shape[1])
+    return np.hstack([np.ones((points.shape[0], 1)), points, points[:, rows] * points[:, cols]])
+
+
+def _simulate_sample(parameters, days, seed):
+    model = EpidemicModel(parameters, seed=seed)
+    model.total_days = days
+    model.run()
+    history = np.asarray(model.history, dtype=np.float64)
+    indices = [OUTPUT_COLUMNS.index(metric) for metric in METRICS]
+    return (history[:, indices] / parameters['numberOfAgentsParam']).T.ravel()
+
+
+def sample_training_set(samples=1000, agents=20000, months=6, seed=0, workers=None):
+    """Run the engine on a Latin hypercube over PARAMETER_RANGES; returns unit points and flat curves."""
+    from backend.ensemble import process_pool
+
+    rng = np.random.default_rng(seed)
+    points = latin_hypercube(samples, len(PARAMETER_RANGES), rng)
+    days = months * DAYS_PER_MONTH
+    seeds = np.random.SeedSequence(seed).spawn(samples)
+    curves = [None] * samples
+    started = time.perf_counter()
+    with process_pool(workers or os.cpu_count() or 1) as pool:
+        futures = [pool.submit(_simulate_sample, unit_to_parameters(point, agents), days, s)
+                   for point, s in zip(points, seeds)]
+        for i, future in enumerate(futures):
+            curves[i] = future.result()
+            if (i + 1) % 50 == 0:
+                print(f"Simulated {i + 1}/{samples} samples in {time.perf_counter() - started:.1f}s")
+    return points, np.stack(curves), days
+
+
+def _ridge(features, targets, alpha):
+    gram = features.T @ features + alpha * np.eye(features.shape[1])
+    return np.linalg.solve(gram, features.T @ targets)
+
+
+def fit_surrogate(points, curves, days, components=12, bootstraps=16, alpha=1.0, seed=0):
+    """Fit bootstrapped ridge regressions from parameters to the leading principal components of the curves.
+
+    The spread of the bootstrap predictions plus the out-of-bag error gives the uncertainty band.
+    """
+    rng = np.random.default_rng(seed)
+    mean = curves.mean(axis=0)
+    _, _, vt = np.linalg.svd(curves - mean, full_matrices=False)
+    basis = vt[:components]
+    scores = (curves - mean) @ basis.T
+    features = quadratic_features(points)
+
+    weights = []
+    squared_error = np.zeros(curves.shape[1])
+    error_counts = np.zeros(curves.shape[1])
+    for _ in range(bootstraps):
+        chosen = rng.integers(0, len(points), size=len(points))
+        w = _ridge(features[chosen], scores[chosen], alpha)
+        weights.append(w)
+        out_of_bag = np.setdiff1d(np.arange(len(points)), chosen)
+        if out_of_bag.size:
+            predicted = mean + features[out_of_bag] @ w @ basis
+            squared_error += ((predicted - curves[out_of_bag]) ** 2).sum(axis=0)
+            error_counts += out_of_bag.size
+    residual_std = np.sqrt(squared_error / np.maximum(error_counts, 1))
+    return {'mean': mean, 'basis': basis, 'weights': np.stack(weights),
+            'residual_std': residual_std, 'days': np.array(days)}
+
+
+class Surrogate:
+    def __init__(self, arrays, trained_at=None):
+        self.mean = arrays['mean']
+        self.basis = arrays['basis']
+        self.weights = arrays['weights']
+        self.residual_std = arrays['residual_std']
+        self.days = int(arrays['days'])
+        self.trained_at = trained_at
+
+    def predict(self, parameters):
+        """Predicted SICK/DEAD/CURED curves for the page parameters, with _LOW/_HIGH two-sigma bands."""
+        p = merge_parameters(parameters)
+        features = quadratic_features(parameters_to_unit(p))
+        predictions = np.stack([self.mean + features @ w @ self.basis for w in self.weights])[:, 0, :]
+        center = predictions.mean(axis=0)
+        spread = 2 * np.sqrt(predictions.var(axis=0) + self.residual_std ** 2)
+
+        agents = int(p['numberOfAgentsParam'] or 0)
+        days = min(self.days, int(p['simPeriodParam'] or 0) * DAYS_PER_MONTH) or self.days
+        frame = {'DAY_INCREMENT': np.arange(1, days + 1)}
+        for m, metric in enumerate(METRICS):
+            window = slice(m * self.days, m * self.days + days)
+            frame[metric] = np.clip(center[window], 0, 1) * agents
+            frame[f'{metric}_LOW'] = np.clip(center[window] - spread[window], 0, 1) * agents
+            frame[f'{metric}_HIGH'] = np.clip(center[window] + spread[window], 0, 1) * agents
+        return pd.DataFrame(frame)
+
+
+def save_surrogate(fitted, path=None, **metadata):
+    path = path or config('SURROGATE_PATH', default=DEFAULT_PATH)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.tmp.npz"
+    np.savez(temp_path, format_version=FORMAT_VERSION, trained_at=datetime.now().isoformat(),
+             **{f'meta_{key}': value for key, value in metadata.items()}, **fitted)
+    os.replace(temp_path, path)
+    return path
+
+
+_surrogate = None
+_surrogate_mtime = None
+_surrogate_lock = threading.Lock()
+
+
+def get_surrogate(path=None):
+    """The trained surrogate, loaded on first use and reloaded when the artifact is retrained; None if absent."""
+    global _surrogate, _surrogate_mtime
+    path = path or config('SURROGATE_PATH', default=DEFAULT_PATH)
+    try:
+        mtime = os.path.getmtime(path)
+    except OSError:
+        return None
+    with _surrogate_lock:
+        if _surrogate is None or mtime != _surrogate_mtime:
+            with np.load(path) as arrays:
+                if int(arrays['format_version']) != FORMAT_VERSION:
+                    print(f"Ignoring surrogate artifact {path}: format version {int(arrays['format_version'])}, "
+                          f"expected {FORMAT_VERSION}")
+                    return None
+                _surrogate = Surrogate({key: arrays[key] for key in arrays.files}, str(arrays['trained_at']))
+            _surrogate_mtime = mtime
+        return _surrogate
+
+
+def predict(parameters):
+    surrogate = get_surrogate()
+    return surrogate.predict(parameters) if surrogate is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train the simulation surrogate used for instant previews.")
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--agents', type=int, default=20000)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--components', type=int, default=12)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default=None)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    points, curves, days = sample_training_set(args.samples, args.agents, args.months, args.seed, args.workers)
+    fitted = fit_surrogate(points, curves, days, components=args.components, seed=args.seed)
+    path = save_surrogate(fitted, args.output, samples=args.samples, agents=args.agents)
+    print(f"Trained surrogate on {args.samples} samples in {time.perf_counter() - started:.1f}s, "
+          f"out-of-bag RMSE {fitted['residual_std'].mean():.4f} of population, saved to {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,137 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+def frame_size(df):
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class TableCache:
+    """LRU cache of DataFrames, revalidated against a cheap version fingerprint.
+
+    sizeof measures a cached value in bytes; pass len to cache serialized bytes instead of frames.
+    shared is an optional second level (backend.disk_cache.DiskCache) consulted on a miss and
+    filled after a load, so other worker processes can reuse what this one computed.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 * 1024, max_entries=32, revalidate_after=0.0, sizeof=frame_size,
+                 shared=None):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.shared = shared
+        self.max_entries = max_entries
+        # Entries verified less than this many seconds ago are served without
+        # re-running the fingerprint query.
+        self.revalidate_after = revalidate_after
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.shared_hits = 0
+
+    def get(self, key, fingerprint, loader):
+        """Return the cached frame for key if its fingerprint still matches, else reload it.
+
+        fingerprint and loader are callables so the (cheap) version query only runs
+        when needed and the (expensive) load only runs on a miss.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[3] < self.revalidate_after:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+
+        current = fingerprint()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and current is not None and entry[0] == current:
+                self._entries[key] = (entry[0], entry[1], entry[2], time.monotonic())
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        if self.shared is not None and current is not None:
+            try:
+                df = self.shared.get(key, current)
+            except Exception as e:
+                print(f"Shared cache read failed for {key}: {e}")
+                df = None
+            if df is not None:
+                self.shared_hits += 1
+                self.put(key, current, df)
+                return df
+
+        df = loader()
+        if current is not None and df is not None and not getattr(df, 'empty', False):
+            self.put(key, current, df)
+            if self.shared is not None:
+                try:
+                    self.shared.put(key, current, df)
+                except Exception as e:
+                    print(f"Shared cache write failed for {key}: {e}")
+        return df
+
+    def lookup(self, key, version):
+        """Cached frame for key if it was stored under this version, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and version is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def peek_version(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[0] if entry is not None else None
+
+    def put(self, key, version, df):
+        nbytes = self.sizeof(df)
+        with self._lock:
+            self._remove(key)
+            if nbytes > self.max_bytes:
+                return
+            self._entries[key] = (version, df, nbytes, time.monotonic())
+            self._bytes += nbytes
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def invalidate(self, key=None):
+        if self.shared is not None:
+            try:
+                self.shared.invalidate(key)
+            except Exception as e:
+                print(f"Shared cache invalidation failed for {key}: {e}")
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                for cached_key in [k for k in self._entries if k == key or (isinstance(k, tuple) and k[0] == key)]:
+                    self._remove(cached_key)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'shared_hits': self.shared_hits,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+            }
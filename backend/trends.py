@@ -0,0 +1,137 @@
+import numpy as np
+import pandas as pd
+
+from backend import aggregation, helperfunctions
+
+FIT_KINDS = ('linear', 'polynomial', 'loglinear')
+
+# Two-sided 95% normal quantile for the prediction intervals.
+INTERVAL_Z = 1.96
+
+
+def design_matrix(t, degree):
+    """Vandermonde columns 1, t, ..., t^degree for time positions scaled to [0, 1]."""
+    return np.vander(np.asarray(t, dtype=np.float64), degree + 1, increasing=True)
+
+
+def fit_least_squares(t, values, degree=1, log=False):
+    """Closed-form least squares of every column of `values` against the same time axis at once.
+
+    values has shape (n, k); NaNs (and, for log fits, non-positive values) are left out of
+    the fit of their own column only. Returns a frame with one row per column holding the
+    coefficients, the inverse normal matrix and the residual variance.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if log:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            values = np.where(values > 0, np.log(values), np.nan)
+    weights = np.isfinite(values).astype(np.float64)
+    targets = np.where(weights > 0, values, 0.0)
+    x = design_matrix(t, degree)
+    parameters = degree + 1
+
+    gram = np.einsum('ni,nk,nj->kij', x, weights, x)
+    moments = np.einsum('ni,nk->ki', x, weights * targets)
+    counts = weights.sum(axis=0)
+    usable = counts > parameters
+    # Columns with too few points get an identity system so the batched solve stays well-posed.
+    gram[~usable] = np.eye(parameters)
+    moments[~usable] = 0.0
+    inverse = np.linalg.inv(gram)
+    coefficients = np.einsum('kij,kj->ki', inverse, moments)
+
+    residuals = weights * (targets - x @ coefficients.T)
+    sigma2 = (residuals ** 2).sum(axis=0) / np.maximum(counts - parameters, 1)
+    return pd.DataFrame({
+        'usable': usable,
+        'count': counts.astype(int),
+        'sigma2': sigma2,
+        'coefficients': list(coefficients),
+        'inverse': list(inverse),
+    })
+
+
+def predict(fit, t, log=False):
+    """Fitted values and 95% prediction interval of one fit row at time positions t."""
+    x = design_matrix(t, len(fit['coefficients']) - 1)
+    center = x @ fit['coefficients']
+    leverage = np.einsum('ni,ij,nj->n', x, fit['inverse'], x)
+    spread = INTERVAL_Z * np.sqrt(fit['sigma2'] * (1 + leverage))
+    low, high = center - spread, center + spread
+    if log:
+        return np.exp(center), np.exp(low), np.exp(high)
+    return center, low, high
+
+
+def _fit_parameters(kind, degree):
+    if kind not in FIT_KINDS:
+        raise ValueError(f"Unknown trend fit: {kind}")
+    return (degree if kind == 'polynomial' else 1), kind == 'loglinear'
+
+
+def get_trend_fits(table, columns, bucket, kind='linear', degree=2, series=None):
+    """Fitted trends per column, cached against the table version.
+
+    Only columns missing from the cached fits are refitted, all in one batched solve.
+    series is the bucketed data (as returned by aggregation.aggregate) if the caller already has it.
+    """
+    bucket = aggregation.normalize_bucket(bucket)
+    fit_degree, log = _fit_parameters(kind, degree)
+    key = (table, 'trend', bucket, kind, fit_degree)
+    version = helperfunctions.fetch_table_version(table)
+    cached = helperfunctions.table_cache.lookup(key, version)
+    fits = cached if cached is not None else pd.DataFrame()
+    missing = [col for col in columns if col not in fits.index]
+    if missing:
+        if series is None:
+            series = aggregation.aggregate(table, missing, bucket, 'mean')
+        if series.empty:
+            return fits.reindex([col for col in columns if col in fits.index])
+        t = np.arange(len(series)) / max(len(series) - 1, 1)
+        new_fits = fit_least_squares(t, series[missing].to_numpy(), fit_degree, log)
+        new_fits.index = missing
+        new_fits['points'] = len(series)
+        fits = pd.concat([fits, new_fits]) if not fits.empty else new_fits
+        if version is not None:
+            helperfunctions.table_cache.put(key, version, fits)
+    return fits.loc[[col for col in columns if col in fits.index]]
+
+
+def forecast(table, columns, bucket, periods=0, kind='linear', degree=2):
+    """Bucketed means of the columns with their trend and a `periods`-bucket forecast.
+
+    Returns (series, trends): series is the aggregated data; trends has the time key plus
+    {column}_TREND, {column}_LOW and {column}_HIGH for the observed and forecast buckets.
+    """
+    bucket = aggregation.normalize_bucket(bucket)
+    _, log = _fit_parameters(kind, degree)
+    series = aggregation.aggregate(table, columns, bucket, 'mean')
+    if series.empty:
+        return series, pd.DataFrame()
+    time_key = series.columns[0]
+    fits = get_trend_fits(table, columns, bucket, kind, degree, series)
+
+    n = len(series)
+    positions = np.arange(n + periods) / max(n - 1, 1)
+    trends = {time_key: _extend_time_axis(series[time_key], bucket, periods)}
+    for col, fit in fits.iterrows():
+        if not fit['usable'] or fit['points'] != n:
+            continue
+        center, low, high = predict(fit, positions, log)
+        trends[f'{col}_TREND'] = center
+        trends[f'{col}_LOW'] = low
+        trends[f'{col}_HIGH'] = high
+    return series, pd.DataFrame(trends)
+
+
+def _extend_time_axis(labels, bucket, periods):
+    if periods <= 0:
+        return labels.to_numpy()
+    last = labels.iloc[-1]
+    if isinstance(last, pd.Timestamp):
+        offsets = {'daily': pd.offsets.Day(), 'weekly': pd.offsets.Week(weekday=6),
+                   'monthly': pd.offsets.MonthEnd(), 'yearly': pd.offsets.YearEnd()}
+        future = pd.date_range(last, periods=periods + 1, freq=offsets[bucket])[1:]
+    else:
+        future = last + np.arange(1, periods + 1)
+    return np.concatenate([labels.to_numpy(), np.asarray(future)])
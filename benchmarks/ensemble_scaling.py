@@ -0,0 +1,39 @@
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.ensemble import run_ensemble
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure how the Monte Carlo ensemble scales with worker count.")
+    parser.add_argument('--runs', type=int, default=32)
+    parser.add_argument('--agents', type=int, default=100000)
+    parser.add_argument('--months', type=int, default=3)
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    parameters = {'numberOfAgentsParam': args.agents, 'simPeriodParam': args.months}
+    worker_counts = sorted({1, *[2 ** i for i in range(1, 8) if 2 ** i < args.max_workers], args.max_workers})
+
+    baseline = None
+    reference = None
+    print(f"{'workers':>8} {'seconds':>9} {'runs/s':>8} {'speedup':>8} {'efficiency':>10}")
+    for workers in worker_counts:
+        started = time.perf_counter()
+        bands = run_ensemble(parameters, runs=args.runs, base_seed=1234, workers=workers)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        if reference is None:
+            reference = bands
+        elif not reference.equals(bands):
+            print("warning: bands differ between worker counts")
+        speedup = baseline / elapsed
+        print(f"{workers:>8} {elapsed:>9.2f} {args.runs / elapsed:>8.2f} {speedup:>8.2f} {speedup / workers:>10.0%}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries that only specific features need; importing the app must not load any of them.
+HEAVY_MODULES = ('openai', 'sklearn', 'scipy', 'langchain', 'langchain_community', 'torch', 'transformers')
+
+MEASURE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+app.create_app()
+seconds = time.perf_counter() - started
+heavy = {heavy!r}
+print(json.dumps({{
+    'seconds': seconds,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'heavy': sorted(name for name in sys.modules if name.split('.')[0] in heavy),
+}}))
+"""
+
+
+def measure_once():
+    env = dict(os.environ, PAGE_DATA_WARM_UP='False')
+    result = subprocess.run([sys.executable, '-c', MEASURE.format(heavy=HEAVY_MODULES)], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    if result.returncode != 0:
+        sys.exit(f"import app failed:\n{result.stderr}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(count):
+    """The `count` modules with the largest cumulative import time, from python -X importtime."""
+    env = dict(os.environ, PAGE_DATA_WARM_UP='False')
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import app; app.create_app()'], cwd=ROOT, env=env,
+                            capture_output=True, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:count]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that importing and building the Dash app stays within its time and memory budget.")
+    parser.add_argument('--max-seconds', type=float, default=2.0)
+    parser.add_argument('--max-rss-mb', type=float, default=250.0)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15, help="slowest imports listed when a budget is exceeded")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(args.repeat)]
+    seconds = statistics.median(run['seconds'] for run in runs)
+    rss_mb = statistics.median(run['rss_mb'] for run in runs)
+    heavy = sorted({name for run in runs for name in run['heavy']})
+
+    failures = []
+    if seconds > args.max_seconds:
+        failures.append(f"import took {seconds:.2f}s (budget {args.max_seconds:.2f}s)")
+    if rss_mb > args.max_rss_mb:
+        failures.append(f"peak RSS {rss_mb:.0f} MB (budget {args.max_rss_mb:.0f} MB)")
+    if heavy:
+        failures.append(f"heavy modules imported eagerly: {', '.join(heavy)}")
+
+    print(f"import app: {seconds:.2f}s, peak RSS {rss_mb:.0f} MB (median of {args.repeat})")
+    if failures:
+        for failure in failures:
+            print(f"FAIL {failure}")
+        print(f"{'cumulative ms':>14}  module")
+        for cumulative, name in slowest_imports(args.top):
+            print(f"{cumulative / 1000:>14.1f}  {name}")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == '__main__':
+    main()
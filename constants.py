@@ -35,7 +35,13 @@ COLUMN_NAME_MAPPING = {
     'CURRENT_ICU_OCCUPANCY': 'ICU Fill Rate',
     'REGISTERED': 'Cases Registered',
     'TIMESTAMP': 'Over Time',
-    'DAY_INCREMENT': 'Over Time'
+    'DAY_INCREMENT': 'Over Time',
+    'HEALTHY': 'Healthy',
+    'INCUBATING': 'Incubating',
+    'SICK': 'Sick',
+    'CURED': 'Cured',
+    'DEAD': 'Dead',
+    'VACCINATED': 'Vaccinated'
 }
 
 SIMULATION_LABELS = {
@@ -1,62 +1,174 @@
-import pandas as pd
-import mysql.connector
-import numpy as np
-
-# Read the CSV file
-csv_file_path = 'D:\\Licenta\\EDSS\\EpidemicDecisionalSupportSystem\\datacollection\\data_download_file_reference_2022.csv'
-df = pd.read_csv(csv_file_path)
-
-# Filter columns based on your requirements
-required_columns = ['date', 'cumulative_deaths', 'daily_deaths', 'cumulative_cases',
-                     'daily_cases', 'cumulative_hospitalizations', 'mask_use_mean',
-                     'cumulative_all_vaccinated', 'cumulative_all_fully_vaccinated', 'all_bed_capacity', 'icu_bed_capacity',
-                     'hospital_beds_mean', 'icu_beds_mean', 'infection_fatality', 'location_id']
-
-df_filtered = df[required_columns]
-
-# Filter rows where location_id is 1
-df_filtered = df_filtered[df_filtered['location_id'] == 1]
-
-# Drop the location_id column
-df_filtered = df_filtered.drop('location_id', axis=1)
-
-# Replace NaN values with 0
-df_filtered.replace([np.inf, -np.inf], np.nan, inplace=True)
-df_filtered.fillna(0, inplace=True)
-
-# Rename columns to match the MySQL table
-df_filtered.columns = ['DATE_ID', 'SUM_DEATHS', 'DAILY_DEATHS', 'SUM_CASES', 'DAILY_CASES',
-                       'SUM_HOSPITAL', 'MASK_USE', 'SUM_VAC', 'SUM_FULL_VAC', 'HOSPITAL_CAPACITY', 'ICU_CAPACITY', 'CURR_HOSP_OCC', 'CURR_ICU_OCC', 'INFECTION_FATALITY']
+import argparse
+import json
+import os
+import time
 
+import numpy as np
+import pandas as pd
 
-# Connect to MySQL database using mysql-connector
-conn = mysql.connector.connect(
-    host='localhost',
-    user='root',
-    password='1234',
-    database='edss'
+from backend import helperfunctions, rollups
+from backend.bulk_insert import write_batches
+
+# IHME CSV column -> MySQL column
+COLUMN_MAPPING = {
+    'date': 'DATE_ID',
+    'cumulative_deaths': 'SUM_DEATHS',
+    'daily_deaths': 'DAILY_DEATHS',
+    'cumulative_cases': 'SUM_CASES',
+    'daily_cases': 'DAILY_CASES',
+    'cumulative_hospitalizations': 'SUM_HOSPITAL',
+    'mask_use_mean': 'MASK_USE',
+    'cumulative_all_vaccinated': 'SUM_VAC',
+    'cumulative_all_fully_vaccinated': 'SUM_FULL_VAC',
+    'all_bed_capacity': 'HOSPITAL_CAPACITY',
+    'icu_bed_capacity': 'ICU_CAPACITY',
+    'hospital_beds_mean': 'CURR_HOSP_OCC',
+    'icu_beds_mean': 'CURR_ICU_OCC',
+    'infection_fatality': 'INFECTION_FATALITY',
+}
+
+VALUE_COLUMNS = [col for col in COLUMN_MAPPING.values() if col != 'DATE_ID']
+
+CSV_DTYPES = {csv_col: 'float64' for csv_col, db_col in COLUMN_MAPPING.items() if db_col != 'DATE_ID'}
+CSV_DTYPES['date'] = 'str'
+CSV_DTYPES['location_id'] = 'int32'
+
+LOCATION_TABLE = 'covid_locations'
+
+CREATE_LOCATION_TABLE = f"""
+CREATE TABLE IF NOT EXISTS {LOCATION_TABLE} (
+    LOCATION_ID INT NOT NULL,
+    DATE_ID DATE NOT NULL,
+    {', '.join(f'{col} DOUBLE' for col in VALUE_COLUMNS)},
+    PRIMARY KEY (LOCATION_ID, DATE_ID)
 )
-
-# Create a MySQL cursor
-cursor = conn.cursor()
-
-# Insert data into the table using executemany
-insert_query = """
-    INSERT INTO covid_global
-    (DATE_ID, SUM_DEATHS, DAILY_DEATHS, SUM_CASES, DAILY_CASES, 
-    SUM_HOSPITAL, MASK_USE, SUM_VAC, SUM_FULL_VAC, HOSPITAL_CAPACITY, 
-    ICU_CAPACITY, CURR_HOSP_OCC, CURR_ICU_OCC, INFECTION_FATALITY) 
-    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
 """
 
-data_to_insert = [tuple(row) for row in df_filtered.itertuples(index=False, name=None)]
-
-cursor.executemany(insert_query, data_to_insert)
-
-# Commit the changes
-conn.commit()
-
-# Close the cursor and database connection
-cursor.close()
-conn.close()
 
+def load_checkpoint(path, csv_path):
+    if not os.path.exists(path):
+        return 0
+    with open(path, 'r') as file:
+        checkpoint = json.load(file)
+    stat = os.stat(csv_path)
+    if checkpoint.get('size') != stat.st_size or checkpoint.get('mtime') != int(stat.st_mtime):
+        print("CSV file changed since the last run, starting from the beginning.")
+        return 0
+    return checkpoint.get('rows_done', 0)
+
+
+def save_checkpoint(path, csv_path, rows_done):
+    stat = os.stat(csv_path)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as file:
+        json.dump({'csv': os.path.abspath(csv_path), 'size': stat.st_size,
+                   'mtime': int(stat.st_mtime), 'rows_done': rows_done}, file)
+    os.replace(tmp_path, path)
+
+
+def clean_chunk(chunk, locations):
+    if locations:
+        chunk = chunk[chunk['location_id'].isin(locations)]
+    # rename returns a new frame, but copy explicitly so the assignments below never write to a view.
+    chunk = chunk.rename(columns=COLUMN_MAPPING).copy()
+    chunk[VALUE_COLUMNS] = chunk[VALUE_COLUMNS].replace([np.inf, -np.inf], np.nan).fillna(0)
+    chunk['DATE_ID'] = pd.to_datetime(chunk['DATE_ID']).dt.date
+    return chunk
+
+
+def mirror_global(conn, rows, batch_size):
+    # covid_global has no declared key, so make re-runs idempotent by replacing the dates we write,
+    # in one transaction so readers never see the dates deleted but not yet re-inserted.
+    if rows.empty:
+        return 0
+    cursor = conn.cursor()
+    dates = list(rows['DATE_ID'].unique())
+    columns = ['DATE_ID'] + VALUE_COLUMNS
+    try:
+        for start in range(0, len(dates), batch_size):
+            part = dates[start:start + batch_size]
+            cursor.execute(f"DELETE FROM covid_global WHERE DATE_ID IN ({', '.join(['%s'] * len(part))})", part)
+        written = write_batches(conn, 'covid_global', columns, rows[columns].itertuples(index=False, name=None),
+                                batch_size=batch_size, commit=False)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return written
+
+
+def ingest(csv_path, locations=None, chunk_size=50000, batch_size=1000,
+           global_location=1, checkpoint_path=None, restart=False):
+    checkpoint_path = checkpoint_path or csv_path + '.progress.json'
+    rows_done = 0 if restart else load_checkpoint(checkpoint_path, csv_path)
+    if rows_done:
+        print(f"Resuming after {rows_done} CSV rows.")
+
+    with helperfunctions.get_db_connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute(CREATE_LOCATION_TABLE)
+        conn.commit()
+        cursor.close()
+
+        reader = pd.read_csv(csv_path,
+                             usecols=list(CSV_DTYPES),
+                             dtype=CSV_DTYPES,
+                             chunksize=chunk_size,
+                             skiprows=range(1, rows_done + 1))
+
+        started = time.monotonic()
+        rows_read = 0
+        rows_written = 0
+        global_dates = []
+        columns = ['LOCATION_ID', 'DATE_ID'] + VALUE_COLUMNS
+        for chunk in reader:
+            rows_read += len(chunk)
+            chunk = clean_chunk(chunk, locations).rename(columns={'location_id': 'LOCATION_ID'})
+
+            rows_written += write_batches(conn, LOCATION_TABLE, columns,
+                                          chunk[columns].itertuples(index=False, name=None),
+                                          key_columns=('LOCATION_ID', 'DATE_ID'), batch_size=batch_size)
+            if global_location is not None:
+                global_rows = chunk[chunk['LOCATION_ID'] == global_location]
+                mirror_global(conn, global_rows, batch_size)
+                if not global_rows.empty:
+                    global_dates += [global_rows['DATE_ID'].min(), global_rows['DATE_ID'].max()]
+
+            save_checkpoint(checkpoint_path, csv_path, rows_done + rows_read)
+            elapsed = max(time.monotonic() - started, 1e-9)
+            print(f"{rows_done + rows_read} CSV rows read, {rows_written} rows written "
+                  f"({rows_read / elapsed:,.0f} rows/s read, {rows_written / elapsed:,.0f} rows/s written)")
+
+    helperfunctions.invalidate_table_cache('covid_global')
+    if global_dates:
+        # Recompute only the weekly/monthly/yearly rollup buckets covered by the imported dates
+        rollups.refresh_rollups('covid_global', min(global_dates), max(global_dates))
+    return rows_written
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stream an IHME COVID CSV export into MySQL.")
+    parser.add_argument('csv_path')
+    parser.add_argument('--locations', type=int, nargs='*', default=None,
+                        help="location_ids to import (default: all)")
+    parser.add_argument('--chunk-size', type=int, default=50000, help="CSV rows held in memory at once")
+    parser.add_argument('--batch-size', type=int, default=1000, help="rows per INSERT statement and commit")
+    parser.add_argument('--global-location', type=int, default=1,
+                        help="location_id also written to covid_global (negative to disable)")
+    parser.add_argument('--checkpoint', default=None, help="progress file (default: <csv_path>.progress.json)")
+    parser.add_argument('--restart', action='store_true', help="ignore the progress file and start over")
+    args = parser.parse_args()
+
+    ingest(args.csv_path,
+           locations=args.locations,
+           chunk_size=args.chunk_size,
+           batch_size=args.batch_size,
+           global_location=args.global_location if args.global_location >= 0 else None,
+           checkpoint_path=args.checkpoint,
+           restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
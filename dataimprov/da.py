@@ -1,55 +1,169 @@
+import argparse
 import json
+import os
+import time
+
 import mysql.connector
-from backend import helperfunctions
+import pandas as pd
 
-def json_to_sql_insert(file_path):
-    try:
-        with open(file_path, 'r') as file:
-            data_list = json.load(file)
+from backend import helperfunctions, rollups
+from backend.bulk_insert import write_batches
 
-        if not isinstance(data_list, list):
-            data_list = [data_list]
+TABLE = 'COVID19_TM'
+COLUMNS = ['DATE_ID', 'CAZURI', 'DECESE']
+DEFAULT_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tmdate.json')
 
-        queries = []
 
-        for data_dict in data_list:
-            data_value = data_dict.get("data", "")
-            cazuri_value = data_dict.get("cazuri", 0)
-            decese_value = data_dict.get("decese", 0)
+def iter_json_records(file, read_size=64 * 1024):
+    """Yield the records of a top-level JSON array one by one without loading the whole file.
 
-            sql_query = f"INSERT INTO COVID19_TM (DATE_ID, CAZURI, DECESE) VALUES ('{data_value}', {cazuri_value}, {decese_value});"
-            queries.append(sql_query)
+    A file holding a single object yields that object, like the old json.load() path did.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    in_array = None
+    eof = False
+    while True:
+        buffer = buffer.lstrip()
+        if in_array is None and buffer:
+            in_array = buffer[0] == '['
+            if in_array:
+                buffer = buffer[1:]
+            continue
+        if in_array and buffer[:1] == ',':
+            buffer = buffer[1:]
+            continue
+        if in_array and buffer[:1] == ']':
+            return
+        if buffer:
+            try:
+                record, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                if end == len(buffer) and not eof:
+                    # A scalar cut at the chunk boundary would still decode; read on to be sure.
+                    chunk = file.read(read_size)
+                    eof = not chunk
+                    buffer += chunk
+                    continue
+                yield record
+                buffer = buffer[end:]
+                if not in_array:
+                    return
+                continue
+        elif eof:
+            return
+        chunk = file.read(read_size)
+        if not chunk:
+            eof = True
+        buffer += chunk
 
-        queries.reverse()
-        return queries
-    except json.JSONDecodeError as e:
-        return f"Error decoding JSON: {e}"
-    except FileNotFoundError:
-        return "File not found."
-    except Exception as e:
-        return f"An error occurred: {e}"
 
-def execute_queries(file_path):
+def iter_batches(records, batch_size):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def convert_batch(records):
+    """Validate and type-convert a batch in one pass; returns (clean frame, invalid row count)."""
+    frame = pd.DataFrame.from_records(records)
+    for source in ('data', 'cazuri', 'decese'):
+        if source not in frame:
+            frame[source] = None
+    converted = pd.DataFrame({
+        'DATE_ID': pd.to_datetime(frame['data'], format='%Y-%m-%d', errors='coerce'),
+        'CAZURI': pd.to_numeric(frame['cazuri'].fillna(0), errors='coerce'),
+        'DECESE': pd.to_numeric(frame['decese'].fillna(0), errors='coerce'),
+    })
+    valid = converted.notna().all(axis=1)
+    converted = converted[valid].copy()
+    converted['DATE_ID'] = converted['DATE_ID'].dt.date
+    converted['CAZURI'] = converted['CAZURI'].astype('int64')
+    converted['DECESE'] = converted['DECESE'].astype('int64')
+    return converted, int((~valid).sum())
+
+
+def replace_dates(conn, frame, batch_size):
+    """Replace the rows of the batch's dates in one transaction.
+
+    COVID19_TM has no declared key, so (as for covid_global) re-imports delete the dates
+    they write instead of relying on ON DUPLICATE KEY UPDATE.
+    """
+    frame = frame.drop_duplicates(subset=['DATE_ID'], keep='last')
+    dates = list(frame['DATE_ID'])
+    cursor = conn.cursor()
     try:
-        conn = helperfunctions.get_db_connection()
-        cursor = conn.cursor()
+        cursor.execute(f"DELETE FROM {TABLE} WHERE DATE_ID IN ({', '.join(['%s'] * len(dates))})", dates)
+        written = write_batches(conn, TABLE, COLUMNS, frame[COLUMNS].itertuples(index=False, name=None),
+                                batch_size=batch_size, commit=False)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return written
+
+
+def import_json(file_path, batch_size=500):
+    stats = {'rows_read': 0, 'rows_written': 0, 'errors': 0, 'batches': 0, 'seconds': 0.0, 'rows_per_sec': 0.0}
+    first_date = last_date = None
+    started = time.monotonic()
+
+    with open(file_path, 'r') as file, helperfunctions.get_db_connection() as conn:
+        for records in iter_batches(iter_json_records(file), batch_size):
+            stats['rows_read'] += len(records)
+            try:
+                frame, invalid = convert_batch(records)
+            except Exception as e:
+                print(f"Skipping batch {stats['batches'] + 1}: {e}")
+                stats['errors'] += len(records)
+                continue
+            stats['errors'] += invalid
+            if frame.empty:
+                continue
+            stats['rows_written'] += replace_dates(conn, frame, batch_size)
+            stats['batches'] += 1
+            batch_first, batch_last = frame['DATE_ID'].min(), frame['DATE_ID'].max()
+            first_date = batch_first if first_date is None else min(first_date, batch_first)
+            last_date = batch_last if last_date is None else max(last_date, batch_last)
+
+    stats['seconds'] = time.monotonic() - started
+    stats['rows_per_sec'] = stats['rows_written'] / stats['seconds'] if stats['seconds'] else 0.0
 
-        sql_insert_queries = json_to_sql_insert(file_path)
+    helperfunctions.invalidate_table_cache('covid19_tm')
+    if first_date is not None:
+        rollups.refresh_rollups('covid19_tm', first_date, last_date)
+    return stats
 
-        for query in sql_insert_queries:
-            cursor.execute(query)
-            conn.commit()
-            print(f"Query executed successfully: {query}")
 
+def execute_queries(file_path, batch_size=500):
+    try:
+        stats = import_json(file_path, batch_size)
+        print(f"Imported {stats['rows_written']} rows ({stats['errors']} invalid) in {stats['batches']} batches, "
+              f"{stats['rows_per_sec']:,.0f} rows/s")
+        return stats
     except mysql.connector.Error as e:
         print(f"MySQL Error: {e}")
+    except json.JSONDecodeError as e:
+        print(f"Error decoding JSON: {e}")
+    except FileNotFoundError:
+        print("File not found.")
     except Exception as e:
         print(f"An error occurred: {e}")
-    finally:
-        if conn.is_connected():
-            conn.close()
-            print("MySQL connection is closed")
 
-# Example usage
-file_path = "D:/Licenta/EDSS/EpidemicDecisionalSupportSystem/dataimprov/tmdate.json"
-execute_queries(file_path)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import a tmdate.json style export into COVID19_TM.")
+    parser.add_argument('file_path', nargs='?', default=DEFAULT_FILE)
+    parser.add_argument('--batch-size', type=int, default=500)
+    args = parser.parse_args()
+    execute_queries(args.file_path, args.batch_size)
@@ -0,0 +1,15 @@
+# Settings for gunicorn wsgi:server (gunicorn reads this file from the working directory).
+from decouple import config
+
+# Every open simulation tab keeps a /simulation-stream request (and so a thread) busy, so
+# requests are served by threads; with the default sync workers a few tabs would take
+# every worker and starve the rest of the app.
+worker_class = 'gthread'
+# The running local simulation and the ensemble, calibration and analysis job registries live
+# in the process that started them, so start/pause/step/fork requests and job polls must all
+# reach the same process: the app is served by exactly one worker. Scale with threads instead.
+workers = 1
+threads = config('GUNICORN_THREADS', default=32, cast=int)
+# Streams close themselves after SIMULATION_STREAM_MAX_SECONDS; gthread workers do not time
+# out long requests, so the default timeout only guards against a hung worker.
+timeout = 30
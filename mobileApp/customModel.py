@@ -1,11 +1,8 @@
-from langchain_community.document_loaders import PyPDFLoader, DirectoryLoader
-from langchain.prompts import PromptTemplate
-from langchain_community.embeddings import HuggingFaceEmbeddings
-from langchain_community.vectorstores import FAISS
-from langchain_community.llms import CTransformers
-from langchain.chains import RetrievalQA
 import chainlit as cl
 
+# langchain and the embedding/LLM backends are imported inside the functions that use them,
+# so starting the chainlit app does not load them before the first chat opens.
+
 DB_FAISS_PATH = 'D:/Licenta/EDSS/EpidemicDecisionalSupportSystem/mobileApp/vectorstores/db_faiss'
 
 custom_prompt_template = """Try to answer the user's questions, but without using the source documents
@@ -19,12 +16,16 @@ def set_custom_prompt():
     """
     Prompt template for QA retrieval for each vectorstore
     """
+    from langchain.prompts import PromptTemplate
+
     prompt = PromptTemplate(template=custom_prompt_template,
                             input_variables=['context', 'question'])
     return prompt
 
 #Retrieval QA Chain
 def retrieval_qa_chain(llm, prompt, db):
+    from langchain.chains import RetrievalQA
+
     qa_chain = RetrievalQA.from_chain_type(llm=llm,
                                        chain_type='stuff',
                                        retriever=db.as_retriever(search_kwargs={'k': 2}),
@@ -36,6 +37,8 @@ def retrieval_qa_chain(llm, prompt, db):
 #Loading the model
 def load_llm():
     # Load the locally downloaded model here
+    from langchain_community.llms import CTransformers
+
     llm = CTransformers(
         model = "TheBloke/Llama-2-7B-Chat-GGML",
         model_type="llama",
@@ -46,6 +49,9 @@ def load_llm():
 
 #QA Model Function
 def qa_bot():
+    from langchain_community.embeddings import HuggingFaceEmbeddings
+    from langchain_community.vectorstores import FAISS
+
     embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2",
                                        model_kwargs={'device': 'cpu'})
     db = FAISS.load_local(DB_FAISS_PATH, embeddings)
@@ -2,28 +2,22 @@ import dash
 from dash import callback, html, dcc, Input, Output
 import plotly.express as px
 import plotly.graph_objs as go
-from backend import helperfunctions
+from backend import helperfunctions, page_data
 import pandas as pd
 from constants import COLUMN_NAME_MAPPING
 
 dash.register_page(__name__, path='/diagnostics')
 
-disease_data = helperfunctions.fetch_data_for_table('diagnostics')
 
-df_disease = pd.DataFrame(disease_data, columns=["NAME", "TOTAL"])
-
-fig_pie = px.pie(df_disease, names="NAME", values="TOTAL")
-fig_pie.update_traces(textposition='inside', textinfo='percent+label')
-fig_pie.update_layout(
-    font=dict(family="Arial", size=20),
-)
-
-layout = html.Div([
-    html.H1("Diagnostics and Cases", style={'text-align': 'center', 'font-size': '32px'}),
-    dcc.Graph(id="pie-chart", figure=fig_pie, style={"marginLeft": "2%"}),
-    html.Div(id="symptoms-output", style={"marginTop": 20, "textAlign": "center"}),
-    dcc.Graph(id="time-series-chart")
-], style={"fontFamily": "Arial"})
+# The pie chart is filled by update_pie_chart when the page opens, so building the layout needs no data.
+@page_data.timed_layout('diagnostics')
+def layout(**kwargs):
+    return html.Div([
+        html.H1("Diagnostics and Cases", style={'text-align': 'center', 'font-size': '32px'}),
+        dcc.Graph(id="pie-chart", style={"marginLeft": "2%"}),
+        html.Div(id="symptoms-output", style={"marginTop": 20, "textAlign": "center"}),
+        dcc.Graph(id="time-series-chart")
+    ], style={"fontFamily": "Arial"})
 
 
 @callback(
@@ -3,10 +3,8 @@ from dash import dcc, html, callback
 from dash.dependencies import Input, Output, State
 import plotly.express as px
 import plotly.graph_objects as go
-import pandas as pd
-import numpy as np
-from backend import helperfunctions
-from sklearn.linear_model import LinearRegression
+from dash.exceptions import PreventUpdate
+from backend import helperfunctions, aggregation, figure_cache, figures, trends
 from constants import *
 
 dash.register_page(__name__)
@@ -45,6 +43,21 @@ layout = html.Div([
             value='D',
             style={'width': '30%', 'margin-left': '13.5%'}
         ),
+        dcc.Dropdown(
+            id='trend-fit-dropdown',
+            options=[
+                {'label': 'Linear Trend', 'value': 'linear'},
+                {'label': 'Polynomial Trend', 'value': 'polynomial'},
+                {'label': 'Exponential Trend', 'value': 'loglinear'}
+            ],
+            value='linear',
+            clearable=False,
+            style={'width': '30%', 'margin-left': '13.5%'}
+        ),
+        html.Div([
+            html.Label('Forecast periods: '),
+            dcc.Input(id='trend-forecast-periods', type='number', value=0, min=0, max=365, style={'width': '70px'})
+        ], style={'margin-left': '13.5%'}),
     ], style={'display': 'flex', 'flexDirection': 'column', 'alignItems': 'center'}),
 
     dcc.Graph(id='trend-graph'),
@@ -73,21 +86,27 @@ layout = html.Div([
     Input('table-dropdown', 'value')
 )
 def update_column_dropdown(selected_table):
-    columns = helperfunctions.fetch_data_for_table(selected_table)
-    options = [{'label': COLUMN_NAME_MAPPING.get(col, col), 'value': col} for col in columns if col not in [BY_ID, BY_DATE]]
-    return options
+    return helperfunctions.get_column_options(selected_table)
 
 @callback(
     Output('static-graph', 'figure'),
     [Input('table-dropdown', 'value'),
-     Input('column-dropdown', 'value')],
+     Input('column-dropdown', 'value'),
+     Input('static-graph', 'relayoutData')],
     prevent_initial_call=True
 )
-def update_static_graph(selected_table, selected_columns):
+def update_static_graph(selected_table, selected_columns, relayout_data):
     if not selected_columns:
         return go.Figure()
 
-    df = helperfunctions.fetch_data_for_table(selected_table)
+    zoomed, x_range = figures.parse_zoom(relayout_data)
+    if dash.ctx.triggered_id == 'static-graph':
+        if not zoomed:
+            raise PreventUpdate
+    else:
+        x_range = None
+
+    df = helperfunctions.fetch_data_for_table(selected_table, columns=selected_columns, copy=False)
     if df.empty:
         return go.Figure()
 
@@ -97,8 +116,13 @@ def update_static_graph(selected_table, selected_columns):
         return go.Figure()
 
     try:
-        fig = px.line(df, x=BY_DATE, y=selected_columns, title='Default Analysis')
-        fig.for_each_trace(lambda trace: trace.update(name=COLUMN_NAME_MAPPING.get(trace.name, trace.name)))
+        # Each trace is downsampled to the visible range; zooming re-requests that range in more detail.
+        fig = go.Figure([figures.line_trace(df[BY_DATE], df[col], COLUMN_NAME_MAPPING.get(col, col), x_range)
+                         for col in selected_columns])
+        fig.update_layout(title='Default Analysis', xaxis_title=BY_DATE, yaxis_title='value',
+                          legend_title_text='variable', uirevision=f'{selected_table}:{",".join(selected_columns)}')
+        if x_range is not None:
+            fig.update_xaxes(range=list(x_range))
         return fig
     except Exception as e:
         print(f"Error in plotting with selected columns {selected_columns}: {e}")
@@ -109,28 +133,35 @@ def update_static_graph(selected_table, selected_columns):
     Output('trend-graph', 'figure'),
     [Input('table-dropdown', 'value'),
      Input('column-dropdown', 'value'),
-     Input('time-span-dropdown', 'value')],
+     Input('time-span-dropdown', 'value'),
+     Input('trend-fit-dropdown', 'value'),
+     Input('trend-forecast-periods', 'value')],
     prevent_initial_call=True
 )
-def update_trend_graph(selected_table, selected_columns, time_span):
-    df = helperfunctions.fetch_data_for_table(selected_table)
-    if df.empty or not selected_columns:
+def update_trend_graph(selected_table, selected_columns, time_span, fit_kind, periods):
+    if not selected_columns:
+        return dash.no_update
+    try:
+        df_resampled, df_trend = trends.forecast(selected_table, selected_columns, time_span,
+                                                 periods=int(periods or 0), kind=fit_kind or 'linear')
+    except Exception as e:
+        print(f"Error fitting trends for {selected_columns}: {e}")
+        return dash.no_update
+    if df_resampled.empty:
         return dash.no_update
-
-    df['DATE_ID'] = pd.to_datetime(df['DATE_ID'])
-    df.set_index('DATE_ID', inplace=True)
 
     trend_fig = go.Figure()
+    observed = len(df_resampled)
     for col in selected_columns:
-        df_resampled = df[col].resample(time_span).mean().dropna().reset_index()
-        df_resampled['Time'] = np.arange(len(df_resampled.index))
-        X = df_resampled['Time'].values.reshape(-1, 1)
-        y = df_resampled[col].values
-        model = LinearRegression()
-        model.fit(X, y)
-        trend_line = model.predict(X)
-        trend_fig.add_trace(go.Scatter(x=df_resampled[BY_DATE], y=trend_line, mode='lines', name=f'{COLUMN_NAME_MAPPING.get(col, col)} Trend'))
-        trend_fig.add_trace(go.Scatter(x=df_resampled[BY_DATE], y=y, mode='markers', name=f'{COLUMN_NAME_MAPPING.get(col, col)} Actual'))
+        name = COLUMN_NAME_MAPPING.get(col, col)
+        if f'{col}_TREND' in df_trend:
+            trend_fig.add_trace(go.Scatter(x=df_trend[BY_DATE][:observed], y=df_trend[f'{col}_TREND'][:observed], mode='lines', name=f'{name} Trend'))
+        trend_fig.add_trace(go.Scatter(x=df_resampled[BY_DATE], y=df_resampled[col], mode='markers', name=f'{name} Actual'))
+        if periods and f'{col}_TREND' in df_trend:
+            future = df_trend.iloc[observed - 1:]
+            trend_fig.add_trace(go.Scatter(x=future[BY_DATE], y=future[f'{col}_LOW'], mode='lines', line={'width': 0}, showlegend=False, hoverinfo='skip'))
+            trend_fig.add_trace(go.Scatter(x=future[BY_DATE], y=future[f'{col}_HIGH'], mode='lines', line={'width': 0}, fill='tonexty', name=f'{name} 95% Interval'))
+            trend_fig.add_trace(go.Scatter(x=future[BY_DATE], y=future[f'{col}_TREND'], mode='lines', line={'dash': 'dash'}, name=f'{name} Forecast'))
 
     trend_fig.update_layout(title='Trend Analysis', xaxis_title='Date', yaxis_title='Value')
     return trend_fig
@@ -145,13 +176,18 @@ def update_trend_graph(selected_table, selected_columns, time_span):
     prevent_initial_call=True
 )
 def update_dynamic_chart(selected_table, selected_columns, time_span, chart_type):
-    df = helperfunctions.fetch_data_for_table(selected_table)
-    if df.empty or not selected_columns:
+    if not selected_columns:
         return dash.no_update
+    fig = figure_cache.cached_figure('dynamic-chart', (selected_table, selected_columns, time_span, chart_type),
+                                     [selected_table],
+                                     lambda: build_dynamic_chart(selected_table, selected_columns, time_span, chart_type))
+    return fig if fig is not None else dash.no_update
+
 
-    df[BY_DATE] = pd.to_datetime(df[BY_DATE])
-    df.set_index(BY_DATE, inplace=True)
-    df_resampled = df[selected_columns].resample(time_span).sum().reset_index()
+def build_dynamic_chart(selected_table, selected_columns, time_span, chart_type):
+    df_resampled = aggregation.aggregate(selected_table, selected_columns, time_span, 'sum')
+    if df_resampled.empty:
+        return None
 
     if chart_type == 'line':
         fig = px.line(df_resampled, x=BY_DATE, y=selected_columns, title='Line Chart')
@@ -163,7 +199,7 @@ def update_dynamic_chart(selected_table, selected_columns, time_span, chart_type
         if len(selected_columns) == 1:
             fig = px.pie(df_resampled, names=BY_DATE, values=selected_columns[0], title='Pie Chart')
         else:
-            return dash.no_update
+            return None
 
     fig.for_each_trace(lambda trace: trace.update(name=COLUMN_NAME_MAPPING.get(trace.name, trace.name)))
-    return fig
\ No newline at end of file
+    return fig
@@ -4,14 +4,11 @@ from dash.exceptions import PreventUpdate
 import dash_leaflet as dl
 import json
 
-from backend.helperfunctions import post_message, get_messages, get_citiesAndMarkers, get_decisionResponses
+from backend import page_data
+from backend.helperfunctions import post_message, get_messages
 
 dash.register_page(__name__)
 
-cities = get_citiesAndMarkers()
-
-data_for_buttons = get_decisionResponses()
-
 gravity_options = [
     {'label': 'Minor', 'value': 'minor'},
     {'label': 'Moderate', 'value': 'moderate'},
@@ -136,47 +133,54 @@ h2_style_details = {
     'paddingBottom': '10px',
 }
 
-left_side_layout = html.Div([
-    dl.Map(center=[50, 10], zoom=4, children=[
-        dl.TileLayer(),
-        dl.LayerGroup(id="marker-layer", children=[
-            dl.Marker(position=(info["lat"], info["lon"]),
-                      id={"type": "city-marker", "index": city},
-                      children=[dl.Tooltip(city), dl.Popup(city)]
-                     ) for city, info in cities.items()
-        ]),
-    ], style={'width': '100%', 'height': '700px', 'margin-bottom': '20px'}),
-    html.Div([
-        html.Label('Disaster Type:', style={'margin-right': '10px'}),
-        dcc.Dropdown(id='disaster-dropdown', options=disaster_options, placeholder="Select a disaster type",
-                     style=capsule_dropdown_style),
-    ], style=capsule_wrapper_style),
-    html.Div([
-        html.Label('Severity:', style={'margin-right': '10px'}),
-        dcc.Dropdown(id='gravity-dropdown', options=gravity_options, placeholder="Select the gravity of the situation",
-                     style=capsule_dropdown_style),
-    ], style=capsule_wrapper_style),
-    html.Div([
-        html.Label('Title:', style={'margin-right': '10px'}),
-        dcc.Input(id='title-input', type='text', placeholder='Title',
-                  style=input_style),
-        html.Div(style=separator_style),  # The vertical line separator
-        html.Label('Range:', style={'margin-right': '10px'}),
-        dcc.Input(id='range-input', type='number', placeholder='Range in km (10-100)',
-                  min=10, max=100, step=10, value=50,
-                  style=input_style),
-    ], style=input_group_style),
-    html.Label('Description:', style=description_label_style),
-    dcc.Textarea(id='description-input', placeholder='Enter a detailed description of the situation...',
-                 style={'width': '100%', 'height': 100}),
-    html.Div([
-        html.Button('Submit', id='submit-btn', n_clicks=0, style=button_style),
-        html.Button('Update Map', id='update-map-btn', n_clicks=0, style=button_style),
-    ], style=button_container_style),
-    html.Div(id='output-div', style={'margin-top': '20px'}),
-    dcc.Store(id='circles-store'),
-    dcc.Store(id='selected-city')
-], style=left_side_style)
+
+def city_markers(cities):
+    return [
+        dl.Marker(position=(info["lat"], info["lon"]),
+                  id={"type": "city-marker", "index": city},
+                  children=[dl.Tooltip(city), dl.Popup(city)]
+                  ) for city, info in cities.items()
+    ]
+
+
+def left_side_layout():
+    return html.Div([
+        dl.Map(center=[50, 10], zoom=4, children=[
+            dl.TileLayer(),
+            dl.LayerGroup(id="marker-layer", children=[]),
+        ], style={'width': '100%', 'height': '700px', 'margin-bottom': '20px'}),
+        html.Div([
+            html.Label('Disaster Type:', style={'margin-right': '10px'}),
+            dcc.Dropdown(id='disaster-dropdown', options=disaster_options, placeholder="Select a disaster type",
+                         style=capsule_dropdown_style),
+        ], style=capsule_wrapper_style),
+        html.Div([
+            html.Label('Severity:', style={'margin-right': '10px'}),
+            dcc.Dropdown(id='gravity-dropdown', options=gravity_options, placeholder="Select the gravity of the situation",
+                         style=capsule_dropdown_style),
+        ], style=capsule_wrapper_style),
+        html.Div([
+            html.Label('Title:', style={'margin-right': '10px'}),
+            dcc.Input(id='title-input', type='text', placeholder='Title',
+                      style=input_style),
+            html.Div(style=separator_style),  # The vertical line separator
+            html.Label('Range:', style={'margin-right': '10px'}),
+            dcc.Input(id='range-input', type='number', placeholder='Range in km (10-100)',
+                      min=10, max=100, step=10, value=50,
+                      style=input_style),
+        ], style=input_group_style),
+        html.Label('Description:', style=description_label_style),
+        dcc.Textarea(id='description-input', placeholder='Enter a detailed description of the situation...',
+                     style={'width': '100%', 'height': 100}),
+        html.Div([
+            html.Button('Submit', id='submit-btn', n_clicks=0, style=button_style),
+            html.Button('Update Map', id='update-map-btn', n_clicks=0, style=button_style),
+        ], style=button_container_style),
+        html.Div(id='output-div', style={'margin-top': '20px'}),
+        dcc.Store(id='circles-store'),
+        dcc.Store(id='selected-city')
+    ], style=left_side_style)
+
 
 right_side_style = {
     'width': '49%',
@@ -203,38 +207,59 @@ def generate_button_style(is_active=False):
     }
 
 
-right_side_layout = html.Div([
-    html.Div([
-        html.H2('Possible & Ongoing Incidents', style=h2_style_top),
-        html.Hr(style={'marginBottom': '20px'}),
+def disaster_buttons(data_for_buttons):
+    return [
         html.Div([
-            html.Div([
-                html.Button(f"{data['disaster']} - {data['city']}",
-                            id={'type': 'disaster-button', 'index': data['city']},
-                            n_clicks=0,
-                            style=generate_button_style()),
-                html.Div(
-                    id={'type': 'details-container', 'index': data['city']},
-                    style={'display': 'none'}
-                )
-            ]) for data in data_for_buttons
-        ], id='disaster-buttons-container', style={'display': 'flex', 'flexDirection': 'column'}),
-    ]),
-    html.Div(style={'height': '35%'}),
-
-    html.Div([
-        html.H2('Details', style=h2_style_details),
-        html.Hr(style={'marginBottom': '20px'}),
-        html.Div(id='city-details', style={'marginTop': '20px'}),
-        html.Div(id='description-section', style={'marginTop': '20px'})
-    ]),
-], style=right_side_style)
-
-layout = html.Div([
-    left_side_layout,
-    html.Div(style={'width': '3px', 'backgroundColor': 'black'}),
-    right_side_layout
-], style={'width': '100%', 'display': 'flex', 'height': '100%', 'fontFamily': '"Arial", sans-serif'})
+            html.Button(f"{data['disaster']} - {data['city']}",
+                        id={'type': 'disaster-button', 'index': data['city']},
+                        n_clicks=0,
+                        style=generate_button_style()),
+            html.Div(
+                id={'type': 'details-container', 'index': data['city']},
+                style={'display': 'none'}
+            )
+        ]) for data in data_for_buttons
+    ]
+
+
+def right_side_layout():
+    return html.Div([
+        html.Div([
+            html.H2('Possible & Ongoing Incidents', style=h2_style_top),
+            html.Hr(style={'marginBottom': '20px'}),
+            html.Div([], id='disaster-buttons-container', style={'display': 'flex', 'flexDirection': 'column'}),
+        ]),
+        html.Div(style={'height': '35%'}),
+
+        html.Div([
+            html.H2('Details', style=h2_style_details),
+            html.Hr(style={'marginBottom': '20px'}),
+            html.Div(id='city-details', style={'marginTop': '20px'}),
+            html.Div(id='description-section', style={'marginTop': '20px'})
+        ]),
+    ], style=right_side_style)
+
+
+# City markers and decision responses come from the API. Dash builds every page's layout for
+# callback validation on the first request, so the layout is only placeholders and
+# load_page_data fills them once the page is open.
+@page_data.timed_layout('notifications')
+def layout(**kwargs):
+    return html.Div([
+        left_side_layout(),
+        html.Div(style={'width': '3px', 'backgroundColor': 'black'}),
+        right_side_layout()
+    ], style={'width': '100%', 'display': 'flex', 'height': '100%', 'fontFamily': '"Arial", sans-serif'})
+
+
+@callback(
+    Output('marker-layer', 'children', allow_duplicate=True),
+    Output('disaster-buttons-container', 'children'),
+    Input('url', 'pathname'),
+    prevent_initial_call='initial_duplicate'
+)
+def load_page_data(pathname):
+    return city_markers(page_data.get('cities')), disaster_buttons(page_data.get('decision_responses'))
 
 
 @callback(
@@ -263,7 +288,7 @@ def update_button_styles_and_description(n_clicks, ids):
     for i, btn_id in enumerate(ids):
         if btn_id['index'] == triggered_index:
             button_styles[i] = generate_button_style(True)
-            selected_data = next((item for item in data_for_buttons if item['city'] == triggered_index), None)
+            selected_data = next((item for item in page_data.get('decision_responses') if item['city'] == triggered_index), None)
             if selected_data:
                 description_content = html.Div([
                     html.H4(f"City: {selected_data['city']}"),
@@ -298,14 +323,14 @@ def update_city_details_and_selection(button_n_clicks, marker_n_clicks, button_i
 
     if triggered_type == 'city-marker':
         disaster_dropdown_value = None
-        selected_data = next((item for city, item in cities.items() if city == selected_city), None)
+        selected_data = page_data.get('cities').get(selected_city)
         if not selected_data:
             raise PreventUpdate
         details = html.Div([
             html.H4(f"City: {selected_city}"),
         ])
     else:
-        selected_data = next((item for item in data_for_buttons if item['city'] == selected_city), None)
+        selected_data = next((item for item in page_data.get('decision_responses') if item['city'] == selected_city), None)
         if not selected_data:
             raise PreventUpdate
         disaster_dropdown_value = selected_data['disaster'].upper()
@@ -321,13 +346,8 @@ def update_city_details_and_selection(button_n_clicks, marker_n_clicks, button_i
 )
 def update_map(n_clicks):
     if n_clicks > 0:
-        markers = [
-            dl.Marker(
-                position=(info["lat"], info["lon"]),
-                children=[dl.Tooltip(city), dl.Popup(city)],
-                id={"type": "city-marker", "index": city}
-            ) for city, info in cities.items()
-        ]
+        cities = page_data.get('cities')
+        markers = city_markers(cities)
 
         messages = get_messages()
         circles = []
@@ -2,7 +2,7 @@ from dash.dependencies import Input, Output
 import dash
 from dash import dcc, html, callback
 import plotly.graph_objs as go
-from backend import helperfunctions
+from backend import figures, helperfunctions
 from dash.exceptions import PreventUpdate
 from constants import *
 
@@ -75,10 +75,8 @@ layout = html.Div([
      Input('table-dropdown-2', 'value')]
 )
 def update_column_dropdown(table1, table2):
-    columns_table1 = [col for col in helperfunctions.fetch_data_for_table(table1) if col not in ['DAY_INCREMENT', 'DATE_ID']]
-    columns_table2 = [col for col in helperfunctions.fetch_data_for_table(table2) if col not in ['DAY_INCREMENT', 'DATE_ID']]
-    options_table1 = [{'label': COLUMN_NAME_MAPPING.get(col, col), 'value': col} for col in columns_table1]
-    options_table2 = [{'label': COLUMN_NAME_MAPPING.get(col, col), 'value': col} for col in columns_table2]
+    options_table1 = helperfunctions.get_column_options(table1)
+    options_table2 = helperfunctions.get_column_options(table2)
     return options_table1, options_table2
 
 
@@ -101,15 +99,23 @@ def update_column_dropdown(table1, table2):
         Input('column-dropdown-2', 'value'),
         Input('time-range-slider-1', 'value'),
         Input('time-range-slider-2', 'value'),
-        Input('plot-button', 'n_clicks')
+        Input('plot-button', 'n_clicks'),
+        Input('side-by-side-graph', 'relayoutData')
     ]
 )
-def plot_side_by_side(table1_name, columns_table1, table2_name, columns_table2, time_range_1, time_range_2, n_clicks):
+def plot_side_by_side(table1_name, columns_table1, table2_name, columns_table2, time_range_1, time_range_2, n_clicks, relayout_data):
     if n_clicks is None:
         raise PreventUpdate
 
-    df_table1 = helperfunctions.fetch_data_for_table(table1_name)
-    df_table2 = helperfunctions.fetch_data_for_table(table2_name)
+    zoomed, x_range = figures.parse_zoom(relayout_data)
+    if dash.ctx.triggered_id == 'side-by-side-graph':
+        if not zoomed:
+            raise PreventUpdate
+    else:
+        x_range = None
+
+    df_table1 = helperfunctions.fetch_data_for_table(table1_name, columns=columns_table1 or [], copy=False)
+    df_table2 = helperfunctions.fetch_data_for_table(table2_name, columns=columns_table2 or [], copy=False)
 
     if df_table1.empty or df_table2.empty:
         raise PreventUpdate
@@ -132,27 +138,29 @@ def plot_side_by_side(table1_name, columns_table1, table2_name, columns_table2,
     df_table1_filtered = df_table1[df_table1['DAY_INCREMENT'].between(*valid_range_1)]
     df_table2_filtered = df_table2[df_table2['DAY_INCREMENT'].between(*valid_range_2)]
 
+    # Traces are downsampled to the visible range; zooming re-requests that range in more detail.
     traces_table1 = [
-        go.Scatter(
-            x=df_table1_filtered['DAY_INCREMENT'],
-            y=df_table1_filtered[col],
-            mode='lines',
-            name=f'{COLUMN_NAME_MAPPING.get(table1_name, table1_name)} - {COLUMN_NAME_MAPPING.get(col, col)}'
+        figures.line_trace(
+            df_table1_filtered['DAY_INCREMENT'],
+            df_table1_filtered[col],
+            f'{COLUMN_NAME_MAPPING.get(table1_name, table1_name)} - {COLUMN_NAME_MAPPING.get(col, col)}',
+            x_range
         ) for col in columns_table1
     ]
     traces_table2 = [
-        go.Scatter(
-            x=df_table2_filtered['DAY_INCREMENT'],
-            y=df_table2_filtered[col],
-            mode='lines',
-            name=f'{COLUMN_NAME_MAPPING.get(table2_name, table2_name)} - {COLUMN_NAME_MAPPING.get(col, col)}'
+        figures.line_trace(
+            df_table2_filtered['DAY_INCREMENT'],
+            df_table2_filtered[col],
+            f'{COLUMN_NAME_MAPPING.get(table2_name, table2_name)} - {COLUMN_NAME_MAPPING.get(col, col)}',
+            x_range
         ) for col in columns_table2
     ]
 
     layout = go.Layout(
         title=f'Side-by-Side Comparison of {", ".join([COLUMN_NAME_MAPPING.get(col, col) for col in columns_table1])} and {", ".join([COLUMN_NAME_MAPPING.get(col, col) for col in columns_table2])}',
-        xaxis={'title': 'DAYS'},
-        yaxis={'title': 'Values'}
+        xaxis={'title': 'DAYS', 'range': list(x_range) if x_range is not None else None},
+        yaxis={'title': 'Values'},
+        uirevision=f'{table1_name}:{table2_name}'
     )
 
     fig = go.Figure(data=traces_table1 + traces_table2, layout=layout)
@@ -1,15 +1,31 @@
 import dash
-from dash import html, dcc, Output, Input, callback, State
+from dash import html, dcc, Output, Input, callback, clientside_callback, ClientsideFunction, State
 import plotly.express as px
+import plotly.graph_objects as go
 import requests
 from dash.exceptions import PreventUpdate
-from backend import helperfunctions
+from backend import analysis, figures, helperfunctions, seird, surrogate
+from backend.ensemble import BAND_METRICS, PERCENTILES, get_ensemble, start_ensemble
+from backend.simulation_control import get_simulation_backend
 from constants import *
 
 dash.register_page(__name__)
 
 input_size = '70px'
 
+PARAMETER_IDS = [
+    'numberOfAgentsParam', 'numberOfSickAtStartParam', 'simPeriodParam',
+    'standardIncubationTimeDiseaseParam', 'chanceToTransmitDiseaseParam', 'healingTimeDiseaseParam',
+    'initialChanceToHealParam', 'initialChanceToKillParam', 'chanceForAsymptomaticParam',
+    'chanceToGoOutParam', 'chanceToSelfQuarantineParam', 'agentsAtCentralLocation_atSameTimeParam',
+    'maskDistributionTimeParam', 'maskCooldownTimeParam', 'maskUse',
+    'vaccineDistributionTimeParam', 'vaccineEnforced',
+]
+
+TABLE_LABELS = {option['value']: option['label'] for option in TABLE_OPTIONS}
+
+BAND_COLORS = {'SICK': '255, 127, 14', 'DEAD': '214, 39, 40', 'CURED': '44, 160, 44'}
+
 main_parameters = [
     html.Div([
         html.Label(SIMULATION_LABELS['numberOfAgentsParam']),
@@ -96,7 +112,14 @@ vaccine_parameters = [
 layout = html.Div([
     html.H1('Epidemic Simulation', style={'textAlign': 'center', 'fontSize': '40px', 'fontFamily': 'Arial'}),
     dcc.Graph(id='real-time-graph'),
-    dcc.Interval(id='interval-component', interval=1*1000, n_intervals=0),
+    dcc.Graph(id='preview-graph', style={'display': 'none'}),
+    # Ensemble progress only; it is enabled while an ensemble job runs.
+    dcc.Interval(id='interval-component', interval=1*1000, n_intervals=0, disabled=True),
+    # New simulation days are pushed by /simulation-stream (see assets/simulation_stream.js).
+    html.Div(id='simulation-stream', style={'display': 'none'}),
+    dcc.Store(id='simulation-push'),
+    dcc.Store(id='simulation-reload', data=0),
+    dcc.Store(id='simulation-cursor', data={'run_id': None, 'last_day': None, 'columns': []}),
     html.Div([
         html.Button('Start Simulation', id='start-simulation-button', n_clicks=0, style={'border-radius': '20px', 'background-color': '#007bff', 'color': 'white', 'font-size': '20px', 'margin': '10px'}),
         html.Button('Pause Simulation', id='pause-simulation-button', n_clicks=0, style={'border-radius': '20px', 'background-color': '#007bff', 'color': 'white', 'font-size': '20px', 'margin': '10px'}),
@@ -104,6 +127,22 @@ layout = html.Div([
         html.Button('Reset Simulation', id='reset-simulation-button', n_clicks=0, style={'border-radius': '20px', 'background-color': '#007bff', 'color': 'white', 'font-size': '20px', 'margin': '10px'}),
     ], style={'text-align': 'center'}),
     html.Div(id='dummy-output', style={'display': 'none'}),
+    html.Div([
+        html.Label('Ensemble runs'),
+        dcc.Input(id='ensemble-runs', type='number', value=20, min=2, max=500, style={'width': input_size, 'margin': '10px'}),
+        html.Button('Run Ensemble', id='run-ensemble-button', n_clicks=0, style={'border-radius': '20px', 'background-color': '#007bff', 'color': 'white', 'font-size': '20px', 'margin': '10px'}),
+        html.Span(id='ensemble-status', style={'margin': '10px'}),
+    ], style={'text-align': 'center'}),
+    html.Div([
+        dcc.Dropdown(id='calibration-table', options=[option for option in TABLE_OPTIONS if option['value'] in seird.OBSERVED_COLUMNS],
+                     value='covid19_tm', clearable=False, style={'width': '250px', 'display': 'inline-block', 'verticalAlign': 'middle'}),
+        html.Button('Calibrate from Data', id='calibrate-button', n_clicks=0, style={'border-radius': '20px', 'background-color': '#007bff', 'color': 'white', 'font-size': '20px', 'margin': '10px'}),
+        html.Span(id='calibration-status', style={'margin': '10px'}),
+    ], style={'text-align': 'center'}),
+    dcc.Store(id='calibration-job', data={'job_id': None, 'agents': None}),
+    dcc.Interval(id='calibration-interval', interval=1000, n_intervals=0, disabled=True),
+    dcc.Store(id='ensemble-job', data={'job_id': None, 'completed': 0, 'done': False}),
+    dcc.Graph(id='ensemble-graph', style={'display': 'none'}),
     html.Div(main_parameters, id='main-parameters'),
     html.Div([
         html.H3('Disease Parameters'),
@@ -126,33 +165,69 @@ layout = html.Div([
     ], style={'display': 'flex', 'align-items': 'center'}),
     html.Div(vaccine_parameters, id='vaccine-parameters', style={'display': 'none'}),
     html.Button('Analyze Simulation', id='analyze-simulation-button', n_clicks=0, style={'border-radius': '20px', 'background-color': '#007bff', 'color': 'white', 'font-size': '20px', 'margin': '10px'}),
+    html.Button('Cancel Analysis', id='cancel-analysis-button', n_clicks=0, style={'border-radius': '20px', 'background-color': '#6c757d', 'color': 'white', 'font-size': '20px', 'margin': '10px'}),
+    dcc.Store(id='analysis-job', data={'job_id': None}),
+    dcc.Interval(id='analysis-interval', interval=500, n_intervals=0, disabled=True),
     html.Div(id='analysis-output', style={'marginLeft': '1%', 'marginTop': '1%', 'fontSize': '20px'}),
 ])
 
 
+def collect_parameters(values):
+    parameters = dict(zip(PARAMETER_IDS, values))
+    parameters['maskUse'] = 'maskUse' in (parameters['maskUse'] or [])
+    parameters['vaccineEnforced'] = 'vaccineEnforced' in (parameters['vaccineEnforced'] or [])
+    return parameters
+
+
+def build_simulation_figure(df, columns):
+    # Stacked areas need one shared x axis, so rows are kept if they carry a peak of any column.
+    df_renamed = figures.downsample_frame(df, BY_ID, columns).rename(columns=COLUMN_NAME_MAPPING)
+    fig = px.area(df_renamed, x=COLUMN_NAME_MAPPING.get(BY_ID, BY_ID),
+                  y=[COLUMN_NAME_MAPPING.get(col, col) for col in columns])
+    fig.update_layout(legend_title_text='Metrics',
+                      xaxis_title=COLUMN_NAME_MAPPING.get(BY_ID, BY_ID))
+    return fig
+
+
 @callback(
     Output('real-time-graph', 'figure'),
-    Input('interval-component', 'n_intervals')
+    Output('simulation-cursor', 'data'),
+    Input('simulation-reload', 'data')
 )
-def update_graph(n):
-    df = helperfunctions.fetch_data_for_simulation()
+def update_graph(reload):
+    # Loads the whole current run; later days arrive through the stream and are appended client-side.
+    empty_cursor = {'run_id': None, 'last_day': None, 'columns': []}
+    run_id = helperfunctions.fetch_simulation_run_id()
+    df = helperfunctions.fetch_data_for_simulation(run_id)
     if df.empty:
         print("No data retrieved from the database.")
-        return px.area()
+        return px.area(), empty_cursor
 
     try:
-        available_columns = [col for col in df.columns if col not in [BY_ID, BY_DATE]]
-        df_renamed = df.rename(columns=COLUMN_NAME_MAPPING)
-
-        fig = px.area(df_renamed, x=COLUMN_NAME_MAPPING.get(BY_ID, BY_ID),
-                      y=[COLUMN_NAME_MAPPING.get(col, col) for col in available_columns])
-        fig.update_layout(legend_title_text='Metrics',
-                          xaxis_title=COLUMN_NAME_MAPPING.get(BY_ID, BY_ID))
-
-        return fig
+        columns = [col for col in df.columns if col not in [BY_ID, BY_DATE]]
+        fig = build_simulation_figure(df, columns)
+        return fig, {'run_id': run_id, 'last_day': int(df[BY_ID].max()), 'columns': columns}
     except Exception as e:
         print(f"Error creating graph: {e}")
-        return {}
+        return {}, empty_cursor
+
+
+clientside_callback(
+    ClientsideFunction(namespace='simulation', function_name='connect'),
+    Output('simulation-stream', 'children'),
+    Input('simulation-stream', 'id')
+)
+
+
+clientside_callback(
+    ClientsideFunction(namespace='simulation', function_name='extend'),
+    Output('real-time-graph', 'extendData'),
+    Output('simulation-cursor', 'data', allow_duplicate=True),
+    Output('simulation-reload', 'data'),
+    Input('simulation-push', 'data'),
+    State('simulation-cursor', 'data'),
+    prevent_initial_call=True
+)
 
 
 @callback(
@@ -188,62 +263,45 @@ def control_simulation_and_submit_parameters(start_clicks, pause_clicks, resume_
 
     disable_main_params = 'start-simulation-button' in changed_id
 
-    parameter_values = {
-        'numberOfAgentsParam': param_values[0],
-        'numberOfSickAtStartParam': param_values[1],
-        'simPeriodParam': param_values[2],
-        'standardIncubationTimeDiseaseParam': param_values[3],
-        'chanceToTransmitDiseaseParam': param_values[4],
-        'healingTimeDiseaseParam': param_values[5],
-        'initialChanceToHealParam': param_values[6],
-        'initialChanceToKillParam': param_values[7],
-        'chanceForAsymptomaticParam': param_values[8],
-        'chanceToGoOutParam': param_values[9],
-        'chanceToSelfQuarantineParam': param_values[10],
-        'agentsAtCentralLocation_atSameTimeParam': param_values[11],
-        'maskDistributionTimeParam': param_values[12],
-        'maskCooldownTimeParam': param_values[13],
-        'maskUse': 'maskUse' in param_values[14],
-        'vaccineDistributionTimeParam': param_values[15],
-        'vaccineEnforced': 'vaccineEnforced' in param_values[16]
-    }
+    parameter_values = collect_parameters(param_values)
+
+    simulation = get_simulation_backend()
 
     if changed_id:
         param_key = changed_id.split('.')[0]
         if param_key in parameter_values:
             try:
-                response = requests.post('http://localhost:8080/updateParameters', json={param_key: parameter_values[param_key]})
-                if response.status_code == 200:
+                if simulation.update_parameter(param_key, parameter_values[param_key]):
                     print(f"Parameter {param_key} updated successfully.")
                 else:
-                    print(f"Failed to update parameter {param_key}: {response.status_code}")
+                    print(f"Failed to update parameter {param_key}")
             except requests.RequestException as e:
                 print(f"Error during parameter update: {e}")
 
     if 'start-simulation-button' in changed_id:
         try:
-            requests.post('http://localhost:8080/startSimulation')
+            simulation.start()
             print("Simulation started successfully.")
         except requests.RequestException as e:
             print(f"Failed to start simulation: {e}")
 
     elif 'reset-simulation-button' in changed_id:
         try:
-            requests.post('http://localhost:8080/resetSimulation')
+            simulation.reset()
             print("Simulation reset.")
         except requests.RequestException as e:
             print(f"Failed to reset simulation: {e}")
 
     elif 'pause-simulation-button' in changed_id:
         try:
-            requests.post('http://localhost:8080/pauseSimulation')
+            simulation.pause()
             print("Simulation paused.")
         except requests.RequestException as e:
             print(f"Failed to pause simulation: {e}")
 
     elif 'resume-simulation-button' in changed_id:
         try:
-            requests.post('http://localhost:8080/resumeSimulation')
+            simulation.resume()
             print("Simulation resumed.")
         except requests.RequestException as e:
             print(f"Failed to resume simulation: {e}")
@@ -251,6 +309,140 @@ def control_simulation_and_submit_parameters(start_clicks, pause_clicks, resume_
     return None, disable_main_params, disable_main_params, disable_main_params
 
 
+CALIBRATED_PARAMETERS = ['numberOfSickAtStartParam', 'standardIncubationTimeDiseaseParam', 'chanceToTransmitDiseaseParam',
+                         'healingTimeDiseaseParam', 'initialChanceToKillParam', 'chanceToGoOutParam']
+
+
+@callback(
+    Output('calibration-job', 'data'),
+    Output('calibration-interval', 'disabled', allow_duplicate=True),
+    Output('calibration-status', 'children', allow_duplicate=True),
+    Input('calibrate-button', 'n_clicks'),
+    State('calibration-table', 'value'),
+    State('numberOfAgentsParam', 'value'),
+    State('calibration-job', 'data'),
+    prevent_initial_call=True
+)
+def calibrate_parameters(n_clicks, table, agents, job_state):
+    # The search runs as a background job; update_calibration polls it.
+    if not n_clicks or not table:
+        raise PreventUpdate
+    job_id = seird.start_calibration(table, replaces=(job_state or {}).get('job_id'))
+    return {'job_id': job_id, 'agents': agents}, False, f"Calibrating against {TABLE_LABELS.get(table, table)}..."
+
+
+@callback(
+    *[Output(parameter_id, 'value') for parameter_id in CALIBRATED_PARAMETERS],
+    Output('calibration-status', 'children'),
+    Output('calibration-interval', 'disabled'),
+    Input('calibration-interval', 'n_intervals'),
+    State('calibration-job', 'data'),
+    prevent_initial_call=True
+)
+def update_calibration(n, job_state):
+    job_state = job_state or {}
+    job = seird.get_calibration(job_state.get('job_id')) if job_state.get('job_id') else None
+    no_values = [dash.no_update for _ in CALIBRATED_PARAMETERS]
+    if job is None:
+        return *no_values, dash.no_update, True
+    label = TABLE_LABELS.get(job.table, job.table)
+    if not job.done:
+        progress = f" (round {job.completed}/{job.rounds})" if job.rounds else ""
+        return *no_values, f"Calibrating against {label}{progress}...", False
+    if job.error:
+        return *no_values, f"Calibration failed: {job.error}", True
+    result = job.result
+    parameters = seird.to_simulation_parameters(result['parameters'], job_state.get('agents'))
+    status = f"Calibrated against {label} ({len(result['curves'])} days)"
+    return *[parameters[parameter_id] for parameter_id in CALIBRATED_PARAMETERS], status, True
+
+
+def build_band_figure(frame, suffixes, band_label, center_label, title):
+    """Shaded low-high band plus a center line per metric; suffixes name the (low, center, high) columns."""
+    low, mid, high = suffixes
+    x_values = frame[BY_ID]
+    fig = go.Figure()
+    for metric in BAND_METRICS:
+        color = BAND_COLORS[metric]
+        name = COLUMN_NAME_MAPPING.get(metric, metric)
+        fig.add_trace(go.Scatter(x=x_values, y=frame[f'{metric}{low}'], mode='lines',
+                                 line={'width': 0}, showlegend=False, hoverinfo='skip'))
+        fig.add_trace(go.Scatter(x=x_values, y=frame[f'{metric}{high}'], mode='lines', line={'width': 0},
+                                 fill='tonexty', fillcolor=f'rgba({color}, 0.2)', name=f'{name} {band_label}'))
+        fig.add_trace(go.Scatter(x=x_values, y=frame[f'{metric}{mid}'], mode='lines',
+                                 line={'color': f'rgb({color})'}, name=f'{name} {center_label}'))
+    fig.update_layout(legend_title_text=title, xaxis_title=COLUMN_NAME_MAPPING.get(BY_ID, BY_ID))
+    return fig
+
+
+def build_ensemble_figure(bands):
+    low, mid, high = PERCENTILES
+    return build_band_figure(bands, (f'_P{low}', f'_P{mid}', f'_P{high}'), f'p{low}-p{high}', 'median', 'Ensemble')
+
+
+@callback(
+    Output('preview-graph', 'figure'),
+    Output('preview-graph', 'style'),
+    *[Input(parameter_id, 'value') for parameter_id in PARAMETER_IDS]
+)
+def update_preview(*param_values):
+    try:
+        preview = surrogate.predict(collect_parameters(param_values))
+    except Exception as e:
+        print(f"Error predicting preview: {e}")
+        preview = None
+    if preview is None:
+        return dash.no_update, {'display': 'none'}
+    fig = build_band_figure(preview, ('_LOW', '', '_HIGH'), 'uncertainty', 'estimate', 'Preview (emulator)')
+    return fig, {'display': 'block'}
+
+
+@callback(
+    Output('ensemble-job', 'data', allow_duplicate=True),
+    Output('interval-component', 'disabled', allow_duplicate=True),
+    Input('run-ensemble-button', 'n_clicks'),
+    State('ensemble-runs', 'value'),
+    State('ensemble-job', 'data'),
+    *[State(parameter_id, 'value') for parameter_id in PARAMETER_IDS],
+    prevent_initial_call=True
+)
+def launch_ensemble(n_clicks, runs, ensemble, *param_values):
+    if not n_clicks:
+        raise PreventUpdate
+    job_id = start_ensemble(collect_parameters(param_values), runs=max(2, int(runs or 20)),
+                            replaces=(ensemble or {}).get('job_id'))
+    return {'job_id': job_id, 'completed': 0, 'done': False}, False
+
+
+@callback(
+    Output('ensemble-graph', 'figure'),
+    Output('ensemble-graph', 'style'),
+    Output('ensemble-status', 'children'),
+    Output('ensemble-job', 'data'),
+    Output('interval-component', 'disabled'),
+    Input('interval-component', 'n_intervals'),
+    State('ensemble-job', 'data')
+)
+def update_ensemble_graph(n, ensemble):
+    ensemble = ensemble or {}
+    job = get_ensemble(ensemble.get('job_id')) if ensemble.get('job_id') else None
+    if job is None or ensemble.get('done'):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, True
+    if job.completed == ensemble.get('completed') and not job.done:
+        raise PreventUpdate
+
+    status = f"Ensemble: {job.completed}/{job.runs} runs"
+    if job.error:
+        status = f"Ensemble failed: {job.error}"
+    elif job.done:
+        status += " (finished)"
+    new_state = {'job_id': job.id, 'completed': job.completed, 'done': job.done}
+    bands = job.bands
+    if bands is None:
+        return dash.no_update, dash.no_update, status, new_state, job.done
+    return build_ensemble_figure(bands), {'display': 'block'}, status, new_state, job.done
+
+
 @callback(
     Output('disease-parameters', 'style'),
     Input('toggle-disease-parameters', 'n_clicks'),
@@ -307,17 +499,55 @@ def toggle_vaccine_parameters(n_clicks, style):
     return style
 
 @callback(
-    Output('analysis-output', 'children'),
-    Input('analyze-simulation-button', 'n_clicks')
+    Output('analysis-job', 'data'),
+    Output('analysis-interval', 'disabled', allow_duplicate=True),
+    Output('analysis-output', 'children', allow_duplicate=True),
+    Input('analyze-simulation-button', 'n_clicks'),
+    prevent_initial_call=True
 )
 def analyze_simulation(n_clicks):
-    if n_clicks > 0:
-        summarized_data = helperfunctions.fetch_and_summarize_simulation_data()
-        print(summarized_data)
-        if summarized_data:
-            return helperfunctions.analyze_simulation_data(summarized_data)
-    else:
+    # The completion runs on the analysis queue; update_analysis polls it so no server worker waits on it.
+    if not n_clicks:
         raise PreventUpdate
+    return {'job_id': analysis.submit_analysis()}, False, "Analysis queued..."
+
+
+@callback(
+    Output('analysis-output', 'children', allow_duplicate=True),
+    Input('cancel-analysis-button', 'n_clicks'),
+    State('analysis-job', 'data'),
+    prevent_initial_call=True
+)
+def cancel_analysis(n_clicks, job):
+    job = analysis.cancel_analysis((job or {}).get('job_id'))
+    if job is None or job.status == analysis.DONE:
+        raise PreventUpdate
+    return "Cancelling analysis..."
+
+
+@callback(
+    Output('analysis-output', 'children'),
+    Output('analysis-interval', 'disabled'),
+    Input('analysis-interval', 'n_intervals'),
+    State('analysis-job', 'data')
+)
+def update_analysis(n, job_state):
+    job_id = (job_state or {}).get('job_id')
+    job = analysis.get_analysis(job_id) if job_id else None
+    if job is None:
+        return dash.no_update, True
+    if job.status == analysis.QUEUED:
+        ahead = analysis.queue_position(job.id)
+        return f"Analysis queued ({ahead} ahead)..." if ahead else "Analysis queued...", False
+    if job.status == analysis.SUMMARIZING:
+        return "Summarizing simulation data...", False
+    if job.status == analysis.ANALYZING:
+        return "Analyzing simulation data...", False
+    if job.status == analysis.FAILED:
+        return f"Analysis failed: {job.error}", True
+    if job.status == analysis.CANCELLED:
+        return "Analysis cancelled.", True
+    return job.result, True
 
 
 dash.register_page(__name__, path='/')
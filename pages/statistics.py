@@ -1,59 +1,70 @@
 import dash
-from dash import html, dcc, Output, Input, callback, State
+from dash import html, dcc, Output, Input, callback, State, ALL
 import plotly.graph_objects as go
-from backend import helperfunctions
+from backend import aggregation, figure_cache, page_data
 from constants import *
-import pandas as pd
 
 dash.register_page(__name__)
 
-df = helperfunctions.fetch_data_for_simulation()
-available_columns = [col for col in df.columns if col not in [BY_ID, BY_DATE]]
-mapped_columns = {col: COLUMN_NAME_MAPPING.get(col, col) for col in available_columns}
-
-layout = html.Div([
-    html.H1('Statistics for Current Epidemic', style={'text-align': 'center'}),
-    html.H2('Chart Type:', style={'marginLeft': '5%'}),
-    dcc.Dropdown(
-        id='chart-type-dropdown',
-        options=[
-            {'label': 'Line Chart', 'value': 'line'},
-            {'label': 'Bar Chart', 'value': 'bar'},
-            {'label': 'Area Chart', 'value': 'area'}
-        ],
-        value='line',
-        style={'width': '30%', 'marginLeft': '3%'}
-    ),
-    html.H2('Statistic Display:', style={'marginLeft': '5%'}),
-    dcc.Dropdown(
-        id='statistic-display-dropdown',
-        options=[
-            {'label': 'Daily', 'value': 'daily'},
-            {'label': 'Weekly', 'value': 'weekly'},
-            {'label': 'Monthly', 'value': 'monthly'},
-            {'label': 'Yearly', 'value': 'yearly'}
-        ],
-        value='daily',
-        style={'width': '30%', 'marginLeft': '3%'}
-    ),
-    dcc.Graph(id='dynamic-statistics'),
-    html.Div([
-        html.Button(mapped_columns[stat], id=f"btn-{stat.lower()}", n_clicks=0,
-                    style={'background-color': 'blue', 'border-radius': '20px', 'color': 'white',
-                           'padding': '10px 20px', 'font-size': '16px', 'margin': '5px'})
-        for stat in mapped_columns
-    ] + [
-        html.Button('Clear All', id='btn-clear-all', n_clicks=0,
-                    style={'background-color': 'red', 'border-radius': '20px', 'color': 'white',
-                           'padding': '10px 20px', 'font-size': '16px', 'margin': '5px'})
-    ], style={'display': 'flex', 'justify-content': 'center', 'gap': '10px'}),
-], style={'fontFamily': 'Arial'})
+
+def stat_button_style(active=False):
+    return {'background-color': 'orange' if active else 'blue', 'border-radius': '20px', 'color': 'white',
+            'padding': '10px 20px', 'font-size': '16px', 'margin': '5px'}
+
+
+# Dash builds every page's layout for callback validation on the first request, so the
+# column buttons are left to load_stat_buttons instead of reading the schema here.
+@page_data.timed_layout('statistics')
+def layout(**kwargs):
+    return html.Div([
+        html.H1('Statistics for Current Epidemic', style={'text-align': 'center'}),
+        html.H2('Chart Type:', style={'marginLeft': '5%'}),
+        dcc.Dropdown(
+            id='chart-type-dropdown',
+            options=[
+                {'label': 'Line Chart', 'value': 'line'},
+                {'label': 'Bar Chart', 'value': 'bar'},
+                {'label': 'Area Chart', 'value': 'area'}
+            ],
+            value='line',
+            style={'width': '30%', 'marginLeft': '3%'}
+        ),
+        html.H2('Statistic Display:', style={'marginLeft': '5%'}),
+        dcc.Dropdown(
+            id='statistic-display-dropdown',
+            options=[
+                {'label': 'Daily', 'value': 'daily'},
+                {'label': 'Weekly', 'value': 'weekly'},
+                {'label': 'Monthly', 'value': 'monthly'},
+                {'label': 'Yearly', 'value': 'yearly'}
+            ],
+            value='daily',
+            style={'width': '30%', 'marginLeft': '3%'}
+        ),
+        dcc.Graph(id='dynamic-statistics'),
+        html.Div([
+            html.Div(id='stat-buttons', style={'display': 'contents'}),
+            html.Button('Clear All', id='btn-clear-all', n_clicks=0,
+                        style={'background-color': 'red', 'border-radius': '20px', 'color': 'white',
+                               'padding': '10px 20px', 'font-size': '16px', 'margin': '5px'})
+        ], style={'display': 'flex', 'justify-content': 'center', 'gap': '10px'}),
+    ], style={'fontFamily': 'Arial'})
+
+
+@callback(
+    Output('stat-buttons', 'children'),
+    Input('url', 'pathname')
+)
+def load_stat_buttons(pathname):
+    return [html.Button(COLUMN_NAME_MAPPING.get(stat, stat), id={'type': 'stat-button', 'index': stat}, n_clicks=0,
+                        style=stat_button_style())
+            for stat in page_data.get('simulation_columns')]
+
 
 selected_areas = []
 
 
-def update_selected_areas(button_id):
-    selected_area = button_id.replace('btn-', '').upper()
+def update_selected_areas(selected_area):
     if selected_area not in selected_areas:
         selected_areas.append(selected_area)
 
@@ -62,73 +73,54 @@ def clear_all():
     selected_areas.clear()
 
 
+# Buttons are matched by pattern, so the callback does not need the simulation columns at import time.
 @callback(
-    [Output(f"btn-{stat.lower()}", 'style') for stat in mapped_columns] +
-    [Output('dynamic-statistics', 'figure')],
-    [Input(f"btn-{stat.lower()}", 'n_clicks_timestamp') for stat in mapped_columns] +
-    [Input('btn-clear-all', 'n_clicks_timestamp'),
-     Input('chart-type-dropdown', 'value'),
-     Input('statistic-display-dropdown', 'value')],
-    [State(f"btn-{stat.lower()}", 'id') for stat in mapped_columns] +
-    [State('chart-type-dropdown', 'value'),
-     State('statistic-display-dropdown', 'value')]
+    Output({'type': 'stat-button', 'index': ALL}, 'style'),
+    Output('dynamic-statistics', 'figure'),
+    Input({'type': 'stat-button', 'index': ALL}, 'n_clicks_timestamp'),
+    Input('btn-clear-all', 'n_clicks_timestamp'),
+    Input('chart-type-dropdown', 'value'),
+    Input('statistic-display-dropdown', 'value'),
+    State({'type': 'stat-button', 'index': ALL}, 'id')
 )
-def update_dashboard(*args):
-    ctx = dash.callback_context
-    inputs = ctx.inputs
-    states = ctx.states
-
-    button_styles = [
-        {'background-color': 'blue', 'border-radius': '20px', 'color': 'white',
-         'padding': '10px 20px', 'font-size': '16px', 'margin': '5px'} for _ in mapped_columns
-    ]
-
-    button_id = ''
-    latest_click = -1
-
-    timestamp_inputs = {key: value for key, value in inputs.items() if 'n_clicks_timestamp' in key and value is not None}
-
-    for inp_id, timestamp in timestamp_inputs.items():
-        if timestamp:
-            current_timestamp = int(timestamp)
-            if latest_click < current_timestamp:
-                latest_click = current_timestamp
-                button_id = inp_id.split('.')[0]
-
-    chart_type = states['chart-type-dropdown.value']
-    statistic_display = states['statistic-display-dropdown.value']
-    if button_id == 'btn-clear-all':
+def update_dashboard(button_timestamps, clear_timestamp, chart_type, statistic_display, button_ids):
+    button_styles = [stat_button_style() for _ in button_ids]
+
+    clicks = [(int(timestamp), button_id['index']) for timestamp, button_id in zip(button_timestamps, button_ids)
+              if timestamp]
+    if clear_timestamp:
+        clicks.append((int(clear_timestamp), None))
+    latest = max(clicks, key=lambda click: click[0]) if clicks else None
+
+    if latest is not None and latest[1] is None:
         clear_all()
-    elif 'btn' in button_id:
-        update_selected_areas(button_id)
-        index = [f"btn-{stat.lower()}" for stat in mapped_columns].index(button_id)
-        button_styles[index] = {'background-color': 'orange', 'border-radius': '20px', 'color': 'white',
-                                'padding': '10px 20px', 'font-size': '16px', 'margin': '5px'}
-
-    df = helperfunctions.fetch_data_for_simulation()
-    if df is None or df.empty:
-        print("No data retrieved from the database.")
-        return [*button_styles, go.Figure()]
+    elif latest is not None:
+        update_selected_areas(latest[1])
+        index = [button_id['index'] for button_id in button_ids].index(latest[1])
+        button_styles[index] = stat_button_style(active=True)
 
-    if statistic_display == 'daily':
-        df['INTERVAL'] = df[BY_ID]
-    elif statistic_display == 'weekly':
-        df['INTERVAL'] = df[BY_ID] // 7
-    elif statistic_display == 'monthly':
-        df['INTERVAL'] = df[BY_ID] // 30
-    elif statistic_display == 'yearly':
-        df['INTERVAL'] = df[BY_ID] // 365
+    if not selected_areas:
+        return button_styles, go.Figure()
 
-    numeric_df = df.select_dtypes(include='number')
+    fig = figure_cache.cached_figure('dynamic-statistics', (chart_type, statistic_display, selected_areas),
+                                     ['simulation'],
+                                     lambda: build_statistics_figure(selected_areas, chart_type, statistic_display))
+    return button_styles, fig if fig is not None else go.Figure()
 
-    df_resampled = numeric_df.groupby('INTERVAL').sum().reset_index()
 
-    selected_df = df_resampled[['INTERVAL'] + selected_areas]
+def build_statistics_figure(areas, chart_type, statistic_display):
+    # Bucketing and summing happen in MySQL, so only one row per interval comes back.
+    df_resampled = aggregation.aggregate('simulation', areas, statistic_display, 'sum')
+    if df_resampled is None or df_resampled.empty:
+        print("No data retrieved from the database.")
+        return None
+
+    selected_df = df_resampled.rename(columns={BY_ID: 'INTERVAL'})
 
     try:
         fig = go.Figure()
 
-        for area in selected_areas:
+        for area in areas:
             area_label = COLUMN_NAME_MAPPING.get(area, area)
             if chart_type == 'line' or chart_type == 'area':
                 fig.add_trace(go.Scatter(x=selected_df['INTERVAL'], y=selected_df[area], mode='lines', fill='tozeroy' if chart_type == 'area' else None, name=area_label))
@@ -137,8 +129,7 @@ def update_dashboard(*args):
 
         fig.update_layout(title='Dynamic Statistics', xaxis_title='Interval', yaxis_title='Value')
 
-        return [*button_styles, fig]
+        return fig
     except Exception as e:
         print(f"Error creating graph: {e}")
-        return [*button_styles, go.Figure()]
-
+        return None
@@ -0,0 +1,7 @@
+# Entry point for WSGI servers: gunicorn wsgi:server (settings in gunicorn.conf.py).
+# Run a single worker process: simulation runs and background jobs are held in memory by
+# the process that started them, and requests for them must reach that same process.
+from app import create_app
+
+app = create_app()
+server = app.server